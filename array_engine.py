@@ -0,0 +1,229 @@
+"""NumPy Plackett-Luce rating engine: mu/sigma in float64 arrays, games rated in vectorized batches.
+
+Reproduces openskill 5.1.1 `PlackettLuce.rate` for one-player teams with integer ranks
+(the only shape values.csv produces). Games are grouped into dependency levels -- no player
+appears twice in a level, and each player's games stay in order -- so a whole level of
+same-sized games is rated with one set of array operations.
+"""
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# openskill 5.1.1 PlackettLuce defaults
+DEFAULT_MU = 25.0
+DEFAULT_SIGMA = DEFAULT_MU / 3
+DEFAULT_BETA = DEFAULT_SIGMA / 2
+DEFAULT_KAPPA = 0.0001
+DEFAULT_TAU = DEFAULT_MU / 300
+
+_INITIAL_CAPACITY = 256
+
+
+def ordinal(mu, sigma, z: float = 3.0):
+    """Site ordinal: openskill ordinal(z) scaled by 24 and offset by 1200 (works on arrays too)."""
+    return (mu - z * sigma) * 24 + 1200
+
+
+def dependency_levels(seat_ids: np.ndarray, offsets: np.ndarray, player_count: int) -> np.ndarray:
+    """Level of each game: one more than the latest level any of its players already played in."""
+    last_level = np.full(player_count, -1, dtype=np.int64)
+    levels = np.empty(len(offsets) - 1, dtype=np.int64)
+    seats = seat_ids.tolist()
+    bounds = offsets.tolist()
+    last = last_level.tolist()
+    for g in range(len(bounds) - 1):
+        game_seats = seats[bounds[g]:bounds[g + 1]]
+        level = max(last[p] for p in game_seats) + 1
+        for p in game_seats:
+            last[p] = level
+        levels[g] = level
+    return levels
+
+
+def batch_schedule(seat_ids: np.ndarray, offsets: np.ndarray, player_count: int) -> List[np.ndarray]:
+    """Seat positions of each rate_batch call, in rating order: one (G, n) array per level and size.
+
+    Depends only on who played which game, so replays of the same games under different
+    model parameters can share one schedule.
+    """
+    if len(offsets) < 2:
+        return []
+    sizes = np.diff(offsets)
+    levels = dependency_levels(seat_ids, offsets, player_count)
+    order = np.lexsort((sizes, levels))
+    boundaries = (np.diff(levels[order]) != 0) | (np.diff(sizes[order]) != 0)
+    splits = np.flatnonzero(boundaries) + 1
+    return [
+        offsets[group][:, None] + np.arange(int(sizes[group[0]]))[None, :]
+        for group in np.split(order, splits)
+    ]
+
+
+class ArrayPlackettLuce:
+    """Plackett-Luce ratings for single-player teams, stored as contiguous float64 arrays.
+
+    Players are interned to dense integer ids in first-seen order; `mu[id]` and `sigma[id]`
+    hold the current rating.
+    """
+
+    def __init__(
+        self,
+        mu: float = DEFAULT_MU,
+        sigma: float = DEFAULT_SIGMA,
+        beta: float = DEFAULT_BETA,
+        kappa: float = DEFAULT_KAPPA,
+        tau: float = DEFAULT_TAU,
+    ):
+        self.default_mu = mu
+        self.default_sigma = sigma
+        self.beta = beta
+        self.kappa = kappa
+        self.tau = tau
+        self.player_index: Dict[str, int] = {}
+        self.players: List[str] = []
+        self._mu = np.empty(_INITIAL_CAPACITY, dtype=np.float64)
+        self._sigma = np.empty(_INITIAL_CAPACITY, dtype=np.float64)
+
+    @property
+    def mu(self) -> np.ndarray:
+        return self._mu[:len(self.players)]
+
+    @property
+    def sigma(self) -> np.ndarray:
+        return self._sigma[:len(self.players)]
+
+    def intern(self, player: str) -> int:
+        """Dense id for `player`, adding them at the default rating if unseen."""
+        index = self.player_index.get(player)
+        if index is None:
+            index = len(self.players)
+            if index == len(self._mu):
+                self._mu = np.resize(self._mu, 2 * index)
+                self._sigma = np.resize(self._sigma, 2 * index)
+            self._mu[index] = self.default_mu
+            self._sigma[index] = self.default_sigma
+            self.player_index[player] = index
+            self.players.append(player)
+        return index
+
+    def set_rating(self, player: str, mu: float, sigma: float) -> None:
+        index = self.intern(player)
+        self._mu[index] = mu
+        self._sigma[index] = sigma
+
+    def rating(self, player: str) -> Tuple[float, float]:
+        index = self.player_index[player]
+        return float(self._mu[index]), float(self._sigma[index])
+
+    def rate_batch(self, seats: np.ndarray, ranks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Rate G independent games of n seats each (`seats`, `ranks` shaped (G, n)).
+
+        No player may appear in more than one game of the batch. Ratings are updated in
+        place and the post-game (mu, sigma) per seat are returned, shaped (G, n).
+        """
+        mu = self._mu[seats]
+        sigma = np.sqrt(self._sigma[seats] ** 2 + self.tau * self.tau)
+        sigma_sq = sigma ** 2
+
+        c = np.sqrt(np.sum(sigma_sq + self.beta ** 2, axis=1))[:, None]
+        strength = np.exp(mu / c)
+        ranks = np.asarray(ranks)
+        # at_or_below[g, i, q]: seat q finished at or ahead of seat i (rank_q <= rank_i)
+        at_or_below = ranks[:, None, :] <= ranks[:, :, None]
+        # sum_q[g, q]: total strength of seats that finished at or behind q
+        sum_q = np.einsum('gi,giq->gq', strength, at_or_below)
+        tied = np.sum(ranks[:, :, None] == ranks[:, None, :], axis=2)
+        share = strength[:, :, None] / sum_q[:, None, :]
+        weight = at_or_below / tied[:, None, :]
+        own = np.eye(ranks.shape[1], dtype=np.float64)[None, :, :]
+
+        omega = np.sum((own - share) * weight, axis=2) * sigma_sq / c
+        delta = np.sum(share * (1 - share) * weight, axis=2) * sigma_sq / c ** 2
+        delta *= sigma / c
+
+        new_mu = mu + omega
+        new_sigma = sigma * np.sqrt(np.maximum(1 - delta, self.kappa))
+        self._mu[seats] = new_mu
+        self._sigma[seats] = new_sigma
+        return new_mu, new_sigma
+
+    def rate_games(
+        self,
+        players: Sequence[Sequence[str]],
+        ranks: Sequence[Sequence[int]],
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Rate games in order; equivalent to calling openskill `rate` on each in turn.
+
+        Returns (offsets, mu_after, sigma_after): seats of game g are offsets[g]:offsets[g+1]
+        in the flat post-game arrays, in the same seat order as the input.
+        """
+        offsets = np.zeros(len(players) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(game) for game in players])
+        seat_ids = np.fromiter(
+            (self.intern(player) for game in players for player in game),
+            dtype=np.int64,
+            count=int(offsets[-1]),
+        )
+        flat_ranks = np.fromiter(
+            (rank for game in ranks for rank in game), dtype=np.float64, count=int(offsets[-1])
+        )
+        return offsets, *self.rate_flat(seat_ids, flat_ranks, offsets)
+
+    def rate_flat(
+        self,
+        seat_ids: np.ndarray,
+        flat_ranks: np.ndarray,
+        offsets: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """rate_games over already-interned seats: flat player ids/ranks with per-game offsets."""
+        mu_after = np.empty(len(seat_ids), dtype=np.float64)
+        sigma_after = np.empty(len(seat_ids), dtype=np.float64)
+        for positions in batch_schedule(seat_ids, offsets, len(self.players)):
+            new_mu, new_sigma = self.rate_batch(seat_ids[positions], flat_ranks[positions])
+            mu_after[positions] = new_mu
+            sigma_after[positions] = new_sigma
+        return mu_after, sigma_after
+
+
+def max_parity_error(
+    players: Sequence[Sequence[str]],
+    ranks: Sequence[Sequence[int]],
+    model=None,
+) -> Dict[str, float]:
+    """Replay the same games through openskill and ArrayPlackettLuce; largest per-seat differences.
+
+    Every post-game mu, sigma and site ordinal is compared, not only the final ratings.
+    """
+    if model is None:
+        from openskill.models import PlackettLuce
+        model = PlackettLuce()
+
+    engine = ArrayPlackettLuce(
+        mu=model.mu, sigma=model.sigma, beta=model.beta, kappa=model.kappa, tau=model.tau
+    )
+    offsets, mu_after, sigma_after = engine.rate_games(players, ranks)
+
+    reference: Dict[str, object] = {}
+    expected_mu: List[float] = []
+    expected_sigma: List[float] = []
+    for game, game_ranks in zip(players, ranks):
+        for player in game:
+            if player not in reference:
+                reference[player] = model.rating(name=player)
+        result = model.rate(teams=[[reference[player]] for player in game], ranks=list(game_ranks))
+        for player, team in zip(game, result):
+            reference[player] = team[0]
+            expected_mu.append(team[0].mu)
+            expected_sigma.append(team[0].sigma)
+
+    mu_error = np.abs(mu_after - np.array(expected_mu)) if len(expected_mu) else np.zeros(1)
+    sigma_error = np.abs(sigma_after - np.array(expected_sigma)) if len(expected_sigma) else np.zeros(1)
+    ordinal_error = np.abs(
+        ordinal(mu_after, sigma_after) - ordinal(np.array(expected_mu), np.array(expected_sigma))
+    ) if len(expected_mu) else np.zeros(1)
+    return {
+        'games': len(players),
+        'mu': float(mu_error.max()),
+        'sigma': float(sigma_error.max()),
+        'ordinal': float(ordinal_error.max()),
+    }
@@ -0,0 +1,211 @@
+"""Asyncio Supabase (PostgREST) sync engine on one pooled httpx.AsyncClient.
+
+The event loop runs in a background thread so main.py stays synchronous: snapshot pages
+(snapshot.py) are multiplexed on the loop from the loader's threads, while write flushes
+are submitted and keep running while the replay and exports continue. Each phase (loads, writes) has its own concurrency limit.
+httpx is imported when an engine is created, so importing this module stays cheap.
+"""
+import asyncio
+import concurrent.futures
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from snapshot import DEFAULT_LOAD_CONCURRENCY, TABLE_SPECS, PageFetcher, RowCounter
+from sync_writer import FLUSH_ORDER, UPSERT_CHUNK_SIZE, UPSERT_KEYS, BatchWriter
+
+if TYPE_CHECKING:
+    import httpx
+
+DEFAULT_WRITE_CONCURRENCY = 4
+
+
+class AsyncSupabaseSync:
+    """Owns the event loop thread, the pooled client and the per-phase semaphores."""
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        load_concurrency: int = DEFAULT_LOAD_CONCURRENCY,
+        write_concurrency: int = DEFAULT_WRITE_CONCURRENCY,
+        timeout: float = 60.0,
+        event_hooks: Optional[Dict[str, list]] = None,
+    ):
+        self.base_url = url.rstrip('/') + '/rest/v1'
+        self.headers = {
+            'apikey': key,
+            'Authorization': f'Bearer {key}',
+            'Accept': 'application/json',
+        }
+        self.load_concurrency = load_concurrency
+        self.write_concurrency = write_concurrency
+        self.timeout = timeout
+        # httpx event hooks for the pooled client (e.g. metrics.RunMetrics.async_httpx_hooks())
+        self.event_hooks = event_hooks
+        self.request_count = 0
+        self._submitted: List[concurrent.futures.Future] = []
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='supabase-sync', daemon=True)
+        self._thread.start()
+        self._client: Optional['httpx.AsyncClient'] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.run(self._open())
+
+    async def _open(self) -> None:
+        import httpx
+
+        pool = max(self.load_concurrency, self.write_concurrency)
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=self.headers,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=pool, max_keepalive_connections=pool),
+            event_hooks=self.event_hooks,
+        )
+        self._semaphores = {
+            'load': asyncio.Semaphore(self.load_concurrency),
+            'write': asyncio.Semaphore(self.write_concurrency),
+        }
+
+    def run(self, coro):
+        """Run a coroutine on the engine loop and block for its result."""
+        return self.submit(coro).result()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Schedule a coroutine on the engine loop without waiting for it."""
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        self._submitted = [f for f in self._submitted if not f.done()]
+        self._submitted.append(future)
+        return future
+
+    def close(self) -> None:
+        """Finish any submitted work, then shut down the client and the loop thread."""
+        concurrent.futures.wait(self._submitted)
+        self._submitted = []
+        if self._client is not None:
+            self.run(self._client.aclose())
+            self._client = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def request(
+        self,
+        phase: str,
+        method: str,
+        table: str,
+        params=None,
+        json=None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> 'httpx.Response':
+        async with self._semaphores[phase]:
+            self.request_count += 1
+            response = await self._client.request(method, f'/{table}', params=params, json=json, headers=headers)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {table} failed ({response.status_code}): {response.text}")
+        return response
+
+    async def select_page(self, table: str, params: List[Tuple[str, object]]) -> List[dict]:
+        response = await self.request('load', 'GET', table, params=params)
+        return response.json()
+
+    def page_fetcher(self) -> PageFetcher:
+        """snapshot.PageFetcher that runs each page on this engine (callable from any thread)."""
+        def fetch_page(table, columns, order, filters, or_filter, limit):
+            params = [('select', columns), ('order', ','.join(order)), ('limit', limit)]
+            params.extend((column, f'{operator}.{value}') for column, operator, value in filters)
+            if or_filter:
+                params.append(('or', f'({or_filter})'))
+            # Not tracked in _submitted: the calling thread blocks on it.
+            return asyncio.run_coroutine_threadsafe(self.select_page(table, params), self._loop).result()
+        return fetch_page
+
+    async def count(self, table: str) -> int:
+        lead = TABLE_SPECS[table][1][0]
+        response = await self.request(
+            'load', 'GET', table, params=[('select', lead), ('limit', 1)], headers={'Prefer': 'count=exact'}
+        )
+        # Content-Range: 0-0/<total>
+        return int(response.headers.get('content-range', '*/0').rsplit('/', 1)[-1])
+
+    def row_counter(self) -> RowCounter:
+        """snapshot.RowCounter on this engine (callable from any thread)."""
+        def count_rows(table):
+            return asyncio.run_coroutine_threadsafe(self.count(table), self._loop).result()
+        return count_rows
+
+    async def upsert(self, table: str, rows: List[dict], ignore_duplicates: bool = False) -> List[dict]:
+        resolution = 'ignore' if ignore_duplicates else 'merge'
+        returning = 'representation' if ignore_duplicates else 'minimal'
+        columns = ','.join(dict.fromkeys(col for row in rows for col in row))
+        response = await self.request(
+            'write',
+            'POST',
+            table,
+            params={'on_conflict': ','.join(UPSERT_KEYS[table]), 'columns': columns},
+            json=rows,
+            headers={'Prefer': f'return={returning},resolution={resolution}-duplicates'},
+        )
+        return response.json() if returning == 'representation' else []
+
+
+class AsyncBatchWriter(BatchWriter):
+    """BatchWriter whose flushes are pipelined on an AsyncSupabaseSync.
+
+    flush() hands the queued rows to the engine and returns immediately; chunks of a
+    table go out concurrently (bounded by the write limit). game_participation chunks
+    wait for the games flush before them, so a game always exists before its
+    participations. Call wait() before reading results or exiting.
+    """
+
+    def __init__(self, engine: AsyncSupabaseSync, chunk_size: int = UPSERT_CHUNK_SIZE, journal=None, mirror=None):
+        super().__init__(None, chunk_size, journal, mirror)
+        self.engine = engine
+        self._futures: List[concurrent.futures.Future] = []
+        self._games_future: Optional[concurrent.futures.Future] = None
+
+    def flush(self, tables=FLUSH_ORDER, seal: bool = False) -> None:
+        for table, chunks, seqs in self._plan(tables, seal):
+            wait_for = self._games_future if table == 'game_participation' else None
+            future = self.engine.submit(self._flush_rows(table, chunks, seqs, wait_for))
+            if table == 'games':
+                self._games_future = future
+            self._futures.append(future)
+
+    def wait(self) -> None:
+        """Block until every submitted flush has finished."""
+        for future in self._futures:
+            future.result()
+        self._futures = []
+
+    async def _flush_rows(self, table: str, chunks: List[List[dict]], seqs: List[Optional[int]], wait_for) -> None:
+        if wait_for is not None:
+            await asyncio.wrap_future(wait_for)
+        if table == 'games':
+            await asyncio.gather(*(self._insert_games_async(chunk, seq) for chunk, seq in zip(chunks, seqs)))
+        else:
+            await asyncio.gather(*(self._upsert_chunk(table, chunk, seq, index * self.chunk_size)
+                                   for index, (chunk, seq) in enumerate(zip(chunks, seqs))))
+
+    async def _upsert_chunk(self, table: str, chunk: List[dict], seq: Optional[int], start: int) -> None:
+        chunk, complete = self._without_failed_games(table, chunk)
+        try:
+            if chunk:
+                self.request_count += 1
+                await self.engine.upsert(table, chunk)
+                self._written(table, chunk)
+            if complete:
+                self._ack(seq)
+        except Exception as e:
+            print(f"Error upserting {len(chunk)} {table} rows (batch starting at {start}): {e}")
+
+    async def _insert_games_async(self, chunk: List[dict], seq: Optional[int]) -> None:
+        try:
+            self.request_count += 1
+            inserted = {row['id'] for row in await self.engine.upsert('games', chunk, ignore_duplicates=True)}
+        except Exception as e:
+            print(f"Error inserting {len(chunk)} games (ids {chunk[0]['id']}..{chunk[-1]['id']}): {e}")
+            self._record_game_inserts(chunk, set())
+            self.unsent_game_ids.update(row['id'] for row in chunk)
+            return
+        self._ack(seq, self._record_game_inserts(chunk, inserted))
@@ -0,0 +1,239 @@
+"""In-process stand-in for the PostgREST endpoints main.py uses, for benchmarks.
+
+Serves /rest/v1/<table> on a local ThreadingHTTPServer:
+
+- GET: select, order (multi-column, asc/desc), limit/offset, eq/gt/gte/lt/lte filters and
+  the keyset `or=(a.gt.X,and(a.eq.X,b.gt.Y))` filter snapshot.py sends. Rows are kept
+  sorted per requested order, so a keyset page is a bisect plus `limit` rows. With
+  `Prefer: count=exact` the table's row count comes back in `Content-Range` (filters are
+  not applied to the count; the mirror only counts whole tables).
+- POST: upserts on `on_conflict` with `resolution=merge-duplicates|ignore-duplicates`
+  and `return=minimal|representation`.
+
+Every request can be delayed by `latency` seconds, and requests and bytes are counted per
+table. Not a database: no types, constraints or auth.
+"""
+import bisect
+import json
+import re
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlparse
+
+# Natural key per table (what main.py upserts on); rows without one get a serial id.
+TABLE_KEYS: Dict[str, Tuple[str, ...]] = {
+    'games': ('event', 'name'),
+    'game_participation': ('game', 'player'),
+    'event_participation': ('event', 'player'),
+    'players': ('id',),
+}
+
+_KEYSET = re.compile(r'\((\w+)\.gt\.([^,]+),and\(\w+\.eq\.[^,]+,(\w+)\.gt\.([^)]+)\)\)')
+_RESERVED = {'select', 'order', 'limit', 'offset', 'on_conflict', 'columns', 'or'}
+
+
+def _value(text: str):
+    try:
+        return int(text)
+    except ValueError:
+        return text
+
+
+class FakeTable:
+    def __init__(self, key: Tuple[str, ...]):
+        self.key = key
+        self.rows: Dict[tuple, dict] = {}
+        self.next_id = 1
+        self._sorted: Dict[Tuple[str, ...], Tuple[List[tuple], List[dict]]] = {}
+
+    def upsert(self, row: dict, ignore_duplicates: bool) -> Optional[dict]:
+        natural = tuple(row.get(column) for column in self.key)
+        existing = self.rows.get(natural)
+        if existing is not None:
+            if ignore_duplicates:
+                return None
+            existing.update(row)
+            self._sorted.clear()
+            return existing
+        stored = dict(row)
+        if 'id' not in stored:
+            stored['id'] = self.next_id
+        self.next_id = max(self.next_id, stored['id']) + 1
+        self.rows[natural] = stored
+        self._sorted.clear()
+        return stored
+
+    def ordered(self, columns: Tuple[str, ...]) -> Tuple[List[tuple], List[dict]]:
+        """(sort keys, rows) ascending by `columns`, cached until the next write."""
+        cached = self._sorted.get(columns)
+        if cached is None:
+            rows = sorted(self.rows.values(), key=lambda row: tuple(row.get(c) for c in columns))
+            cached = ([tuple(row.get(c) for c in columns) for row in rows], rows)
+            self._sorted[columns] = cached
+        return cached
+
+
+class FakePostgrest:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.tables: Dict[str, FakeTable] = {name: FakeTable(key) for name, key in TABLE_KEYS.items()}
+        self.requests: Dict[str, int] = defaultdict(int)
+        self.bytes: Dict[str, int] = defaultdict(int)
+        self.lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def request_count(self) -> int:
+        return sum(self.requests.values())
+
+    def reset_counters(self) -> None:
+        self.requests.clear()
+        self.bytes.clear()
+
+    def seed(self, table: str, rows: List[dict]) -> None:
+        for row in rows:
+            self.tables[table].upsert(row, ignore_duplicates=False)
+
+    def start(self) -> 'FakePostgrest':
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fake._handle(self, 'GET')
+
+            def do_POST(self):
+                fake._handle(self, 'POST')
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _handle(self, handler: BaseHTTPRequestHandler, method: str) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlparse(handler.path)
+        table = url.path.rsplit('/', 1)[-1]
+        params = parse_qsl(url.query, keep_blank_values=True)
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = handler.rfile.read(length) if length else b''
+        prefer = handler.headers.get('Prefer') or ''
+        if table not in self.tables:
+            self._send(handler, table, 404, {'message': f'unknown table {table}'}, len(body))
+            return
+        headers: Dict[str, str] = {}
+        with self.lock:
+            if method == 'GET':
+                status, payload = 200, self._select(table, params)
+                if 'count=exact' in prefer:
+                    total = len(self.tables[table].rows)
+                    headers['Content-Range'] = f'0-{len(payload) - 1}/{total}' if payload else f'*/{total}'
+            else:
+                status, payload = 201, self._upsert(table, json.loads(body or b'[]'), prefer)
+        self._send(handler, table, status, payload, len(body), headers)
+
+    def _send(self, handler, table: str, status: int, payload, received: int, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(payload).encode()
+        with self.lock:
+            self.requests[table] += 1
+            self.bytes[table] += received + len(data)
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def _select(self, table: str, params: List[Tuple[str, str]]) -> List[dict]:
+        options = {k: v for k, v in params if k in _RESERVED}
+        filters = [(k, *v.split('.', 1)) for k, v in params if k not in _RESERVED]
+        order = [item.split('.') for item in options.get('order', 'id.asc').split(',') if item]
+        columns = tuple(column for column, _ in order)
+        descending = any(direction == 'desc' for _, direction in order)
+        limit = int(options.get('limit', 1000))
+        offset = int(options.get('offset', 0))
+        keys, rows = self.tables[table].ordered(columns)
+
+        start = 0
+        keyset = _KEYSET.fullmatch(options.get('or', ''))
+        if keyset and not descending and keyset.group(1) == columns[0]:
+            start = bisect.bisect_right(keys, (_value(keyset.group(2)), _value(keyset.group(4))))
+        for column, operator, text in filters:
+            bound = _value(text)
+            if column == columns[0] and not descending and operator in ('gt', 'gte', 'eq') and isinstance(bound, int):
+                # leading key columns are integers: "> X" starts at the first key >= (X + 1,)
+                start = max(start, bisect.bisect_left(keys, (bound + 1 if operator == 'gt' else bound,)))
+
+        def matches(row: dict) -> bool:
+            for column, operator, text in filters:
+                value, bound = row.get(column), _value(text)
+                if value is None:
+                    return False
+                if operator == 'eq' and value != bound or operator == 'gt' and not value > bound \
+                        or operator == 'gte' and not value >= bound or operator == 'lt' and not value < bound \
+                        or operator == 'lte' and not value <= bound:
+                    return False
+            if keyset:
+                a, x, b, y = keyset.group(1), _value(keyset.group(2)), keyset.group(3), _value(keyset.group(4))
+                if not (row[a] > x or row[a] == x and row[b] > y):
+                    return False
+            return True
+
+        indexes = range(len(rows) - 1, -1, -1) if descending else range(start, len(rows))
+        selected: List[dict] = []
+        skipped = 0
+        for index in indexes:
+            row = rows[index]
+            if not matches(row):
+                if not descending and any(c == columns[0] and op in ('lt', 'lte', 'eq') for c, op, _ in filters):
+                    # past the upper bound of the leading column
+                    if not all(self._within(row, f) for f in filters if f[0] == columns[0]):
+                        break
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            selected.append(row)
+            if len(selected) >= limit:
+                break
+
+        select = options.get('select', '*')
+        if select != '*':
+            wanted = select.split(',')
+            selected = [{column: row.get(column) for column in wanted} for row in selected]
+        return selected
+
+    @staticmethod
+    def _within(row: dict, condition: Tuple[str, str, str]) -> bool:
+        column, operator, text = condition
+        value, bound = row.get(column), _value(text)
+        return not (operator == 'lt' and value >= bound or operator == 'lte' and value > bound
+                    or operator == 'eq' and value > bound)
+
+    def _upsert(self, table: str, rows, prefer: str) -> List[dict]:
+        rows = rows if isinstance(rows, list) else [rows]
+        ignore = 'ignore-duplicates' in prefer
+        stored = [self.tables[table].upsert(row, ignore) for row in rows]
+        if 'return=representation' in prefer:
+            return [dict(row) for row in stored if row is not None]
+        return []
@@ -0,0 +1,109 @@
+"""Seeded synthetic tournament history: values.csv, players_rows.csv and events_rows.csv.
+
+The mix follows the real data: about half the games are in 1v1 events (rating_event
+false, two seats, ranks 1/2) and the rest in 3/4-player events, mostly winner-takes-all
+3-player games (ranks 1/2/2) with some full-order 4-player games. Players have skewed
+activity so a few play most events, and each event has a couple of hundred games.
+
+    uv run python benchmarks/generate.py 100k out/
+"""
+import argparse
+import csv
+import json
+import os
+import random
+from typing import List, Tuple
+
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+GAMES_PER_EVENT = 200
+# Share of events that are 1v1 (rating_event false).
+ONE_VERSUS_ONE_SHARE = 0.5
+# (seats, ranks, weight) for games in 3/4-player events
+MULTIPLAYER_SHAPES: List[Tuple[int, Tuple[int, ...], float]] = [
+    (3, (1, 2, 2), 0.72),
+    (3, (1, 2, 3), 0.08),
+    (4, (1, 2, 3, 4), 0.11),
+    (4, (1, 2, 2, 2), 0.09),
+]
+CREATED_AT = '2024-04-01 20:24:39.632348+00'
+
+
+def parse_size(size: str) -> int:
+    return SIZES[size.lower()] if size.lower() in SIZES else int(size)
+
+
+def generate(games: int, directory: str, seed: int = 0) -> dict:
+    """Write the three CSVs for `games` games into `directory`; returns counts."""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    player_count = max(200, games // 20)
+    players = [f'player{index:07d}' for index in range(1, player_count + 1)]
+    # Zipf-like activity: low indexes play far more often.
+    activity = [1.0 / (rank ** 0.8) for rank in range(1, player_count + 1)]
+
+    event_count = max(2, -(-games // GAMES_PER_EVENT))
+    events = []
+    for event_id in range(1, event_count + 1):
+        one_versus_one = rng.random() < ONE_VERSUS_ONE_SHARE
+        events.append((event_id, f'Synthetic Event {event_id:05d}', one_versus_one))
+
+    with open(os.path.join(directory, 'players_rows.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'created_at', 'username', 'current_rating'])
+        for player_id, name in enumerate(players, start=1):
+            writer.writerow([player_id, CREATED_AT, name, json.dumps({'mu': 25, 'sigma': 8.333333333333334, 'ordinal': 1200})])
+
+    with open(os.path.join(directory, 'events_rows.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'created_at', 'start_date', 'name', 'bid', 'draft', 'num_players_per_game', 'rating_event'])
+        for event_id, name, one_versus_one in events:
+            start_date = f'{2020 + event_id // 400}-{1 + event_id // 34 % 12:02d}-{1 + event_id % 28:02d} 00:00:00+00'
+            writer.writerow([
+                event_id, CREATED_AT, start_date, name, 'false', 'false',
+                2 if one_versus_one else 4, 'false' if one_versus_one else 'true',
+            ])
+
+    shapes = [(seats, ranks) for seats, ranks, _ in MULTIPLAYER_SHAPES]
+    shape_weights = [weight for _, _, weight in MULTIPLAYER_SHAPES]
+    written = 0
+    with open(os.path.join(directory, 'values.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['event', 'match', 'player_a', 'rank_a', 'player_b', 'rank_b', 'player_c', 'rank_c', 'player_d', 'rank_d'])
+        for event_id, name, one_versus_one in events:
+            event_games = min(GAMES_PER_EVENT, games - written)
+            if event_games <= 0:
+                break
+            # Each event draws its entrants from the whole pool, weighted by activity.
+            entrant_count = min(player_count, max(8, event_games // 2))
+            entrants = list(dict.fromkeys(rng.choices(players, weights=activity, k=entrant_count * 2)))[:entrant_count]
+            for game in range(event_games):
+                if one_versus_one:
+                    seats, ranks = 2, (1, 2)
+                else:
+                    seats, ranks = rng.choices(shapes, weights=shape_weights)[0]
+                seats = min(seats, len(entrants))
+                seated = rng.sample(entrants, seats)
+                row = [name, f'R{game // 16 + 1}G{game % 16 + 1}']
+                for player, rank in zip(seated, ranks):
+                    row.extend([player, rank])
+                row.extend([''] * (10 - len(row)))
+                writer.writerow(row)
+            written += event_games
+
+    return {'games': written, 'players': player_count, 'events': len(events)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Write a seeded synthetic values.csv / players_rows.csv / events_rows.csv.')
+    parser.add_argument('size', help=f"Number of games or one of {', '.join(SIZES)}.")
+    parser.add_argument('directory', help='Output directory.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    counts = generate(parse_size(args.size), args.directory, args.seed)
+    print(f"Wrote {counts['games']} games, {counts['players']} players, {counts['events']} events to {args.directory}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
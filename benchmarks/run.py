@@ -0,0 +1,169 @@
+"""Replay and sync benchmarks over synthetic histories.
+
+For each size, generates values.csv / players_rows.csv / events_rows.csv (generate.py),
+then runs each measurement in a fresh child process so peak RSS belongs to that phase:
+
+- replay: RatingEngine.replay() per engine -> games/s, parse time, peak RSS
+- sync: main.main() against the in-process fake PostgREST (fake_postgrest.py), first a
+  full load into empty tables, then a no-change re-run -> wall time, requests, bytes, RSS
+
+    uv run python benchmarks/run.py --sizes 10k,100k --latency 0.005 --json bench.json
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(HERE)
+sys.path.insert(0, REPO_ROOT)
+
+from generate import generate, parse_size  # noqa: E402
+
+ENGINES = ('openskill', 'numpy')
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def child_replay(data_dir: str, engine: str) -> dict:
+    from input_cache import load_inputs
+    from rating_engine import RatingEngine
+
+    os.chdir(data_dir)
+    start = time.perf_counter()
+    inputs = load_inputs(cache_dir=None)
+    parse_seconds = time.perf_counter() - start
+    rating_engine = RatingEngine(inputs, engine=engine, log=lambda line: None)
+    start = time.perf_counter()
+    rating_engine.replay()
+    replay_seconds = time.perf_counter() - start
+    games = len(inputs.dataset)
+    return {
+        'games': games,
+        'parse_seconds': parse_seconds,
+        'replay_seconds': replay_seconds,
+        'games_per_second': games / replay_seconds if replay_seconds else None,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def child_sync(data_dir: str, argv: List[str]) -> dict:
+    import main
+
+    os.chdir(data_dir)
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        code = main.main(argv)
+    return {
+        'exit_code': code,
+        'wall_seconds': time.perf_counter() - start,
+        'peak_rss_mb': peak_rss_mb(),
+        'output_tail': output.getvalue().splitlines()[-12:],
+    }
+
+
+def run_child(args: List[str], env=None) -> dict:
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), *args],
+        capture_output=True, text=True, env=env,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"benchmark child {args} failed:\n{completed.stderr[-4000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def bench_size(size: str, args) -> Dict[str, object]:
+    from fake_postgrest import FakePostgrest
+
+    games = parse_size(size)
+    data_dir = os.path.join(args.work_dir, f'{size}-seed{args.seed}')
+    start = time.perf_counter()
+    counts = generate(games, data_dir, args.seed)
+    print(f"[{size}] generated {counts['games']} games / {counts['players']} players / "
+          f"{counts['events']} events in {time.perf_counter() - start:.1f}s", flush=True)
+    result: Dict[str, object] = {'size': size, **counts, 'replay': {}, 'sync': {}}
+
+    for engine in args.engines:
+        replay = run_child(['--child', 'replay', '--data', data_dir, '--engine', engine])
+        result['replay'][engine] = replay
+        print(f"[{size}] replay {engine}: {replay['games_per_second']:,.0f} games/s "
+              f"({replay['replay_seconds']:.2f}s, parse {replay['parse_seconds']:.2f}s, "
+              f"peak RSS {replay['peak_rss_mb']:.0f} MB)", flush=True)
+
+    if args.skip_sync:
+        return result
+
+    fake = FakePostgrest(latency=args.latency).start()
+    try:
+        with open(os.path.join(data_dir, 'players_rows.csv'), newline='', encoding='utf-8') as f:
+            fake.seed('players', [
+                {'id': int(row['id']), 'username': row['username'], 'current_rating': None}
+                for row in csv.DictReader(f)
+            ])
+        env = dict(os.environ, SUPABASE_URL=fake.url, SUPABASE_KEY='bench.bench.bench', GENERATE_CSV='true')
+        for phase, extra in (('initial', ['--allow-new-games']), ('no_change', [])):
+            fake.reset_counters()
+            argv = ['--no-checkpoints', *extra, *args.sync_args]
+            sync = run_child(['--child', 'sync', '--data', data_dir, '--', *argv], env=env)
+            sync['requests'] = fake.request_count
+            sync['requests_by_table'] = dict(fake.requests)
+            sync['bytes_by_table'] = dict(fake.bytes)
+            result['sync'][phase] = sync
+            print(f"[{size}] sync {phase}: {sync['wall_seconds']:.2f}s, {sync['requests']} requests, "
+                  f"{sum(fake.bytes.values()) / 1e6:.1f} MB, peak RSS {sync['peak_rss_mb']:.0f} MB "
+                  f"(exit {sync['exit_code']})", flush=True)
+    finally:
+        fake.stop()
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Replay and Supabase-sync benchmarks on synthetic data.')
+    parser.add_argument('--sizes', default='10k', help='Comma-separated sizes: 10k, 100k, 1m or a game count (default: 10k).')
+    parser.add_argument('--engines', default=','.join(ENGINES), help='Comma-separated replay engines (default: openskill,numpy).')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds of delay per fake PostgREST request (default: 0).')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skip-sync', action='store_true', help='Only run the replay benchmarks.')
+    parser.add_argument('--work-dir', default=None, help='Where generated data goes (default: a temporary directory).')
+    parser.add_argument('--json', dest='json_out', help='Also write the results to this JSON file.')
+    parser.add_argument('--child', choices=('replay', 'sync'), help=argparse.SUPPRESS)
+    parser.add_argument('--data', help=argparse.SUPPRESS)
+    parser.add_argument('--engine', help=argparse.SUPPRESS)
+    parser.add_argument('sync_args', nargs='*', help='Extra main.py flags for the sync runs (after --), e.g. -- --async-sync.')
+    args = parser.parse_args(argv)
+
+    if args.child == 'replay':
+        print(json.dumps(child_replay(args.data, args.engine)))
+        return 0
+    if args.child == 'sync':
+        print(json.dumps(child_sync(args.data, args.sync_args)))
+        return 0
+
+    args.engines = [engine for engine in args.engines.split(',') if engine]
+    with contextlib.ExitStack() as stack:
+        if args.work_dir is None:
+            args.work_dir = stack.enter_context(tempfile.TemporaryDirectory(prefix='openskill-bench-'))
+        results = [bench_size(size, args) for size in args.sizes.split(',') if size]
+
+    if args.json_out:
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump({'latency': args.latency, 'seed': args.seed, 'results': results}, f, indent=2)
+        print(f"Wrote {args.json_out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
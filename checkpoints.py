@@ -0,0 +1,137 @@
+"""Rating-state checkpoints at event boundaries so a run only replays the changed tail of values.csv."""
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Bump when the checkpoint payload layout or replay semantics change; old files stop matching.
+CHECKPOINT_FORMAT = 3
+
+DEFAULT_CHECKPOINT_DIR = '.rating_checkpoints'
+
+# Model attributes that change rating math (gamma is a function; its name stands in for it).
+_MODEL_PARAMS = ('mu', 'sigma', 'beta', 'kappa', 'tau', 'limit_sigma')
+
+
+def model_fingerprint(model) -> dict:
+    params = {name: getattr(model, name) for name in _MODEL_PARAMS}
+    params['model'] = type(model).__name__
+    params['gamma'] = getattr(model.gamma, '__name__', repr(model.gamma))
+    return params
+
+
+def input_seed(event_key: Dict[str, int], rated_event: Dict[int, str], model, engine: str = 'openskill') -> str:
+    """Hash of everything besides values.csv that the replay depends on (events, model, engine)."""
+    digest = hashlib.sha256()
+    digest.update(f"format={CHECKPOINT_FORMAT}\nengine={engine}\n".encode())
+    digest.update(json.dumps(model_fingerprint(model), sort_keys=True).encode())
+    events = sorted((event_id, name, rated_event.get(event_id)) for name, event_id in event_key.items())
+    digest.update(json.dumps(events).encode())
+    return digest.hexdigest()
+
+
+def event_boundaries(events: Sequence[int]) -> List[int]:
+    """Row counts after which the event changes (plus the end of the file).
+
+    boundaries[k] is the number of rows consumed once segment k is complete.
+    """
+    boundaries = [i for i in range(1, len(events)) if events[i] != events[i - 1]]
+    if events:
+        boundaries.append(len(events))
+    return boundaries
+
+
+def chain_digests(seed: str, row_keys: Sequence[str], boundaries: Sequence[int]) -> List[str]:
+    """Digest of seed + values.csv prefix at each boundary; an edited row changes it and every later one."""
+    digests: List[str] = []
+    previous = seed
+    start = 0
+    for end in boundaries:
+        digest = hashlib.sha256(previous.encode())
+        for key in row_keys[start:end]:
+            digest.update(key.encode())
+            digest.update(b'\n')
+        previous = digest.hexdigest()
+        digests.append(previous)
+        start = end
+    return digests
+
+
+def snapshot_ratings(player_ratings: Dict[str, Dict[str, object]]) -> Dict[str, List[list]]:
+    """{ladder: [[player, mu, sigma], ...]} in insertion order (keeps tie order in sorted exports)."""
+    return {
+        ladder: [[player, rating.mu, rating.sigma] for player, rating in ratings.items()]
+        for ladder, ratings in player_ratings.items()
+    }
+
+
+def restore_ratings(snapshot: Dict[str, List[list]], model) -> Dict[str, Dict[str, object]]:
+    return {
+        ladder: {player: model.rating(mu=mu, sigma=sigma, name=player) for player, mu, sigma in entries}
+        for ladder, entries in snapshot.items()
+    }
+
+
+class CheckpointStore:
+    """One JSON file per event boundary: `<segment index>-<digest prefix>.json`.
+
+    Each file holds the full rating state after the segment plus the per-game rating
+    snapshots emitted inside it, so a resumed run can re-emit earlier games without
+    re-running the model.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CHECKPOINT_DIR):
+        self.directory = directory
+
+    def _path(self, index: int, digest: str) -> str:
+        return os.path.join(self.directory, f"{index:05d}-{digest[:16]}.json")
+
+    def _load(self, index: int, digest: str) -> Optional[dict]:
+        try:
+            with open(self._path(index, digest), encoding='utf-8') as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if payload.get('digest') != digest:
+            return None
+        return payload
+
+    def resume_point(self, digests: Sequence[str]) -> Tuple[int, Optional[dict], List[list]]:
+        """Find the last checkpoint whose prefix still matches.
+
+        Returns (segments_matched, state_after_last_match, per-game snapshots for those segments).
+        """
+        matched = 0
+        state = None
+        games: List[list] = []
+        for index, digest in enumerate(digests):
+            payload = self._load(index, digest)
+            if payload is None:
+                break
+            matched = index + 1
+            state = payload['state']
+            games.extend(payload['games'])
+        return matched, state, games
+
+    def save(self, index: int, digest: str, rows_consumed: int, state: dict, games: List[list]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        # Drop stale checkpoints for this segment (an earlier prefix that no longer matches).
+        prefix = f"{index:05d}-"
+        keep = os.path.basename(self._path(index, digest))
+        for name in os.listdir(self.directory):
+            if name.startswith(prefix) and name != keep:
+                os.remove(os.path.join(self.directory, name))
+        payload = {'digest': digest, 'rows': rows_consumed, 'state': state, 'games': games}
+        tmp_path = self._path(index, digest) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, separators=(',', ':'))
+        os.replace(tmp_path, self._path(index, digest))
+
+    def prune(self, valid_segments: int) -> None:
+        """Remove checkpoints past the end of the current values.csv."""
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            head = name.split('-', 1)[0]
+            if head.isdigit() and int(head) >= valid_segments:
+                os.remove(os.path.join(self.directory, name))
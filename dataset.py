@@ -0,0 +1,199 @@
+"""values.csv parsed once into a compact columnar game dataset.
+
+Players and events are interned to dense ids and every seat lives in flat arrays
+with per-game offsets, so preflight, replay, the engines and the exports share one
+representation instead of re-reading the CSV and building a dict per row.
+"""
+import csv
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from names import NameIndex
+
+# Seat columns in values.csv, in order.
+SEAT_LETTERS = 'abcd'
+MIN_SEATS = 2
+MAX_SEATS = 4
+
+
+class GameDataset:
+    """Columnar view of values.csv.
+
+    Game g has event id `game_event[g]`, match name `game_names[g]` and seats
+    `offsets[g]:offsets[g+1]` in `seat_player` (index into `player_names`) and
+    `seat_rank`. Players are interned in first-appearance order.
+    """
+
+    def __init__(
+        self,
+        event_names: Dict[int, str],
+        game_event: np.ndarray,
+        game_names: List[str],
+        offsets: np.ndarray,
+        seat_player: np.ndarray,
+        seat_rank: np.ndarray,
+        player_names: List[str],
+        player_db_ids: np.ndarray,
+    ):
+        self.event_names = event_names
+        self.game_event = game_event
+        self.game_names = game_names
+        self.offsets = offsets
+        self.seat_player = seat_player
+        self.seat_rank = seat_rank
+        self.player_names = player_names
+        self.player_db_ids = player_db_ids
+        self._games_cache = None
+
+    def __len__(self) -> int:
+        return len(self.game_names)
+
+    @property
+    def seat_count(self) -> int:
+        return int(self.offsets[-1])
+
+    def games(self) -> List[Tuple[int, str, List[str], List[int]]]:
+        """(event_id, match, players, ranks) per game as plain Python values, built once."""
+        if self._games_cache is None:
+            events = self.game_event.tolist()
+            bounds = self.offsets.tolist()
+            names = self.player_names
+            seat_names = [names[p] for p in self.seat_player.tolist()]
+            ranks = self.seat_rank.tolist()
+            self._games_cache = [
+                (events[g], self.game_names[g], seat_names[bounds[g]:bounds[g + 1]], ranks[bounds[g]:bounds[g + 1]])
+                for g in range(len(self))
+            ]
+        return self._games_cache
+
+    def unique_game_keys(self) -> List[Tuple[int, str]]:
+        """(event_id, match) keys in first-appearance order."""
+        return list(dict.fromkeys(zip(self.game_event.tolist(), self.game_names)))
+
+    def row_keys(self) -> List[str]:
+        """One stable string per game covering everything the replay reads (for checkpoint hashing)."""
+        return [
+            '\x1f'.join([self.event_names[event], match] + [f'{p}\x1f{r}' for p, r in zip(players, ranks)])
+            for event, match, players, ranks in self.games()
+        ]
+
+    def subset(self, game_mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Games selected by a boolean mask: (game_indices, offsets, seat_player, seat_rank)."""
+        game_indices = np.flatnonzero(game_mask)
+        sizes = np.diff(self.offsets)[game_indices]
+        offsets = np.zeros(len(game_indices) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        # seat s of the subset maps back to original seat s + (original start - subset start) of its game
+        seats = np.arange(offsets[-1]) + np.repeat(self.offsets[game_indices] - offsets[:-1], sizes)
+        return game_indices, offsets, self.seat_player[seats], self.seat_rank[seats]
+
+
+class DatasetError(ValueError):
+    """values.csv references unknown players/events or has malformed seats."""
+
+
+def load_values(values_path: str, event_key: Dict[str, int], player_key: Dict[str, int]) -> GameDataset:
+    """Parse values.csv in one pass. Every problem is collected and raised together as DatasetError."""
+    with open(values_path, newline='', encoding='utf-8') as csvfile:
+        return parse_values(csvfile, event_key, player_key, values_path)
+
+
+def parse_values(
+    lines: Iterable[str],
+    event_key: Dict[str, int],
+    player_key: Dict[str, int],
+    source: str = 'values.csv',
+    header: Optional[List[str]] = None,
+    first_line: int = 2,
+) -> GameDataset:
+    """Parse values.csv rows from `lines` (an open file or strings).
+
+    Without `header` the first line is the header row. With it, `lines` holds data rows
+    only (e.g. rows appended to the file), numbered from `first_line` in error messages.
+    """
+    player_index: Dict[str, int] = {}
+    player_names: List[str] = []
+    game_event: List[int] = []
+    game_names: List[str] = []
+    offsets: List[int] = [0]
+    seat_player: List[int] = []
+    seat_rank: List[int] = []
+    problems: List[str] = []
+    unknown_players: Dict[str, int] = {}
+    unknown_events: Dict[str, int] = {}
+    event_names: Dict[int, str] = {event_id: name for name, event_id in event_key.items()}
+
+    reader = csv.reader(lines)
+    if header is None:
+        header = next(reader, [])
+    column = {name: i for i, name in enumerate(header)}
+    event_col = column['event']
+    match_col = column['match']
+    seat_cols = [(column[f'player_{letter}'], column[f'rank_{letter}']) for letter in SEAT_LETTERS]
+    width = len(header)
+
+    for line_number, row in enumerate(reader, start=first_line):
+        if len(row) < width:
+            # short row (e.g. a half-written last line): missing cells read as empty
+            row += [''] * (width - len(row))
+        event_name = row[event_col]
+        event_id = event_key.get(event_name)
+        if event_id is None:
+            unknown_events.setdefault(event_name, line_number)
+            event_id = -1
+
+        seats: List[Tuple[str, str]] = [
+            (row[p], row[r]) for p, r in seat_cols if row[p] or row[r]
+        ]
+        if not MIN_SEATS <= len(seats) <= MAX_SEATS:
+            problems.append(f"line {line_number}: {len(seats)} seats (expected {MIN_SEATS}-{MAX_SEATS})")
+        seated = set()
+        for player, rank in seats:
+            if not player or not rank:
+                problems.append(f"line {line_number}: seat with player {player!r} and rank {rank!r}")
+                continue
+            try:
+                rank_value = int(rank)
+            except ValueError:
+                problems.append(f"line {line_number}: rank {rank!r} for {player!r} is not an integer")
+                continue
+            if player not in player_key:
+                unknown_players.setdefault(player, line_number)
+            if player in seated:
+                problems.append(f"line {line_number}: player {player!r} has more than one seat")
+            seated.add(player)
+            index = player_index.get(player)
+            if index is None:
+                index = len(player_names)
+                player_index[player] = index
+                player_names.append(player)
+            seat_player.append(index)
+            seat_rank.append(rank_value)
+
+        game_event.append(event_id)
+        game_names.append(row[match_col].strip())
+        offsets.append(len(seat_player))
+
+    # Suggestions come from indexes over the known names, built only when something is unknown
+    if unknown_events:
+        events = NameIndex(event_key)
+        for name, line_number in unknown_events.items():
+            problems.append(f"line {line_number}: unknown event {name!r} (not in events_rows.csv{events.hint(name)})")
+    if unknown_players:
+        players = NameIndex(player_key)
+        for name, line_number in unknown_players.items():
+            problems.append(f"line {line_number}: unknown player {name!r} (not in players_rows.csv{players.hint(name)})")
+    if problems:
+        raise DatasetError(f"{source}: {len(problems)} problem(s):\n  " + '\n  '.join(problems))
+
+    return GameDataset(
+        event_names=event_names,
+        game_event=np.array(game_event, dtype=np.int32),
+        game_names=game_names,
+        offsets=np.array(offsets, dtype=np.int64),
+        seat_player=np.array(seat_player, dtype=np.int32),
+        seat_rank=np.array(seat_rank, dtype=np.int16),
+        player_names=player_names,
+        player_db_ids=np.array([player_key[name] for name in player_names], dtype=np.int32),
+    )
@@ -0,0 +1,133 @@
+"""Streaming writers for main.py's exports: rows reach disk as the replay produces them.
+
+CSV exports are written a row at a time and JSON exports one top-level entry at a time,
+so no export is held as a list of rows or serialized into one big string. JSON exports
+come in three formats:
+
+- json: indented like json.dumps(obj, indent=2) (byte-identical), the default
+- compact: one JSON object with no whitespace
+- ndjson: one line per top-level entry, e.g. {"event": 12, "players": {...}}
+"""
+import csv
+import json
+from typing import IO, Iterable, Iterator, Optional, Sequence, Tuple
+
+EXPORT_FORMATS: Tuple[str, ...] = ('json', 'compact', 'ndjson')
+
+_COMPACT = (',', ':')
+
+
+def export_path(stem: str, export_format: str = 'json') -> str:
+    """File name for a JSON export: `stem`.ndjson for NDJSON, `stem`.json otherwise."""
+    return f"{stem}.ndjson" if export_format == 'ndjson' else f"{stem}.json"
+
+
+def _check_format(export_format: str) -> None:
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {export_format!r} (expected one of {', '.join(EXPORT_FORMATS)})")
+
+
+def _entry_chunk(key, value, export_format: str, first: bool, key_name: str, value_name: str) -> str:
+    if export_format == 'ndjson':
+        return json.dumps({key_name: key, value_name: value}, separators=_COMPACT) + '\n'
+    # JSON object keys are strings (event ids are ints in memory)
+    name = json.dumps(key if isinstance(key, str) else str(key))
+    if export_format == 'compact':
+        return ('{' if first else ',') + name + ':' + json.dumps(value, separators=_COMPACT)
+    body = json.dumps(value, indent=2).replace('\n', '\n  ')
+    return ('{\n  ' if first else ',\n  ') + name + ': ' + body
+
+
+def _closing_chunk(export_format: str, empty: bool) -> str:
+    if export_format == 'ndjson':
+        return ''
+    if empty:
+        return '{}'
+    return '}' if export_format == 'compact' else '\n}'
+
+
+def json_object_chunks(
+    items: Iterable[Tuple[object, object]],
+    export_format: str = 'json',
+    key_name: str = 'key',
+    value_name: str = 'value',
+) -> Iterator[str]:
+    """Text of a JSON object (or NDJSON lines) built from (key, value) pairs, one chunk per entry."""
+    _check_format(export_format)
+    first = True
+    for key, value in items:
+        yield _entry_chunk(key, value, export_format, first, key_name, value_name)
+        first = False
+    yield _closing_chunk(export_format, first)
+
+
+class JsonObjectExporter:
+    """Writes a JSON object (or NDJSON) to `path` one top-level entry at a time."""
+
+    def __init__(self, path: str, export_format: str = 'json', key_name: str = 'key', value_name: str = 'value'):
+        _check_format(export_format)
+        self.path = path
+        self.export_format = export_format
+        self.key_name = key_name
+        self.value_name = value_name
+        self.entry_count = 0
+        self._file: IO[str] = open(path, 'w', encoding='utf-8')
+
+    def write(self, key, value) -> None:
+        self._file.write(
+            _entry_chunk(key, value, self.export_format, self.entry_count == 0, self.key_name, self.value_name)
+        )
+        self.entry_count += 1
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self._file.write(_closing_chunk(self.export_format, self.entry_count == 0))
+        self._file.close()
+
+    def __enter__(self) -> 'JsonObjectExporter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def write_json_object(
+    path: str,
+    items: Iterable[Tuple[object, object]],
+    export_format: str = 'json',
+    key_name: str = 'key',
+    value_name: str = 'value',
+) -> None:
+    """Stream (key, value) pairs (e.g. a generator) to `path` as a JSON object or NDJSON."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(json_object_chunks(items, export_format, key_name, value_name))
+
+
+class CsvExporter:
+    """Writes CSV rows to `path` as they arrive. The file is only created once a row is written."""
+
+    def __init__(self, path: str, header: Sequence[str]):
+        self.path = path
+        self.header = list(header)
+        self.row_count = 0
+        self._file: Optional[IO[str]] = None
+        self._writer = None
+
+    def write(self, row: Sequence[object]) -> None:
+        if self._writer is None:
+            self._file = open(self.path, 'w', newline='')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(self.header)
+        self._writer.writerow(row)
+        self.row_count += 1
+
+    def close(self) -> None:
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+
+    def __enter__(self) -> 'CsvExporter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,302 @@
+"""Head-to-head records between every pair of players, per ladder and per event.
+
+The replay reports every game's seats and ranks (HeadToHeadRecorder, passed as
+RatingEngine(head_to_head=...)); build() turns them into a HeadToHead index:
+
+- players are interned to indexes; each player's opponents are a sorted slice of one
+  `opponent` array (CSR-style `offsets`), stored in both directions so "everyone X has
+  played" is a single slice
+- per pair row and ladder: games together, wins (finished ahead), losses and ties
+  (shared rank); per pair row, a slice of per-event records (event, games, wins, losses, ties)
+
+A pair lookup is a binary search over one player's opponents (a few dozen entries), so
+profile pages never rescan values.csv. main.py saves the index to head_to_head.bin (the
+input cache's mmap layout) and exports head_to_head.json; the CLI below queries the file:
+
+    uv run python head_to_head.py record "player a" "player b" --by-event
+    uv run python head_to_head.py opponents "player a" --ladder one_versus_one --top 10
+"""
+import argparse
+import sys
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from input_cache import read_sections, write_sections
+from ladders import LADDERS
+
+# Bump when the section list changes; older files are rejected (re-run main.py).
+HEAD_TO_HEAD_FORMAT = 1
+
+HEAD_TO_HEAD_FILE = 'head_to_head.bin'
+HEAD_TO_HEAD_EXPORT = 'head_to_head'
+
+_MAGIC = b'OSKH2H\x00\x00'
+_COUNTS = ('games', 'wins', 'losses', 'ties')
+
+
+class PairRecord(NamedTuple):
+    """One player's record against one opponent, from the first player's side."""
+    games: int
+    wins: int
+    losses: int
+    ties: int
+
+
+NO_GAMES = PairRecord(0, 0, 0, 0)
+
+
+class HeadToHeadRecorder:
+    """Counts every pair of seats in each replayed game, keyed by (player, player, event)."""
+
+    def __init__(self):
+        self.player_names: List[str] = []
+        self._index: Dict[str, int] = {}
+        # (a, b, event) with a < b -> [games, a ahead, b ahead, shared rank]
+        self._counts: Dict[Tuple[int, int, int], List[int]] = {}
+        self._event_ladders: Dict[int, Tuple[str, ...]] = {}
+
+    def _intern(self, player: str) -> int:
+        index = self._index.get(player)
+        if index is None:
+            index = self._index[player] = len(self.player_names)
+            self.player_names.append(player)
+        return index
+
+    def record(self, event: int, players: Sequence[str], ranks: Sequence[int], ladders: Sequence[str]) -> None:
+        self._event_ladders.setdefault(event, tuple(ladders))
+        seats = [(self._intern(player), rank) for player, rank in zip(players, ranks)]
+        counts = self._counts
+        for i, (a, rank_a) in enumerate(seats):
+            for b, rank_b in seats[i + 1:]:
+                # lower index first: one entry per pair however the seats are ordered
+                key, first, second = ((a, b, event), rank_a, rank_b) if a < b else ((b, a, event), rank_b, rank_a)
+                entry = counts.get(key)
+                if entry is None:
+                    entry = counts[key] = [0, 0, 0, 0]
+                entry[0] += 1
+                if first < second:
+                    entry[1] += 1
+                elif second < first:
+                    entry[2] += 1
+                else:
+                    entry[3] += 1
+
+    def build(self, event_names: Dict[int, str]) -> 'HeadToHead':
+        """Freeze the counts into the CSR index (both directions, sorted by player, opponent, event)."""
+        player_count = len(self.player_names)
+        keys = np.array(list(self._counts), dtype=np.int64).reshape(-1, 3)
+        counts = np.array(list(self._counts.values()), dtype=np.int32).reshape(-1, 4)
+        first, second, event = keys[:, 0], keys[:, 1], keys[:, 2]
+        games, ahead, behind, ties = counts.T
+        player = np.concatenate([first, second])
+        opponent = np.concatenate([second, first])
+        event = np.concatenate([event, event])
+        columns = {
+            'games': np.concatenate([games, games]),
+            'wins': np.concatenate([ahead, behind]),
+            'losses': np.concatenate([behind, ahead]),
+            'ties': np.concatenate([ties, ties]),
+        }
+        order = np.lexsort((event, opponent, player))
+        player, opponent, event = player[order], opponent[order], event[order]
+        columns = {name: column[order] for name, column in columns.items()}
+
+        # one pair row per (player, opponent); its events are a slice of the per-event arrays
+        new_pair = np.ones(len(player), dtype=bool)
+        new_pair[1:] = (player[1:] != player[:-1]) | (opponent[1:] != opponent[:-1])
+        pair_starts = np.flatnonzero(new_pair)
+        pair_of_row = np.cumsum(new_pair) - 1
+        pair_count = len(pair_starts)
+        pair_player = player[pair_starts]
+
+        ladders: Dict[str, Dict[str, np.ndarray]] = {}
+        for ladder in LADDERS:
+            in_ladder = np.array([ladder in self._event_ladders[e] for e in event.tolist()], dtype=bool)
+            ladders[ladder] = {
+                name: np.bincount(pair_of_row[in_ladder], weights=column[in_ladder], minlength=pair_count).astype(np.int32)
+                for name, column in columns.items()
+            }
+
+        return HeadToHead(
+            list(self.player_names),
+            np.searchsorted(pair_player, np.arange(player_count + 1)).astype(np.int64),
+            opponent[pair_starts].astype(np.int32),
+            ladders,
+            np.append(pair_starts, len(player)).astype(np.int64),
+            event.astype(np.int32),
+            {name: column.astype(np.int32) for name, column in columns.items()},
+            {e: event_names.get(e, str(e)) for e in self._event_ladders},
+        )
+
+
+class HeadToHead:
+    """Query API over the head-to-head index (see the module docstring)."""
+
+    def __init__(
+        self,
+        player_names: List[str],
+        offsets: np.ndarray,
+        opponent: np.ndarray,
+        ladders: Dict[str, Dict[str, np.ndarray]],
+        event_offsets: np.ndarray,
+        event: np.ndarray,
+        event_counts: Dict[str, np.ndarray],
+        event_names: Dict[int, str],
+    ):
+        self.player_names = player_names
+        self.player_index = {name: index for index, name in enumerate(player_names)}
+        # player index -> [offsets[i], offsets[i + 1]) pair rows, opponents ascending
+        self.offsets = offsets
+        self.opponent = opponent
+        # ladder -> count name -> per pair row
+        self.ladders = ladders
+        # pair row -> [event_offsets[r], event_offsets[r + 1]) in event / event_counts
+        self.event_offsets = event_offsets
+        self.event = event
+        self.event_counts = event_counts
+        self.event_names = event_names
+
+    def _player(self, name: str) -> int:
+        index = self.player_index.get(name)
+        if index is None:
+            raise KeyError(f"No head-to-head games for player {name!r}")
+        return index
+
+    def _pair_row(self, player: str, opponent: str) -> Optional[int]:
+        index, other = self._player(player), self._player(opponent)
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        position = start + int(np.searchsorted(self.opponent[start:end], other))
+        return position if position < end and self.opponent[position] == other else None
+
+    def _record(self, counts: Dict[str, np.ndarray], row: int) -> PairRecord:
+        return PairRecord(*(int(counts[name][row]) for name in _COUNTS))
+
+    def record(self, player: str, opponent: str, ladder: str = 'all_time') -> PairRecord:
+        """`player`'s record against `opponent` on `ladder` (NO_GAMES if they never met there)."""
+        row = self._pair_row(player, opponent)
+        return NO_GAMES if row is None else self._record(self.ladders[ladder], row)
+
+    def by_event(self, player: str, opponent: str) -> List[Tuple[int, PairRecord]]:
+        """(event id, record) for every event the two played in, in event id order."""
+        row = self._pair_row(player, opponent)
+        if row is None:
+            return []
+        start, end = int(self.event_offsets[row]), int(self.event_offsets[row + 1])
+        return [(int(self.event[position]), self._record(self.event_counts, position)) for position in range(start, end)]
+
+    def opponents(self, player: str, ladder: str = 'all_time') -> List[Tuple[str, PairRecord]]:
+        """Everyone `player` met on `ladder`, most games together first."""
+        index = self._player(player)
+        counts = self.ladders[ladder]
+        rows = range(int(self.offsets[index]), int(self.offsets[index + 1]))
+        records = [
+            (self.player_names[int(self.opponent[row])], self._record(counts, row))
+            for row in rows if counts['games'][row]
+        ]
+        records.sort(key=lambda item: (-item[1].games, item[0]))
+        return records
+
+    def export_items(self) -> Iterator[Tuple[str, Dict[str, Dict[str, List[int]]]]]:
+        """(player, {opponent: {ladder: [games, wins, losses, ties]}}) per player, for the JSON export."""
+        for index, player in enumerate(self.player_names):
+            opponents = {}
+            for row in range(int(self.offsets[index]), int(self.offsets[index + 1])):
+                opponents[self.player_names[int(self.opponent[row])]] = {
+                    ladder: [int(counts[name][row]) for name in _COUNTS]
+                    for ladder, counts in self.ladders.items() if counts['games'][row]
+                }
+            yield player, opponents
+
+    # Storage
+
+    def save(self, path: str = HEAD_TO_HEAD_FILE) -> bool:
+        """Write the index (atomically); False if a name holds the section separator."""
+        arrays: Dict[str, np.ndarray] = {
+            'offsets': self.offsets,
+            'opponent': self.opponent,
+            'event_offsets': self.event_offsets,
+            'event': self.event,
+            'event_ids': np.array(sorted(self.event_names), dtype=np.int32),
+        }
+        for name in _COUNTS:
+            arrays[f'event.{name}'] = self.event_counts[name]
+            for ladder, counts in self.ladders.items():
+                arrays[f'{ladder}.{name}'] = counts[name]
+        strings = {
+            'player_names': self.player_names,
+            'event_names': [self.event_names[event] for event in sorted(self.event_names)],
+        }
+        header = {'format': HEAD_TO_HEAD_FORMAT, 'ladders': list(self.ladders)}
+        return write_sections(path, _MAGIC, header, arrays, strings)
+
+    @classmethod
+    def load(cls, path: str = HEAD_TO_HEAD_FILE) -> Optional['HeadToHead']:
+        """Map a saved index; None if missing, corrupt or from another format."""
+        sections = read_sections(path, _MAGIC)
+        if sections is None:
+            return None
+        header, arrays, strings = sections
+        if header.get('format') != HEAD_TO_HEAD_FORMAT:
+            return None
+        try:
+            return cls(
+                strings['player_names'],
+                arrays['offsets'],
+                arrays['opponent'],
+                {ladder: {name: arrays[f'{ladder}.{name}'] for name in _COUNTS} for ladder in header['ladders']},
+                arrays['event_offsets'],
+                arrays['event'],
+                {name: arrays[f'event.{name}'] for name in _COUNTS},
+                dict(zip(arrays['event_ids'].tolist(), strings['event_names'])),
+            )
+        except KeyError:
+            return None
+
+
+def _describe(record: PairRecord) -> str:
+    return f"{record.games} games: {record.wins} won, {record.losses} lost, {record.ties} tied"
+
+
+def main(argv=None) -> int:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--index', default=HEAD_TO_HEAD_FILE, help=f'Head-to-head file (default: {HEAD_TO_HEAD_FILE}).')
+    common.add_argument('--ladder', choices=LADDERS, default='all_time', help='Rating ladder (default: all_time).')
+    parser = argparse.ArgumentParser(description='Query the head-to-head records written by main.py.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record = commands.add_parser('record', parents=[common], help="One player's record against another.")
+    record.add_argument('player')
+    record.add_argument('opponent')
+    record.add_argument('--by-event', action='store_true', help='Also list the record in each event they met.')
+
+    opponents = commands.add_parser('opponents', parents=[common], help='Everyone a player has met, most games first.')
+    opponents.add_argument('player')
+    opponents.add_argument('--top', type=int, default=10, help='How many opponents to list (default: 10; 0 for all).')
+    args = parser.parse_args(argv)
+
+    index = HeadToHead.load(args.index)
+    if index is None:
+        print(f"Error: No head-to-head index at {args.index} (run main.py first).", file=sys.stderr)
+        return 1
+
+    try:
+        if args.command == 'record':
+            print(f"{args.player} vs {args.opponent} ({args.ladder}): "
+                  f"{_describe(index.record(args.player, args.opponent, args.ladder))}")
+            if args.by_event:
+                for event, event_record in index.by_event(args.player, args.opponent):
+                    print(f"  {index.event_names.get(event, event)}: {_describe(event_record)}")
+        else:
+            met = index.opponents(args.player, args.ladder)
+            print(f"{args.player} ({args.ladder}): {len(met)} opponents")
+            for opponent, opponent_record in met[:args.top] if args.top else met:
+                print(f"  {opponent:<30} {_describe(opponent_record)}")
+    except KeyError as e:
+        print(f"Error: {e.args[0]}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
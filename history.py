@@ -0,0 +1,387 @@
+"""Per-player rating history on every ladder, indexed for point-in-time queries.
+
+The replay records every post-game rating (HistoryRecorder, passed as
+RatingEngine(history=...)); build() turns it into a RatingHistory:
+
+- per ladder and player, append-only arrays of (game, mu, sigma, ordinal), stored CSR-style
+  (an offsets array into the concatenated columns); `game` is the values.csv row index
+- a game -> date index from events_rows.csv start_date, and each event's participants
+
+Point lookups are binary searches over one player's games or the date index (O(log n)).
+main.py saves the history to rating_history.bin (the input cache's mmap layout) and the
+CLI below queries it without replaying:
+
+    uv run python history.py rating "some player" --on 2024-06-01
+    uv run python history.py rating "some player" --before-game 1200 --ladder three_and_four_player
+    uv run python history.py delta "some player" --from 2024-01-01 --to 2024-12-31
+    uv run python history.py movers "Some Event" --top 10
+"""
+import argparse
+import datetime
+import sys
+from array import array
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from dataset import GameDataset
+from input_cache import read_sections, write_sections
+from ladders import LADDERS
+from rating_engine import DEFAULT_SITE_RATING, site_ordinal
+
+# Bump when the section list changes; older files are rejected (re-run main.py).
+HISTORY_FORMAT = 1
+
+HISTORY_FILE = 'rating_history.bin'
+
+_MAGIC = b'OSKHIST\x00'
+_EPOCH = datetime.date(1970, 1, 1)
+# game_day for games whose event has no start_date
+_NO_DATE = -1
+
+
+class HistoryPoint(NamedTuple):
+    # values.csv row of the game this rating followed; -1 before the player's first game
+    game: int
+    mu: float
+    sigma: float
+    # site scale: (mu - 3 * sigma) * 24 + 1200
+    ordinal: float
+
+
+UNRATED = HistoryPoint(-1, DEFAULT_SITE_RATING['mu'], DEFAULT_SITE_RATING['sigma'], DEFAULT_SITE_RATING['ordinal'])
+
+
+class Mover(NamedTuple):
+    player: str
+    before: HistoryPoint
+    after: HistoryPoint
+    # after.ordinal - before.ordinal
+    delta: float
+
+
+class LadderSeries(NamedTuple):
+    # player index -> [offsets[i], offsets[i + 1]) in the columns below
+    offsets: np.ndarray
+    game: np.ndarray
+    mu: np.ndarray
+    sigma: np.ndarray
+    ordinal: np.ndarray
+
+
+def parse_day(value: str) -> int:
+    """'YYYY-MM-DD' (anything after the date is ignored) -> days since 1970-01-01."""
+    return (datetime.date.fromisoformat(value[:10]) - _EPOCH).days
+
+
+def format_day(day: int) -> str:
+    return '' if day == _NO_DATE else (_EPOCH + datetime.timedelta(days=int(day))).isoformat()
+
+
+class HistoryRecorder:
+    """Collects post-game ratings during the replay; one append per player per rated ladder."""
+
+    def __init__(self):
+        # ladder -> player -> (games, mus, sigmas)
+        self._series: Dict[str, Dict[str, Tuple[array, array, array]]] = {ladder: {} for ladder in LADDERS}
+
+    def record(self, ladder: str, game: int, players: Sequence[str], mus: Sequence[float], sigmas: Sequence[float]) -> None:
+        series = self._series[ladder]
+        for player, mu, sigma in zip(players, mus, sigmas):
+            entry = series.get(player)
+            if entry is None:
+                entry = series[player] = (array('i'), array('d'), array('d'))
+            entry[0].append(game)
+            entry[1].append(mu)
+            entry[2].append(sigma)
+
+    def build(self, dataset: GameDataset, event_dates: Dict[int, str]) -> 'RatingHistory':
+        """Freeze the recorded series and index them against values.csv rows and event dates."""
+        player_names = list(dict.fromkeys(
+            player for ladder in LADDERS for player in self._series[ladder]
+        ))
+        ladders: Dict[str, LadderSeries] = {}
+        for ladder in LADDERS:
+            series = self._series[ladder]
+            lengths = np.array([len(series[p][0]) if p in series else 0 for p in player_names], dtype=np.int64)
+            offsets = np.zeros(len(player_names) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=offsets[1:])
+            columns = []
+            for column, dtype in ((0, np.int32), (1, np.float64), (2, np.float64)):
+                parts = [np.frombuffer(series[p][column], dtype=dtype) for p in player_names if p in series]
+                columns.append(np.concatenate(parts) if parts else np.zeros(0, dtype=dtype))
+            games, mus, sigmas = columns
+            ladders[ladder] = LadderSeries(offsets, games, mus, sigmas, site_ordinal(mus, sigmas))
+
+        game_event = np.asarray(dataset.game_event, dtype=np.int32)
+        days = {}
+        for event, value in event_dates.items():
+            try:
+                days[event] = parse_day(value)
+            except ValueError:
+                days[event] = _NO_DATE
+        game_day = np.array([days.get(event, _NO_DATE) for event in game_event.tolist()], dtype=np.int32)
+
+        # Participants per event: unique (event, player) pairs over all seats
+        player_index = {name: index for index, name in enumerate(player_names)}
+        to_history = np.array([player_index.get(name, -1) for name in dataset.player_names], dtype=np.int64)
+        seat_event = np.repeat(game_event.astype(np.int64), np.diff(dataset.offsets))
+        pairs = np.unique(seat_event * len(player_names) + to_history[np.asarray(dataset.seat_player)])
+        pair_events = pairs // max(1, len(player_names))
+        event_ids, starts = np.unique(pair_events, return_index=True)
+        event_offsets = np.append(starts, len(pairs)).astype(np.int64)
+        event_players = (pairs % max(1, len(player_names))).astype(np.int32)
+
+        return RatingHistory(
+            player_names,
+            ladders,
+            game_event,
+            game_day,
+            {event: dataset.event_names.get(event, str(event)) for event in event_ids.tolist()},
+            event_ids.astype(np.int32),
+            event_offsets,
+            event_players,
+        )
+
+
+class RatingHistory:
+    """Query API over the rating history (see the module docstring)."""
+
+    def __init__(
+        self,
+        player_names: List[str],
+        ladders: Dict[str, LadderSeries],
+        game_event: np.ndarray,
+        game_day: np.ndarray,
+        event_names: Dict[int, str],
+        event_ids: np.ndarray,
+        event_offsets: np.ndarray,
+        event_players: np.ndarray,
+    ):
+        self.player_names = player_names
+        self.player_index = {name: index for index, name in enumerate(player_names)}
+        self.ladders = ladders
+        self.game_event = game_event
+        self.game_day = game_day
+        # Games are replayed in values.csv order; "on date D" means every row up to the last
+        # one before a later-dated row, so the index is the running max of the row dates.
+        self.date_index = np.maximum.accumulate(game_day) if len(game_day) else game_day
+        self.event_names = event_names
+        self.event_key = {name: event for event, name in event_names.items()}
+        self.event_ids = event_ids
+        self.event_offsets = event_offsets
+        self.event_players = event_players
+        # first and last values.csv row of each event
+        self._event_rows: Dict[int, Tuple[int, int]] = {}
+        if len(game_event):
+            events, first = np.unique(game_event, return_index=True)
+            _, last = np.unique(game_event[::-1], return_index=True)
+            last = len(game_event) - 1 - last
+            self._event_rows = dict(zip(events.tolist(), zip(first.tolist(), last.tolist())))
+
+    def __len__(self) -> int:
+        return len(self.game_event)
+
+    # Lookups
+
+    def _point(self, series: LadderSeries, index: int) -> HistoryPoint:
+        return HistoryPoint(
+            int(series.game[index]), float(series.mu[index]), float(series.sigma[index]), float(series.ordinal[index])
+        )
+
+    def rating_after(self, player: str, game: int, ladder: str = 'all_time') -> HistoryPoint:
+        """The player's rating after values.csv row `game` (their latest game at or before it)."""
+        series = self.ladders[ladder]
+        index = self.player_index.get(player)
+        if index is None:
+            raise KeyError(f"No rating history for player {player!r}")
+        start, end = int(series.offsets[index]), int(series.offsets[index + 1])
+        position = start + int(np.searchsorted(series.game[start:end], game, side='right'))
+        return self._point(series, position - 1) if position > start else UNRATED
+
+    def rating_before(self, player: str, game: int, ladder: str = 'all_time') -> HistoryPoint:
+        """The player's rating going into values.csv row `game`."""
+        return self.rating_after(player, game - 1, ladder)
+
+    def ratings_after(self, game: int, ladder: str = 'all_time') -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """(players, mu, sigma) of everyone rated on `ladder` by values.csv row `game`, in one pass."""
+        series = self.ladders[ladder]
+        # Each player's games are sorted, so the ones at or before `game` are a prefix of their slice.
+        played = np.zeros(len(series.game) + 1, dtype=np.int64)
+        np.cumsum(series.game <= game, out=played[1:])
+        starts, ends = series.offsets[:-1], series.offsets[1:]
+        counts = played[ends] - played[starts]
+        rated = np.flatnonzero(counts)
+        last = starts[rated] + counts[rated] - 1
+        return [self.player_names[index] for index in rated.tolist()], series.mu[last], series.sigma[last]
+
+    def games_through(self, date: str) -> int:
+        """Number of leading values.csv rows played on or before `date` (YYYY-MM-DD)."""
+        return int(np.searchsorted(self.date_index, parse_day(date), side='right'))
+
+    def games_before(self, date: str) -> int:
+        """Number of leading values.csv rows played before `date` (YYYY-MM-DD)."""
+        return int(np.searchsorted(self.date_index, parse_day(date), side='left'))
+
+    def rating_on(self, player: str, date: str, ladder: str = 'all_time') -> HistoryPoint:
+        """The player's rating at the end of `date`."""
+        return self.rating_before(player, self.games_through(date), ladder)
+
+    def rating_delta(self, player: str, start: str, end: str, ladder: str = 'all_time') -> Mover:
+        """Rating going into `start` vs at the end of `end` (dates, inclusive)."""
+        before = self.rating_before(player, self.games_before(start), ladder)
+        after = self.rating_on(player, end, ladder)
+        return Mover(player, before, after, after.ordinal - before.ordinal)
+
+    def game_date(self, game: int) -> str:
+        return format_day(int(self.game_day[game])) if 0 <= game < len(self.game_day) else ''
+
+    def resolve_event(self, event) -> int:
+        """Event id from an id or an event name."""
+        if isinstance(event, str) and event in self.event_key:
+            return self.event_key[event]
+        try:
+            event_id = int(event)
+        except (TypeError, ValueError):
+            raise KeyError(f"Unknown event {event!r}") from None
+        if event_id not in self._event_rows:
+            raise KeyError(f"Unknown event {event!r}")
+        return event_id
+
+    def event_players_of(self, event: int) -> List[str]:
+        position = int(np.searchsorted(self.event_ids, event))
+        if position == len(self.event_ids) or self.event_ids[position] != event:
+            return []
+        start, end = self.event_offsets[position], self.event_offsets[position + 1]
+        return [self.player_names[index] for index in self.event_players[start:end].tolist()]
+
+    def event_movers(self, event, ladder: str = 'all_time', top: Optional[int] = None) -> List[Mover]:
+        """Each participant's rating change across the event, largest absolute change first."""
+        event = self.resolve_event(event)
+        first, last = self._event_rows[event]
+        movers = []
+        for player in self.event_players_of(event):
+            before = self.rating_before(player, first, ladder)
+            after = self.rating_after(player, last, ladder)
+            movers.append(Mover(player, before, after, after.ordinal - before.ordinal))
+        movers.sort(key=lambda mover: (-abs(mover.delta), mover.player))
+        return movers[:top] if top else movers
+
+    # Storage
+
+    def save(self, path: str = HISTORY_FILE) -> bool:
+        """Write the history (atomically); False if a name holds the section separator."""
+        arrays: Dict[str, np.ndarray] = {
+            'game_event': self.game_event,
+            'game_day': self.game_day,
+            'event_ids': self.event_ids,
+            'event_offsets': self.event_offsets,
+            'event_players': self.event_players,
+        }
+        for ladder, series in self.ladders.items():
+            for column in LadderSeries._fields:
+                arrays[f'{ladder}.{column}'] = getattr(series, column)
+        strings = {
+            'player_names': self.player_names,
+            'event_names': [self.event_names[event] for event in self.event_ids.tolist()],
+        }
+        header = {'format': HISTORY_FORMAT, 'ladders': list(self.ladders)}
+        return write_sections(path, _MAGIC, header, arrays, strings)
+
+    @classmethod
+    def load(cls, path: str = HISTORY_FILE) -> Optional['RatingHistory']:
+        """Map a saved history; None if missing, corrupt or from another format."""
+        sections = read_sections(path, _MAGIC)
+        if sections is None:
+            return None
+        header, arrays, strings = sections
+        if header.get('format') != HISTORY_FORMAT:
+            return None
+        try:
+            ladders = {
+                ladder: LadderSeries(*(arrays[f'{ladder}.{column}'] for column in LadderSeries._fields))
+                for ladder in header['ladders']
+            }
+            event_ids = arrays['event_ids']
+            return cls(
+                strings['player_names'],
+                ladders,
+                arrays['game_event'],
+                arrays['game_day'],
+                dict(zip(event_ids.tolist(), strings['event_names'])),
+                event_ids,
+                arrays['event_offsets'],
+                arrays['event_players'],
+            )
+        except KeyError:
+            return None
+
+
+def _describe(point: HistoryPoint, history: RatingHistory) -> str:
+    if point.game < 0:
+        return f"mu {point.mu:.3f}  sigma {point.sigma:.3f}  ordinal {point.ordinal:.1f}  (no games yet)"
+    date = history.game_date(point.game)
+    return (
+        f"mu {point.mu:.3f}  sigma {point.sigma:.3f}  ordinal {point.ordinal:.1f}  "
+        f"(after game {point.game}{', ' + date if date else ''})"
+    )
+
+
+def main(argv=None) -> int:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--history', default=HISTORY_FILE, help=f'History file (default: {HISTORY_FILE}).')
+    common.add_argument('--ladder', choices=LADDERS, default='all_time', help='Rating ladder (default: all_time).')
+    parser = argparse.ArgumentParser(description='Query the rating history written by main.py.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    rating = commands.add_parser('rating', parents=[common], help="A player's rating at a point in time.")
+    rating.add_argument('player')
+    when = rating.add_mutually_exclusive_group()
+    when.add_argument('--before-game', type=int, metavar='N', help='Going into values.csv row N (0-based).')
+    when.add_argument('--on', metavar='DATE', help='At the end of DATE (YYYY-MM-DD).')
+
+    delta = commands.add_parser('delta', parents=[common], help="A player's rating change between two dates.")
+    delta.add_argument('player')
+    delta.add_argument('--from', dest='start', required=True, metavar='DATE')
+    delta.add_argument('--to', dest='end', required=True, metavar='DATE')
+
+    movers = commands.add_parser('movers', parents=[common], help='Largest rating changes across one event.')
+    movers.add_argument('event', help='Event name or id.')
+    movers.add_argument('--top', type=int, default=10, help='How many players to list (default: 10; 0 for all).')
+    args = parser.parse_args(argv)
+
+    history = RatingHistory.load(args.history)
+    if history is None:
+        print(f"Error: No rating history at {args.history} (run main.py first).", file=sys.stderr)
+        return 1
+
+    try:
+        if args.command == 'rating':
+            if args.before_game is not None:
+                point, label = history.rating_before(args.player, args.before_game, args.ladder), f"before game {args.before_game}"
+            elif args.on:
+                point, label = history.rating_on(args.player, args.on, args.ladder), f"on {args.on}"
+            else:
+                point, label = history.rating_after(args.player, len(history) - 1, args.ladder), "now"
+            print(f"{args.player} ({args.ladder}) {label}: {_describe(point, history)}")
+        elif args.command == 'delta':
+            change = history.rating_delta(args.player, args.start, args.end, args.ladder)
+            print(f"{args.player} ({args.ladder}) {args.start} .. {args.end}: ordinal {change.delta:+.1f}")
+            print(f"  before: {_describe(change.before, history)}")
+            print(f"  after:  {_describe(change.after, history)}")
+        else:
+            event = history.resolve_event(args.event)
+            print(f"{history.event_names[event]} ({args.ladder}):")
+            for mover in history.event_movers(event, args.ladder, args.top):
+                print(f"  {mover.player:<30} {mover.before.ordinal:>8.1f} -> {mover.after.ordinal:>8.1f}  {mover.delta:+8.1f}")
+    except KeyError as e:
+        print(f"Error: {e.args[0]}", file=sys.stderr)
+        return 1
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
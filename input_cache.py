@@ -0,0 +1,251 @@
+"""Binary cache of the parsed input CSVs, memory-mapped on load.
+
+values.csv, players_rows.csv and events_rows.csv are parsed once into interned tables
+(see dataset.py) and written to one fixed-layout file:
+
+    magic (8 bytes) | header length (uint64 LE) | JSON header | 64-byte aligned sections
+
+The header lists each section's dtype, length and offset, plus the sha256 of the three
+source files. A later run with the same content maps the file and wraps the numeric
+sections with np.frombuffer (no copy, no parsing); any edit to a source CSV changes the
+hash and the cache is rebuilt. Only the username and id columns of players_rows.csv are
+hashed: every live sync rewrites its current_rating column, which is not cached.
+"""
+import csv
+import hashlib
+import json
+import mmap
+import os
+import struct
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from dataset import GameDataset, load_values
+
+# Bump when the section list or header layout changes; old files are rebuilt.
+CACHE_FORMAT = 2
+
+DEFAULT_CACHE_DIR = '.input_cache'
+CACHE_FILE = 'inputs.bin'
+
+_MAGIC = b'OSKINPT\x00'
+_ALIGN = 64
+# Separator for string sections; values containing it are not cached.
+_SEP = '\x00'
+
+# GameDataset arrays stored as-is.
+_DATASET_ARRAYS = ('game_event', 'offsets', 'seat_player', 'seat_rank', 'player_db_ids')
+
+# The players_rows.csv columns the cache is built from.
+_PLAYER_COLUMNS = ('username', 'id')
+
+
+class Inputs(NamedTuple):
+    player_key: Dict[str, int]
+    event_key: Dict[str, int]
+    rated_event: Dict[int, str]
+    dataset: GameDataset
+    # event id -> start_date from events_rows.csv as YYYY-MM-DD ('' when blank)
+    event_dates: Dict[int, str]
+
+
+def _csv_columns(path: str, columns: Sequence[str]) -> bytes:
+    """`columns` of every row of a CSV, as the bytes to hash."""
+    with open(path, newline='', encoding='utf-8') as csvfile:
+        rows = [[row[column] for column in columns] for row in csv.DictReader(csvfile)]
+    return json.dumps(rows, separators=(',', ':')).encode('utf-8')
+
+
+def source_digest(paths: Sequence[str], columns: Optional[Dict[str, Sequence[str]]] = None) -> str:
+    """sha256 of the source files; a path in `columns` is hashed by those CSV columns only."""
+    digest = hashlib.sha256(f"format={CACHE_FORMAT}\n".encode())
+    for path in paths:
+        if columns and path in columns:
+            data = _csv_columns(path, columns[path])
+        else:
+            with open(path, 'rb') as f:
+                data = f.read()
+        digest.update(f"{os.path.basename(path)}:{len(data)}\n".encode())
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def load_reference_tables(
+    players_path: str, events_path: str
+) -> Tuple[Dict[str, int], Dict[str, int], Dict[int, str], Dict[int, str]]:
+    """(username -> player id, event name -> event id, event id -> rating_event, event id -> start date) from the CSVs."""
+    player_key: Dict[str, int] = {}
+    with open(players_path, newline='', encoding='utf-8') as csvfile:
+        for row in csv.DictReader(csvfile):
+            player_key[row['username']] = int(row['id'])
+
+    event_key: Dict[str, int] = {}
+    rated_event: Dict[int, str] = {}
+    event_dates: Dict[int, str] = {}
+    with open(events_path, newline='', encoding='utf-8') as csvfile:
+        for row in csv.DictReader(csvfile):
+            event_key[row['name']] = int(row['id'])
+            rated_event[int(row['id'])] = row['rating_event']
+            # '2020-05-10 00:00:00+00' -> '2020-05-10'
+            event_dates[int(row['id'])] = (row.get('start_date') or '')[:10]
+    return player_key, event_key, rated_event, event_dates
+
+
+def _pad(length: int) -> int:
+    return -length % _ALIGN
+
+
+def write_sections(
+    path: str,
+    magic: bytes,
+    header: dict,
+    arrays: Dict[str, np.ndarray],
+    strings: Dict[str, List[str]],
+) -> bool:
+    """Write numeric and string sections in the cache layout, atomically.
+
+    `header` gets the section table added. Returns False (and writes nothing) if a string
+    holds the separator.
+    """
+    if any(_SEP in value for values in strings.values() for value in values):
+        return False
+
+    blobs: List[Tuple[str, str, bytes, dict]] = []
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        blobs.append(('arrays', name, array.tobytes(), {'dtype': array.dtype.str, 'count': int(array.size)}))
+    for name, values in strings.items():
+        blobs.append(('strings', name, _SEP.join(values).encode('utf-8'), {'count': len(values)}))
+
+    header = dict(header, arrays={}, strings={})
+    # Offsets are relative to the first section, so the header size does not feed back into them.
+    position = 0
+    for kind, name, data, meta in blobs:
+        header[kind][name] = dict(meta, offset=position, nbytes=len(data))
+        position += len(data) + _pad(len(data))
+    header_bytes = json.dumps(header, separators=(',', ':')).encode()
+    prefix_length = len(magic) + 8 + len(header_bytes)
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(magic)
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b'\x00' * _pad(prefix_length))
+        for _, _, data, _ in blobs:
+            f.write(data)
+            f.write(b'\x00' * _pad(len(data)))
+    os.replace(tmp_path, path)
+    return True
+
+
+def read_sections(
+    path: str, magic: bytes
+) -> Optional[Tuple[dict, Dict[str, np.ndarray], Dict[str, List[str]]]]:
+    """(header, arrays, strings) from a file written by write_sections; None if missing or corrupt.
+
+    Arrays are read-only views over the memory-mapped file.
+    """
+    try:
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        if buffer[:len(magic)] != magic:
+            return None
+        (header_length,) = struct.unpack_from('<Q', buffer, len(magic))
+        header_start = len(magic) + 8
+        header = json.loads(bytes(buffer[header_start:header_start + header_length]))
+        base = header_start + header_length
+        base += _pad(base)
+
+        arrays = {
+            name: np.frombuffer(buffer, dtype=np.dtype(meta['dtype']), count=meta['count'], offset=base + meta['offset'])
+            for name, meta in header['arrays'].items()
+        }
+        strings: Dict[str, List[str]] = {}
+        for name, meta in header['strings'].items():
+            start = base + meta['offset']
+            text = buffer[start:start + meta['nbytes']].decode('utf-8')
+            strings[name] = text.split(_SEP) if meta['count'] else []
+    except (KeyError, ValueError, struct.error):
+        return None
+    return header, arrays, strings
+
+
+def write_cache(path: str, digest: str, inputs: Inputs) -> bool:
+    """Write `inputs` to `path` atomically. Returns False (and writes nothing) if a string holds the separator."""
+    dataset = inputs.dataset
+    arrays: Dict[str, np.ndarray] = {name: getattr(dataset, name) for name in _DATASET_ARRAYS}
+    arrays['player_ids'] = np.array(list(inputs.player_key.values()), dtype=np.int32)
+    arrays['event_ids'] = np.array(list(inputs.event_key.values()), dtype=np.int32)
+    strings: Dict[str, List[str]] = {
+        'player_names': dataset.player_names,
+        'game_names': dataset.game_names,
+        'usernames': list(inputs.player_key),
+        'event_names': list(inputs.event_key),
+        'rated_event': [inputs.rated_event[event_id] for event_id in inputs.event_key.values()],
+        'event_dates': [inputs.event_dates[event_id] for event_id in inputs.event_key.values()],
+    }
+    return write_sections(path, _MAGIC, {'format': CACHE_FORMAT, 'digest': digest}, arrays, strings)
+
+
+def read_cache(path: str, digest: str) -> Optional[Inputs]:
+    """Map `path` and rebuild Inputs from it; None if missing, corrupt or built from other sources."""
+    sections = read_sections(path, _MAGIC)
+    if sections is None:
+        return None
+    header, arrays, strings = sections
+    if header.get('format') != CACHE_FORMAT or header.get('digest') != digest:
+        return None
+
+    player_key = dict(zip(strings['usernames'], arrays['player_ids'].tolist()))
+    event_ids = arrays['event_ids'].tolist()
+    event_key = dict(zip(strings['event_names'], event_ids))
+    rated_event = dict(zip(event_ids, strings['rated_event']))
+    event_dates = dict(zip(event_ids, strings['event_dates']))
+    dataset = GameDataset(
+        event_names={event_id: name for name, event_id in event_key.items()},
+        game_event=arrays['game_event'],
+        game_names=strings['game_names'],
+        offsets=arrays['offsets'],
+        seat_player=arrays['seat_player'],
+        seat_rank=arrays['seat_rank'],
+        player_names=strings['player_names'],
+        player_db_ids=arrays['player_db_ids'],
+    )
+    return Inputs(player_key, event_key, rated_event, dataset, event_dates)
+
+
+def load_inputs(
+    values_path: str = 'values.csv',
+    players_path: str = 'players_rows.csv',
+    events_path: str = 'events_rows.csv',
+    cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+) -> Inputs:
+    """Parsed inputs from the cache when the CSVs are unchanged, otherwise parse and refresh it.
+
+    cache_dir=None always parses and leaves the cache alone. Raises dataset.DatasetError
+    for an invalid values.csv (nothing is cached then).
+    """
+    cache_path = os.path.join(cache_dir, CACHE_FILE) if cache_dir else None
+    digest = source_digest(
+        (values_path, players_path, events_path), {players_path: _PLAYER_COLUMNS}
+    ) if cache_path else ''
+    if cache_path:
+        cached = read_cache(cache_path, digest)
+        if cached is not None:
+            return cached
+
+    player_key, event_key, rated_event, event_dates = load_reference_tables(players_path, events_path)
+    dataset = load_values(values_path, event_key, player_key)
+    inputs = Inputs(player_key, event_key, rated_event, dataset, event_dates)
+    if cache_path:
+        try:
+            write_cache(cache_path, digest, inputs)
+        except OSError as e:
+            print(f"Warning: Could not write input cache {cache_path}: {e}")
+    return inputs
@@ -0,0 +1,126 @@
+"""Per-ladder rating replays, run in-process or one worker process per ladder.
+
+The all_time, one_versus_one and three_and_four_player ladders are independent
+sequences over the same values.csv rows; only the event -> category mapping decides
+which rows each consumes. Each ladder is rated on its own and the post-game values
+are merged back by row index, so the result does not depend on worker timing.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+LADDERS: Tuple[str, ...] = ('all_time', 'one_versus_one', 'three_and_four_player')
+
+# (row_index, event_id, players, ranks)
+Game = Tuple[int, int, List[str], List[int]]
+
+
+def game_ladders(event, one_versus_one_event_list, three_and_four_player_event_list) -> List[str]:
+    """Ladders a game in `event` is rated in (all_time always)."""
+    ladders = []
+    if event in one_versus_one_event_list:
+        ladders.append('one_versus_one')
+    if event in three_and_four_player_event_list:
+        ladders.append('three_and_four_player')
+    ladders.append('all_time')
+    return ladders
+
+
+def model_params(model) -> Dict[str, float]:
+    """Constructor arguments that rebuild `model` (a PlackettLuce) in a worker process."""
+    return {name: getattr(model, name) for name in ('mu', 'sigma', 'beta', 'kappa', 'tau')}
+
+
+def rate_ladder(
+    engine: str,
+    params: Dict[str, float],
+    start_ratings: Sequence[Tuple[str, float, float]],
+    players_per_game: Sequence[Sequence[str]],
+    ranks_per_game: Sequence[Sequence[int]],
+) -> List[Tuple[List[float], List[float]]]:
+    """Rate one ladder's games in order from `start_ratings` ([(player, mu, sigma)]).
+
+    Returns post-game (mus, sigmas) per game, in seat order. Top-level so it can run in a
+    worker process.
+    """
+    if engine == 'numpy':
+        from array_engine import ArrayPlackettLuce
+
+        array_model = ArrayPlackettLuce(**params)
+        for player, mu, sigma in start_ratings:
+            array_model.set_rating(player, mu, sigma)
+        offsets, mu_after, sigma_after = array_model.rate_games(players_per_game, ranks_per_game)
+        offsets = offsets.tolist()
+        mu_after = mu_after.tolist()
+        sigma_after = sigma_after.tolist()
+        return [
+            (mu_after[offsets[g]:offsets[g + 1]], sigma_after[offsets[g]:offsets[g + 1]])
+            for g in range(len(players_per_game))
+        ]
+
+    from openskill.models import PlackettLuce
+
+    model = PlackettLuce(**params)
+    ratings = {player: model.rating(mu=mu, sigma=sigma, name=player) for player, mu, sigma in start_ratings}
+    results = []
+    for players, ranks in zip(players_per_game, ranks_per_game):
+        for player in players:
+            if player not in ratings:
+                ratings[player] = model.rating(name=player)
+        updated = model.rate(teams=[[ratings[player]] for player in players], ranks=list(ranks))
+        for player, team in zip(players, updated):
+            ratings[player] = team[0]
+        results.append(([team[0].mu for team in updated], [team[0].sigma for team in updated]))
+    return results
+
+
+def _timed_rate_ladder(*args) -> Tuple[List[Tuple[List[float], List[float]]], float, float]:
+    """rate_ladder plus the wall and CPU seconds it took (measured inside the worker)."""
+    wall, cpu = time.perf_counter(), time.process_time()
+    results = rate_ladder(*args)
+    return results, time.perf_counter() - wall, time.process_time() - cpu
+
+
+def precompute_ladder_ratings(
+    games: Sequence[Game],
+    player_ratings: Dict[str, Dict[str, object]],
+    one_versus_one_event_list,
+    three_and_four_player_event_list,
+    model,
+    engine: str = 'openskill',
+    parallel: bool = False,
+    timings: Optional[Dict[str, Tuple[float, float]]] = None,
+) -> Dict[str, Dict[int, Tuple[List[float], List[float]]]]:
+    """Rate every ladder up front; {ladder: {row_index: (mus, sigmas)}}.
+
+    Each ladder starts from the ratings already in player_ratings (e.g. restored from a
+    checkpoint). With parallel=True each ladder runs in its own process. If `timings` is
+    given it receives {ladder: (wall seconds, cpu seconds)} for each ladder's rating.
+    """
+    params = model_params(model)
+    jobs = {}
+    for ladder in player_ratings:
+        ladder_games = [
+            game for game in games
+            if ladder in game_ladders(game[1], one_versus_one_event_list, three_and_four_player_event_list)
+        ]
+        start = [(player, rating.mu, rating.sigma) for player, rating in player_ratings[ladder].items()]
+        jobs[ladder] = (
+            ladder_games,
+            (engine, params, start, [game[2] for game in ladder_games], [game[3] for game in ladder_games]),
+        )
+
+    if parallel:
+        with ProcessPoolExecutor(max_workers=len(jobs)) as pool:
+            futures = {ladder: pool.submit(_timed_rate_ladder, *args) for ladder, (_, args) in jobs.items()}
+            timed = {ladder: future.result() for ladder, future in futures.items()}
+    else:
+        timed = {ladder: _timed_rate_ladder(*args) for ladder, (_, args) in jobs.items()}
+    rated = {ladder: results for ladder, (results, _, _) in timed.items()}
+    if timings is not None:
+        timings.update({ladder: (wall, cpu) for ladder, (_, wall, cpu) in timed.items()})
+
+    return {
+        ladder: {game[0]: result for game, result in zip(jobs[ladder][0], rated[ladder])}
+        for ladder in jobs
+    }
@@ -0,0 +1,225 @@
+"""Order-statistics leaderboards: each ladder's players ranked by ordinal as the replay runs.
+
+OrderedScores is a sorted multiset kept in blocks of at most 2 * BLOCK_SIZE keys, with a
+Fenwick tree over the block lengths. add/remove are a bisect over the block maxima, an
+insort inside one block and a Fenwick update; rank and k-th lookups are a Fenwick prefix
+search plus a bisect. For a fixed block size every operation is O(log n).
+
+LeaderboardTracker holds one Leaderboard per ladder. RatingEngine(leaderboards=...) updates
+it after every rated game and takes a standings snapshot (top K plus the participants'
+ranks) as each event completes, so "standings after event E" and rank-over-time come
+straight from the replay.
+"""
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from ladders import LADDERS
+
+BLOCK_SIZE = 256
+
+# Players listed per ladder in each event's standings snapshot.
+DEFAULT_TOP_K = 100
+
+
+class OrderedScores:
+    """Sorted multiset of comparable keys with O(log n) add, remove, rank and k-th lookup."""
+
+    def __init__(self, block_size: int = BLOCK_SIZE):
+        self.block_size = block_size
+        self._blocks: List[list] = []
+        # last (largest) key of each block
+        self._maxes: list = []
+        # Fenwick tree over len(block), 1-based
+        self._tree: List[int] = [0]
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator:
+        for block in self._blocks:
+            yield from block
+
+    def _rebuild_tree(self) -> None:
+        tree = [0] * (len(self._blocks) + 1)
+        for index, block in enumerate(self._blocks, start=1):
+            tree[index] += len(block)
+            parent = index + (index & -index)
+            if parent < len(tree):
+                tree[parent] += tree[index]
+        self._tree = tree
+
+    def _tree_add(self, block: int, delta: int) -> None:
+        index = block + 1
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def _prefix(self, block: int) -> int:
+        """Number of keys in blocks[:block]."""
+        total = 0
+        while block > 0:
+            total += self._tree[block]
+            block -= block & -block
+        return total
+
+    def _locate(self, position: int) -> Tuple[int, int]:
+        """(block, offset) of the key at 0-based `position`."""
+        block = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            following = block + step
+            if following < len(self._tree) and self._tree[following] <= position:
+                block = following
+                position -= self._tree[following]
+            step >>= 1
+        return block, position
+
+    def add(self, key) -> None:
+        if not self._blocks:
+            self._blocks.append([key])
+            self._maxes.append(key)
+            self._rebuild_tree()
+            self._length = 1
+            return
+        index = min(bisect_left(self._maxes, key), len(self._blocks) - 1)
+        block = self._blocks[index]
+        insort(block, key)
+        self._maxes[index] = block[-1]
+        self._length += 1
+        if len(block) > 2 * self.block_size:
+            half = len(block) // 2
+            self._blocks[index:index + 1] = [block[:half], block[half:]]
+            self._maxes[index:index + 1] = [block[half - 1], block[-1]]
+            self._rebuild_tree()
+        else:
+            self._tree_add(index, 1)
+
+    def remove(self, key) -> None:
+        index = bisect_left(self._maxes, key)
+        if index == len(self._blocks):
+            raise KeyError(key)
+        block = self._blocks[index]
+        offset = bisect_left(block, key)
+        if offset == len(block) or block[offset] != key:
+            raise KeyError(key)
+        del block[offset]
+        self._length -= 1
+        if block:
+            self._maxes[index] = block[-1]
+            self._tree_add(index, -1)
+        else:
+            del self._blocks[index]
+            del self._maxes[index]
+            self._rebuild_tree()
+
+    def replace(self, old, new) -> None:
+        """remove(old) then add(new); the Fenwick tree is untouched when both fall in one block."""
+        maxes = self._maxes
+        index = bisect_left(maxes, old)
+        last = len(maxes) - 1
+        if index <= last and (index == last or new <= maxes[index]) and (index == 0 or new > maxes[index - 1]):
+            block = self._blocks[index]
+            offset = bisect_left(block, old)
+            if len(block) > 1 and offset < len(block) and block[offset] == old:
+                del block[offset]
+                insort(block, new)
+                maxes[index] = block[-1]
+                return
+        self.remove(old)
+        self.add(new)
+
+    def rank(self, key) -> int:
+        """Number of keys smaller than `key`."""
+        index = bisect_left(self._maxes, key)
+        if index == len(self._blocks):
+            return self._length
+        return self._prefix(index) + bisect_left(self._blocks[index], key)
+
+    def __getitem__(self, position: int):
+        if position < 0:
+            position += self._length
+        if not 0 <= position < self._length:
+            raise IndexError(position)
+        block, offset = self._locate(position)
+        return self._blocks[block][offset]
+
+    def islice(self, start: int, stop: int) -> Iterator:
+        """Keys at positions [start, stop) in order."""
+        stop = min(stop, self._length)
+        if start >= stop:
+            return
+        block, offset = self._locate(start)
+        remaining = stop - start
+        while remaining > 0:
+            chunk = self._blocks[block][offset:offset + remaining]
+            yield from chunk
+            remaining -= len(chunk)
+            block, offset = block + 1, 0
+
+
+class Leaderboard:
+    """Players ranked by ordinal, highest first; ties keep the order players first appeared in."""
+
+    def __init__(self, block_size: int = BLOCK_SIZE):
+        self._scores = OrderedScores(block_size)
+        # player -> (-ordinal, first-seen sequence); the sequence indexes _players
+        self._keys: Dict[str, Tuple[float, int]] = {}
+        self._players: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def __contains__(self, player: str) -> bool:
+        return player in self._keys
+
+    def __iter__(self) -> Iterator[Tuple[str, float]]:
+        """(player, ordinal) from first to last place."""
+        players = self._players
+        for ordinal, sequence in self._scores:
+            yield players[sequence], -ordinal
+
+    def update(self, player: str, ordinal: float) -> None:
+        old = self._keys.get(player)
+        if old is None:
+            key = self._keys[player] = (-ordinal, len(self._players))
+            self._players.append(player)
+            self._scores.add(key)
+        else:
+            key = self._keys[player] = (-ordinal, old[1])
+            self._scores.replace(old, key)
+
+    def rank(self, player: str) -> int:
+        """1-based place of `player` (KeyError if they have no rating on this ladder)."""
+        return self._scores.rank(self._keys[player]) + 1
+
+    def top(self, k: int) -> List[Tuple[str, float]]:
+        players = self._players
+        return [(players[sequence], -ordinal) for ordinal, sequence in self._scores.islice(0, k)]
+
+
+class LeaderboardTracker:
+    """One Leaderboard per ladder, plus standings snapshots for completed events."""
+
+    def __init__(self, top_k: int = DEFAULT_TOP_K, block_size: int = BLOCK_SIZE):
+        self.top_k = top_k
+        self.ladders: Dict[str, Leaderboard] = {ladder: Leaderboard(block_size) for ladder in LADDERS}
+
+    def update(self, ladder: str, players: Sequence[str], ordinals: Iterable[float]) -> None:
+        leaderboard = self.ladders[ladder]
+        for player, ordinal in zip(players, ordinals):
+            leaderboard.update(player, ordinal)
+
+    def snapshot(self, participants: Iterable[str]) -> Dict[str, dict]:
+        """{ladder: {'players': n, 'top': [[player, ordinal], ...], 'ranks': {participant: rank}}}."""
+        participants = list(participants)
+        standings = {}
+        for ladder, leaderboard in self.ladders.items():
+            if not len(leaderboard):
+                continue
+            standings[ladder] = {
+                'players': len(leaderboard),
+                'top': [[player, ordinal] for player, ordinal in leaderboard.top(self.top_k)],
+                'ranks': {player: leaderboard.rank(player) for player in participants if player in leaderboard},
+            }
+        return standings
@@ -1,162 +1,95 @@
+"""CLI: replay values.csv (rating_engine.py), then sync to Supabase and write the exports.
+
+Importing this module does no I/O; .env, the input CSVs and the Supabase client are only
+loaded when main() runs.
+"""
 import argparse
 import csv
 import json
 import os
 import sys
-from typing import Dict, List, Optional, Set, Tuple
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
 from urllib.parse import urlparse
-from dotenv import load_dotenv
-from openskill.models import PlackettLuce
-from supabase import create_client, Client
-
-# Fix Windows console encoding
-if sys.platform == 'win32':
-    import io
-    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', write_through=True)
-    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', write_through=True)
-
-# Load environment variables
-load_dotenv()
-
-# Supabase configuration
-SUPABASE_URL = os.getenv('SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_KEY')
-
-# Initialize Supabase client (will be None if credentials not provided)
-supabase: Optional[Client] = None
-if SUPABASE_URL and SUPABASE_KEY:
-    try:
-        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-    except Exception as e:
-        print(f"Warning: Could not initialize Supabase client: {e}")
-        print("Continuing without Supabase integration. CSV files will still be generated.")
-
-# Grab the event name and id from the events_rows.csv file
+from checkpoints import DEFAULT_CHECKPOINT_DIR
+from contextlib import ExitStack
+from dataset import DatasetError, GameDataset, parse_values
+from head_to_head import HEAD_TO_HEAD_EXPORT, HEAD_TO_HEAD_FILE, HeadToHeadRecorder
+from history import HISTORY_FILE, HistoryRecorder
+from leaderboard import LeaderboardTracker
+from exporters import EXPORT_FORMATS, CsvExporter, JsonObjectExporter, export_path, write_json_object
+from input_cache import DEFAULT_CACHE_DIR, load_inputs
+from metrics import RunMetrics
+from mirror import DEFAULT_MIRROR_PATH, SupabaseMirror
+from async_sync import DEFAULT_WRITE_CONCURRENCY, AsyncBatchWriter, AsyncSupabaseSync
+from rating_engine import DEFAULT_SITE_RATING, ENGINES, RatingEngine, ReplayedGame, site_rating
+from shards import ShardedExporter
+from snapshot import DEFAULT_LOAD_CONCURRENCY, MODE_TABLES, SnapshotLoader, supabase_page_fetcher, supabase_row_counter
+from strength_of_schedule import STRENGTH_OF_SCHEDULE_EXPORT, StrengthOfSchedule
+from sync_journal import DEFAULT_JOURNAL_PATH, JournalState, SyncJournal, read_journal
+from sync_writer import BatchWriter, ChangeSet, GameIdAllocator
+from watch import APPEND, DEFAULT_WATCH_INTERVAL, TailChange, ValuesTail, appended_lines, first_changed_row
+
+# Supabase configuration (set by connect_supabase() from the environment / .env)
+SUPABASE_URL: Optional[str] = None
+SUPABASE_KEY: Optional[str] = None
+
+# supabase.Client once connect_supabase() succeeds; None means no Supabase integration.
+supabase = None
+
+# Event name -> id and id -> rating_event from events_rows.csv, username -> id from
+# players_rows.csv. Filled by main() from the input cache (or the CSVs) before any replay.
 EVENT_KEY = {}
 RATED_EVENT = {}
-
-# list of player ids from players_rows.csv
 PLAYER_KEY = {}
-with open('players_rows.csv', newline='', encoding='utf-8') as csvfile:
-    reader = csv.DictReader(csvfile)
-    for row in reader:
-        PLAYER_KEY[row['username']] = int(row['id'])
-
-with open('events_rows.csv', newline='', encoding='utf-8') as csvfile:
-    reader = csv.DictReader(csvfile)
-    for row in reader:
-        EVENT_KEY[row['name']] = int(row['id'])
-        RATED_EVENT[int(row['id'])] = row['rating_event']
-
-model = PlackettLuce()
-
-def initialize_rating(player_ratings, player):
-    if player not in player_ratings:
-        player_ratings[player] = model.rating(name=player)
-
-def initialize_event_rating(rating_by_event, player, event):
-    if event not in rating_by_event:
-        rating_by_event[event] = {}
-    if player not in rating_by_event[event]:
-        rating_by_event[event][player] = []
-
-def update_rating(player_ratings, players, ranks):
-    updated_rating = model.rate(teams=[[player_ratings[player]] for player in players], ranks=ranks)
-    for i in range(len(players)):
-        player_ratings[players[i]] = updated_rating[i][0]
-    return updated_rating
-
-def update_event_rating(event_rating, players, updated_rating):
-  # each player in players needs their updated_rating stored in player_ratings
-  for i in range(len(players)):
-    event_rating[players[i]].append({"mu": updated_rating[i][0].mu, "sigma": updated_rating[i][0].sigma, "ordinal": updated_rating[i][0].ordinal(z=3) * 24 + 1200})
-
-def initialize_supabase_rating(rating_for_supabase, current_rating, player, event):
-    if event not in rating_for_supabase:
-        rating_for_supabase[event] = {}
-    if player not in rating_for_supabase[event]:
-        if player not in current_rating:
-            rating_for_supabase[event][player] = [{"games_won": 0}, {"mu": 25, "sigma": 8.333333333333334, "ordinal": 1200}]
-        else:
-            rating_for_supabase[event][player] = [{"games_won": 0}, {"mu": current_rating[player].mu, "sigma": current_rating[player].sigma, "ordinal": current_rating[player].ordinal(z=3) * 24 + 1200}]
-    
 
-def update_supabase_rating(rating_for_supabase, players, ranks, should_update, previous_ratings):
-    for i in range(len(players)):
-        player = players[i]
-        if ranks[i] == 1:
-            rating_for_supabase[player][0]['games_won'] += 1
-        if should_update:
-            if player in previous_ratings:
-                rating_for_supabase[player][1] = {"mu": previous_ratings[player].mu, "sigma": previous_ratings[player].sigma, "ordinal": previous_ratings[player].ordinal(z=3) * 24 + 1200}
-            else:
-                rating_for_supabase[player].append({"mu": 25, "sigma": 8.333333333333334, "ordinal": 1200})
 
-# PostgREST/Supabase default max rows per request is 1000; paginate to load full tables.
-_SUPABASE_PAGE_SIZE = 1000
+def connect_supabase() -> None:
+    """Load .env and create the Supabase client if credentials are set (imports supabase lazily)."""
+    global SUPABASE_URL, SUPABASE_KEY, supabase
+    from dotenv import load_dotenv
 
-
-def _paginate_select(
-    table: str,
-    columns: str,
-    order_columns: Tuple[str, ...] = ('id',),
-) -> List[dict]:
-    """Fetch all rows from a table using range pagination (PostgREST max ~1000 rows per request)."""
-    if not supabase:
-        return []
-    rows: List[dict] = []
-    offset = 0
-    try:
-        while True:
-            query = supabase.table(table).select(columns)
-            for col in order_columns:
-                query = query.order(col, desc=False)
-            response = query.range(offset, offset + _SUPABASE_PAGE_SIZE - 1).execute()
-            batch = response.data or []
-            rows.extend(batch)
-            if len(batch) < _SUPABASE_PAGE_SIZE:
-                break
-            offset += _SUPABASE_PAGE_SIZE
-        return rows
-    except Exception as e:
-        print(f"Warning: Could not paginate {table} from Supabase: {e}")
-        return []
+    load_dotenv()
+    SUPABASE_URL = os.getenv('SUPABASE_URL')
+    SUPABASE_KEY = os.getenv('SUPABASE_KEY')
+    supabase = None
+    if SUPABASE_URL and SUPABASE_KEY:
+        try:
+            from supabase import create_client
+            supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        except Exception as e:
+            print(f"Warning: Could not initialize Supabase client: {e}")
+            print("Continuing without Supabase integration. CSV files will still be generated.")
 
 
-# Supabase data loading functions
-def load_existing_games():
-    """Load existing games from Supabase, returning a set of (event_id, name) tuples"""
-    try:
-        data = _paginate_select('games', 'event, name')
-        return {(row['event'], row['name']) for row in data}
-    except Exception as e:
-        print(f"Warning: Could not load existing games from Supabase: {e}")
-        return set()
+# Indexes over snapshot rows (see snapshot.py) used for change detection
+def index_game_ids(rows):
+    """{(event_id, name): id} from games rows.
 
-def load_existing_game_participation():
-    """Load existing game_participation records, returning a set of (game_id, player_id) tuples
-    
-    If duplicates exist, all are included in the set (duplicates will be handled by upsert logic).
+    If duplicates exist, keeps the one with the lowest ID (oldest record).
     """
-    try:
-        data = _paginate_select('game_participation', 'game, player', ('game', 'player'))
-        return {(row['game'], row['player']) for row in data}
-    except Exception as e:
-        print(f"Warning: Could not load existing game_participation from Supabase: {e}")
-        return set()
+    game_ids = {}
+    for row in sorted(rows, key=lambda row: row['id']):
+        key = (row['event'], row['name'])
+        # Only keep the first occurrence (lowest ID) if duplicates exist
+        if key not in game_ids:
+            game_ids[key] = row['id']
+    return game_ids
+
+def index_game_participation(rows):
+    """{(game_id, player_id): row} carrying the stored ranking and updated_rating.
+
+    If duplicates exist, the last one loaded wins (the upsert rewrites the key anyway).
+    """
+    return {(row['game'], row['player']): row for row in rows}
 
-def load_existing_event_participation():
-    """Load existing event_participation records, returning a dict of {(event_id, player_id): data}"""
-    try:
-        data = _paginate_select(
-            'event_participation',
-            'event, player, games_won, updated_rating',
-            ('event', 'player'),
-        )
-        return {(row['event'], row['player']): row for row in data}
-    except Exception as e:
-        print(f"Warning: Could not load existing event_participation from Supabase: {e}")
-        return {}
+def index_event_participation(rows):
+    """{(event_id, player_id): row}"""
+    return {(row['event'], row['player']): row for row in rows}
+
+def index_player_ratings(rows):
+    """{player_id: {'current_rating': ...}}"""
+    return {row['id']: row for row in rows}
 
 def get_game_id_from_supabase(event_id, game_name):
     """Get the database ID for a game given event_id and name"""
@@ -171,28 +104,6 @@ def get_game_id_from_supabase(event_id, game_name):
         print(f"Warning: Could not get game ID from Supabase: {e}")
     return None
 
-def load_existing_game_ids():
-    """Load existing games with their IDs from Supabase, returning a dict of {(event_id, name): id}
-    
-    If duplicates exist, keeps the one with the lowest ID (oldest record).
-    """
-    if not supabase:
-        return {}
-    
-    try:
-        data = _paginate_select('games', 'id, event, name')
-        game_ids = {}
-        for row in data:
-            key = (row['event'], row['name'])
-            # Only keep the first occurrence (lowest ID) if duplicates exist
-            if key not in game_ids:
-                game_ids[key] = row['id']
-        return game_ids
-    except Exception as e:
-        print(f"Warning: Could not load existing game IDs from Supabase: {e}")
-        return {}
-
-
 def log_supabase_target() -> None:
     """Print non-secret host from SUPABASE_URL so the user confirms the correct project."""
     if not SUPABASE_URL:
@@ -205,9 +116,13 @@ def log_supabase_target() -> None:
     except Exception:
         print("Supabase: (could not parse SUPABASE_URL)")
 
+def supabase_target() -> str:
+    """host[:port] of SUPABASE_URL; a sync journal is only resumed against the project it was written for."""
+    return urlparse(SUPABASE_URL).netloc if SUPABASE_URL else ''
+
 
 def preflight_values_vs_db(
-    values_path: str,
+    dataset: GameDataset,
     game_ids_map: Dict[Tuple[int, str], int],
 ) -> Tuple[int, List[Tuple[int, str]], int]:
     """
@@ -216,118 +131,307 @@ def preflight_values_vs_db(
     Returns:
         (missing_count, sample_missing_keys_up_to_20, unique_game_count_in_values)
     """
-    seen: Set[Tuple[int, str]] = set()
-    missing: List[Tuple[int, str]] = []
-    with open(values_path, newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            event = int(EVENT_KEY[row['event']])
-            name = row['match'].strip()
-            key = (event, name)
-            if key in seen:
-                continue
-            seen.add(key)
-            if key not in game_ids_map:
-                missing.append(key)
+    unique_keys = dataset.unique_game_keys()
+    missing = [key for key in unique_keys if key not in game_ids_map]
     sample = missing[:20]
-    return len(missing), sample, len(seen)
+    return len(missing), sample, len(unique_keys)
 
 
-# Supabase upsert functions
-def upsert_game(event_id, game_name, existing_game_ids):
-    """Upsert a game and return its database ID.
+# Supabase upsert functions (queued on a BatchWriter; sent by writer.flush())
+def upsert_game(event_id, game_name, existing_game_ids, id_allocator, writer):
+    """Return the database ID for a game, queueing an insert if it is new.
 
     The games.id column has no DB default/sequence, so new rows must include an
-    explicit id (max existing id + 1 within this run's cache).
+    explicit id, taken from the ids reserved by id_allocator for this run.
     """
     if not supabase:
         return None
-    
+
     game_key = (event_id, game_name)
-    
+
     # Check if game already exists
     if game_key in existing_game_ids:
-        # Game exists, return its ID
         return existing_game_ids[game_key]
-    else:
-        # Insert new game with an explicit id (table has NOT NULL id, no default)
-        try:
-            next_id = (max(existing_game_ids.values()) if existing_game_ids else 0) + 1
-            response = supabase.table('games').insert({
-                'id': next_id,
-                'event': event_id,
-                'name': game_name
-            }).execute()
-            if response.data:
-                game_id = response.data[0]['id']
-                # Cache the new game ID
-                existing_game_ids[game_key] = game_id
-                return game_id
-        except Exception as e:
-            print(f"Error inserting game {game_name} for event {event_id}: {e}")
-    return None
 
-def upsert_game_participation(game_id, player_id, ranking, updated_rating, existing_participation):
-    """Upsert a game_participation record
-    
-    If duplicates exist, updates all matching records to ensure consistency.
-    """
+    # Queue new game with an explicit id (table has NOT NULL id, no default)
+    game_id = id_allocator.take()
+    writer.queue('games', {'id': game_id, 'event': event_id, 'name': game_name})
+    existing_game_ids[game_key] = game_id
+    return game_id
+
+def upsert_game_participation(game_id, player_id, ranking, updated_rating, writer):
+    """Queue a game_participation upsert keyed on (game, player)."""
     if not supabase or not game_id:
         return
-    
-    participation_key = (game_id, player_id)
-    
-    participation_data = {
+
+    writer.queue('game_participation', {
         'game': game_id,
         'player': player_id,
         'ranking': ranking,
         'updated_rating': updated_rating  # Pass dict directly for JSONB column
-    }
-    
-    try:
-        if participation_key in existing_participation:
-            # Update all existing records (handles duplicates by updating all)
-            supabase.table('game_participation').update(participation_data).eq('game', game_id).eq('player', player_id).execute()
-        else:
-            # Insert new record
-            supabase.table('game_participation').insert(participation_data).execute()
-    except Exception as e:
-        print(f"Error upserting game_participation for game {game_id}, player {player_id}: {e}")
+    })
 
-def upsert_event_participation(event_id, player_id, games_won, updated_rating, existing_participation):
-    """Upsert an event_participation record"""
+def upsert_event_participation(event_id, player_id, games_won, updated_rating, writer):
+    """Queue an event_participation upsert keyed on (event, player)."""
     if not supabase:
         return
-    
-    participation_key = (event_id, player_id)
-    
-    participation_data = {
+
+    writer.queue('event_participation', {
         'event': event_id,
         'player': player_id,
         'games_won': games_won,
         'updated_rating': updated_rating  # Pass dict directly for JSONB column
-    }
-    
-    try:
-        if participation_key in existing_participation:
-            # Update existing record
-            supabase.table('event_participation').update(participation_data).eq('event', event_id).eq('player', player_id).execute()
-        else:
-            # Insert new record
-            supabase.table('event_participation').insert(participation_data).execute()
-    except Exception as e:
-        print(f"Error upserting event_participation for event {event_id}, player {player_id}: {e}")
+    })
 
-def update_player_rating(player_id, current_rating):
-    """Update a player's current_rating"""
+def update_player_rating(player_id, username, current_rating, writer):
+    """Queue a player's current_rating upsert keyed on id.
+
+    username is sent too so the row satisfies NOT NULL checks on the insert path of the upsert.
+    """
     if not supabase:
         return
-    
-    # Pass dict directly for JSONB column - Supabase client handles serialization
+
+    writer.queue('players', {'id': player_id, 'username': username, 'current_rating': current_rating})
+
+
+class SyncState(NamedTuple):
+    """Stored-row indexes and the writer for one run; the maps are updated as rows are queued.
+
+    --watch keeps this between updates, so appended games are compared against what is
+    already in Supabase without reloading it.
+    """
+    existing_game_ids: Dict[Tuple[int, str], int]
+    existing_game_participation: Dict[Tuple[int, int], dict]
+    existing_event_participation: Dict[Tuple[int, int], dict]
+    existing_player_ratings: Dict[int, dict]
+    id_allocator: GameIdAllocator
+    batch_writer: Optional[BatchWriter]
+
+
+def current_rating_value(player_ratings, player_name) -> dict:
+    """players.current_rating: the player's three_and_four_player site rating (default if unrated)."""
+    rating = player_ratings['three_and_four_player'].get(player_name)
+    return site_rating(rating) if rating is not None else dict(DEFAULT_SITE_RATING)
+
+def sync_event_participation(pairs: Iterable[Tuple[int, str]], rating_for_supabase, sync: SyncState, changes: ChangeSet, dry_run: bool) -> None:
+    """Queue the event_participation rows of (event, player) pairs that differ from the stored ones."""
+    for event, player in pairs:
+        player_id = PLAYER_KEY[player]
+        games_won = rating_for_supabase[event][player][0]['games_won']
+        updated_rating = rating_for_supabase[event][player][1]
+        action = changes.classify(
+            'event_participation',
+            {'games_won': games_won, 'updated_rating': updated_rating},
+            sync.existing_event_participation.get((event, player_id)),
+        )
+        if not dry_run and action != 'unchanged':
+            upsert_event_participation(event, player_id, games_won, updated_rating, sync.batch_writer)
+            sync.existing_event_participation[(event, player_id)] = {
+                'event': event,
+                'player': player_id,
+                'games_won': games_won,
+                'updated_rating': updated_rating
+            }
+
+def sync_player_rating(player_id, player_name, player_ratings, sync: SyncState, changes: ChangeSet, dry_run: bool) -> dict:
+    """Queue a player's current_rating if it changed; returns the value."""
+    rating_value = current_rating_value(player_ratings, player_name)
+    action = changes.classify(
+        'players', {'current_rating': rating_value}, sync.existing_player_ratings.get(player_id)
+    )
+    if not dry_run and action != 'unchanged':
+        update_player_rating(player_id, player_name, rating_value, sync.batch_writer)
+        sync.existing_player_ratings[player_id] = {'id': player_id, 'current_rating': rating_value}
+    return rating_value
+
+
+def resume_sync(state: JournalState, mirror: Optional[SupabaseMirror] = None) -> bool:
+    """Send the chunks an interrupted sync journaled but never got acknowledged (in plan order).
+
+    Returns True when all of them went through; a sealed journal is then removed.
+    """
+    rows = sum(len(chunk.rows) for chunk in state.pending)
+    print(
+        f"\nResuming the sync started {state.started}: {len(state.pending)} pending write chunk(s) "
+        f"({rows} rows); {state.acknowledged} already written.",
+        flush=True,
+    )
+    journal = SyncJournal(state.path, supabase_target(), state)
+    writer = BatchWriter(supabase, journal=journal, mirror=mirror)
+    writer.failed_game_ids.update(state.failed_game_ids)
+    writer.resend(state.pending)
+    remaining = journal.unacknowledged
+    removed = journal.finish()
+    written = ', '.join(f"{table} {count}" for table, count in writer.rows_written.items() if count)
+    print(f"  {writer.request_count} requests; rows written: {written or 'none'}")
+    if remaining:
+        print(f"  {remaining} chunk(s) failed again; they stay in {state.path} for the next --resume.", file=sys.stderr)
+    elif removed:
+        print(f"  Interrupted sync finished; removed {state.path}.")
+    return not remaining
+
+
+# Watch mode (--watch): apply values.csv changes to the state the run left in memory
+def sync_rated_game(game: ReplayedGame, sync: SyncState, changes: ChangeSet, dry_run: bool) -> None:
+    """Queue a rated game's games / game_participation rows that differ from the stored ones."""
+    game_key = (game.event, game.name)
+    stored_id = sync.existing_game_ids.get(game_key)
+    changes.classify('games', {'event': game.event, 'name': game.name}, {} if stored_id is not None else None)
+    if dry_run:
+        game_id = stored_id
+    else:
+        game_id = upsert_game(game.event, game.name, sync.existing_game_ids, sync.id_allocator, sync.batch_writer)
+
+    for player, ranking, updated_rating in zip(game.players, game.ranks, game.participation_ratings):
+        player_id = PLAYER_KEY[player]
+        participation_row = {'ranking': ranking, 'updated_rating': updated_rating}
+        stored = sync.existing_game_participation.get((game_id, player_id)) if game_id else None
+        action = changes.classify('game_participation', participation_row, stored)
+        if game_id and not dry_run and action != 'unchanged':
+            upsert_game_participation(game_id, player_id, ranking, updated_rating, sync.batch_writer)
+            sync.existing_game_participation[(game_id, player_id)] = {
+                'game': game_id, 'player': player_id, **participation_row
+            }
+
+def flush_writes(batch_writer: Optional[BatchWriter]) -> None:
+    if batch_writer is None:
+        return
+    batch_writer.flush()
+    if isinstance(batch_writer, AsyncBatchWriter):
+        batch_writer.wait()
+
+def apply_appended_games(rating_engine: RatingEngine, games, sync: SyncState, dry_run: bool) -> Tuple[ChangeSet, List[int]]:
+    """Rate appended games on the live state and push the rows they change; (changes, events touched)."""
+    changes = ChangeSet()
+    event_players: Dict[int, Dict[str, None]] = {}
+    for game in rating_engine.rate_appended(games):
+        sync_rated_game(game, sync, changes, dry_run)
+        event_players.setdefault(game.event, {}).update(dict.fromkeys(game.players))
+    player_ratings = rating_engine.result.player_ratings
+    sync_event_participation(
+        ((event, player) for event, players in event_players.items() for player in players),
+        rating_engine.result.rating_for_supabase, sync, changes, dry_run,
+    )
+    players = dict.fromkeys(player for players in event_players.values() for player in players)
+    for player in players:
+        sync_player_rating(PLAYER_KEY[player], player, player_ratings, sync, changes, dry_run)
+    flush_writes(sync.batch_writer)
+    return changes, list(event_players)
+
+def replay_from_row(args, inputs, first_row: int, sync: SyncState, dry_run: bool) -> Tuple[RatingEngine, ChangeSet]:
+    """Re-replay after an edit (resuming from the last checkpoint before it); push rows from first_row on."""
+    rating_engine = RatingEngine(
+        inputs,
+        engine=args.engine,
+        parallel_ladders=args.parallel_ladders,
+        checkpoint_dir=None if args.no_checkpoints else args.checkpoint_dir,
+        log=lambda line: None,
+        leaderboards=LeaderboardTracker(),
+    )
+    changes = ChangeSet()
+    events = {}
+    for game in rating_engine.iter_replay(keep_history=False):
+        if game.row_index >= first_row:
+            sync_rated_game(game, sync, changes, dry_run)
+            events[game.event] = None
+    rating_for_supabase = rating_engine.result.rating_for_supabase
+    sync_event_participation(
+        ((event, player) for event in events for player in rating_for_supabase[event]),
+        rating_for_supabase, sync, changes, dry_run,
+    )
+    # An edit can move any rating after it, including players whose games were removed
+    for player_name, player_id in PLAYER_KEY.items():
+        sync_player_rating(player_id, player_name, rating_engine.result.player_ratings, sync, changes, dry_run)
+    flush_writes(sync.batch_writer)
+    return rating_engine, changes
+
+def watch_values(args, rating_engine: RatingEngine, sync: SyncState, metrics: RunMetrics) -> int:
+    """Poll values.csv and apply appended rows (or re-replay from an edited row) until interrupted."""
+    values_path = 'values.csv'
+    dry_run = args.dry_run
+    input_cache_dir = None if args.no_input_cache else args.input_cache_dir
+    tail = ValuesTail(values_path)
+    row_keys = rating_engine.dataset.row_keys()
+    with open(values_path, newline='', encoding='utf-8') as csvfile:
+        header = next(csv.reader(csvfile), [])
+    prefix = '[DRY RUN] ' if dry_run else ''
+    print(f"\n{prefix}Watching {values_path} every {args.watch_interval:g}s for new results (Ctrl-C to stop)...", flush=True)
+
+    # The file may have changed while the run above was syncing: check it against the replayed rows first
+    change: Optional[TailChange] = tail.read_all()
     try:
-        supabase.table('players').update({'current_rating': current_rating}).eq('id', player_id).execute()
-    except Exception as e:
-        print(f"Error updating player {player_id} rating: {e}")
+        while True:
+            if change is not None:
+                started = time.perf_counter()
+                with metrics.phase('watch.update'):
+                    applied = None
+                    if change.kind == APPEND:
+                        applied = _apply_append(change, header, row_keys, rating_engine, sync, dry_run)
+                    if applied is None:
+                        # reload the whole file; it is what the tail has applied once this succeeds
+                        change = tail.read_all()
+                        applied = _apply_rewrite(args, input_cache_dir, row_keys, rating_engine, sync, dry_run)
+                if applied:
+                    rating_engine, row_keys, summary, changes = applied
+                    tail.advance(change)
+                    if summary:
+                        print(f"{time.strftime('%H:%M:%S')} {summary} in {time.perf_counter() - started:.2f}s")
+                        for line in changes.summary_lines():
+                            print(f"      {line}")
+                        sys.stdout.flush()
+            time.sleep(args.watch_interval)
+            change = tail.poll()
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    return 0
+
+def _apply_append(change: TailChange, header, row_keys, rating_engine, sync, dry_run):
+    """Parse and apply appended rows; None when they need the full reload (_apply_rewrite)."""
+    lines = appended_lines(change.data)
+    try:
+        appended = parse_values(lines, EVENT_KEY, PLAYER_KEY, 'values.csv', header, len(row_keys) + 2)
+    except DatasetError:
+        # Perhaps a player or event was just added to the reference CSVs: reload everything
+        return None
+    games = appended.games()
+    changes, events = apply_appended_games(rating_engine, games, sync, dry_run)
+    row_keys.extend(appended.row_keys())
+    event_names = ', '.join(appended.event_names.get(event, str(event)) for event in events)
+    return rating_engine, row_keys, f"Rated {len(games)} new game(s) ({event_names})", changes
+
+def _apply_rewrite(args, input_cache_dir, row_keys, rating_engine, sync, dry_run):
+    """Reload values.csv and apply whatever changed; False (retry on the next change) if it does not parse."""
+    try:
+        inputs = load_inputs(cache_dir=input_cache_dir)
+    except DatasetError as e:
+        print(f"Error loading values.csv (waiting for the next change): {e}", file=sys.stderr)
+        return False
+    PLAYER_KEY.update(inputs.player_key)
+    new_keys = inputs.dataset.row_keys()
+    first_row = first_changed_row(row_keys, new_keys)
+    if first_row == len(row_keys) and rating_engine.add_events(inputs.event_key, inputs.rated_event):
+        EVENT_KEY.update(inputs.event_key)
+        RATED_EVENT.update(inputs.rated_event)
+        games = inputs.dataset.games()[first_row:]
+        if not games:
+            return rating_engine, new_keys, None, None
+        changes, events = apply_appended_games(rating_engine, games, sync, dry_run)
+        event_names = ', '.join(inputs.dataset.event_names.get(event, str(event)) for event in events)
+        return rating_engine, new_keys, f"Rated {len(games)} new game(s) ({event_names})", changes
+
+    # An earlier row changed (or an event was re-categorized): re-replay from there
+    if first_row == len(row_keys):
+        first_row = 0
+    EVENT_KEY.clear()
+    EVENT_KEY.update(inputs.event_key)
+    RATED_EVENT.clear()
+    RATED_EVENT.update(inputs.rated_event)
+    rating_engine, changes = replay_from_row(args, inputs, first_row, sync, dry_run)
+    summary = (
+        f"values.csv changed from row {first_row + 2}: re-rated {len(new_keys) - rating_engine.result.resumed_games} "
+        f"game(s) after {rating_engine.result.resumed_games} restored from checkpoints"
+    )
+    return rating_engine, new_keys, summary, changes
 
 def main(argv=None) -> int:
     parser = argparse.ArgumentParser(
@@ -348,50 +452,320 @@ def main(argv=None) -> int:
         action='store_true',
         help='Only compare values.csv unique games to Supabase games, then exit (no rating loop).',
     )
+    parser.add_argument(
+        '--no-checkpoints',
+        action='store_true',
+        help='Replay every game from scratch; do not read or write rating-state checkpoints.',
+    )
+    parser.add_argument(
+        '--checkpoint-dir',
+        default=DEFAULT_CHECKPOINT_DIR,
+        help=f'Directory for event-boundary rating checkpoints (default: {DEFAULT_CHECKPOINT_DIR}).',
+    )
+    parser.add_argument(
+        '--engine',
+        choices=ENGINES,
+        default='openskill',
+        help='Rating engine: openskill PlackettLuce objects (default) or the vectorized NumPy engine.',
+    )
+    parser.add_argument(
+        '--parallel-ladders',
+        action='store_true',
+        help='Replay the all_time, one_versus_one and three_and_four_player ladders in separate worker processes.',
+    )
+    parser.add_argument(
+        '--async-sync',
+        action='store_true',
+        help='Load and write Supabase tables through the asyncio engine (pooled httpx client, concurrent requests).',
+    )
+    parser.add_argument(
+        '--load-concurrency',
+        type=int,
+        default=DEFAULT_LOAD_CONCURRENCY,
+        help=f'Max concurrent page loads when snapshotting Supabase tables (default: {DEFAULT_LOAD_CONCURRENCY}).',
+    )
+    parser.add_argument(
+        '--write-concurrency',
+        type=int,
+        default=DEFAULT_WRITE_CONCURRENCY,
+        help=f'With --async-sync: max concurrent upsert requests (default: {DEFAULT_WRITE_CONCURRENCY}).',
+    )
+    parser.add_argument(
+        '--no-input-cache',
+        action='store_true',
+        help='Parse values.csv, players_rows.csv and events_rows.csv from scratch; do not read or write the input cache.',
+    )
+    parser.add_argument(
+        '--input-cache-dir',
+        default=DEFAULT_CACHE_DIR,
+        help=f'Directory for the parsed-input cache (default: {DEFAULT_CACHE_DIR}).',
+    )
+    parser.add_argument(
+        '--verify-engine',
+        action='store_true',
+        help='Check the NumPy engine against openskill on every ladder of values.csv (1e-9 tolerance), then exit.',
+    )
+    parser.add_argument(
+        '--export-format',
+        choices=EXPORT_FORMATS,
+        default='json',
+        help='Format of the JSON exports: indented json (default), compact json, or ndjson (one line per entry, .ndjson files).',
+    )
+    parser.add_argument(
+        '--shard-dir',
+        metavar='DIR',
+        help='Also write one compact JSON file per event and per player plus a hashed manifest to DIR, '
+        'rewriting only the files whose content changed.',
+    )
+    parser.add_argument(
+        '--no-history',
+        action='store_true',
+        help=f'Do not record or write the indexed rating history ({HISTORY_FILE}, queried with history.py).',
+    )
+    parser.add_argument(
+        '--no-head-to-head',
+        action='store_true',
+        help=f'Do not record or write head-to-head records ({HEAD_TO_HEAD_FILE}, queried with head_to_head.py).',
+    )
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Print wall/CPU time per phase and Supabase requests, bytes and latency per table at the end of the run.',
+    )
+    parser.add_argument(
+        '--metrics-out',
+        metavar='PATH',
+        help='Write the run profile (phases, counts, HTTP statistics) as JSON to PATH.',
+    )
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='After the run, keep watching values.csv and rate/sync appended rows as they arrive (edits re-replay from the last checkpoint).',
+    )
+    parser.add_argument(
+        '--watch-interval',
+        type=float,
+        default=DEFAULT_WATCH_INTERVAL,
+        metavar='SECONDS',
+        help=f'With --watch: seconds between checks of values.csv (default: {DEFAULT_WATCH_INTERVAL:g}).',
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Finish an interrupted sync from its journal: send only the writes it never got acknowledged.',
+    )
+    parser.add_argument(
+        '--journal',
+        default=DEFAULT_JOURNAL_PATH,
+        metavar='PATH',
+        help=f'Write-ahead journal of Supabase writes, kept until a sync completes (default: {DEFAULT_JOURNAL_PATH}).',
+    )
+    parser.add_argument(
+        '--mirror',
+        default=DEFAULT_MIRROR_PATH,
+        metavar='PATH',
+        help=f'Local SQLite mirror of the Supabase tables, refreshed by delta each run (default: {DEFAULT_MIRROR_PATH}).',
+    )
+    parser.add_argument(
+        '--refresh-mirror',
+        action='store_true',
+        help='Reload every mirrored table from Supabase instead of fetching only what changed.',
+    )
+    parser.add_argument(
+        '--no-mirror',
+        action='store_true',
+        help='Read whole tables from Supabase and leave the local mirror alone.',
+    )
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help='With --preflight-only or --dry-run: compare against the local mirror as it is, with no Supabase requests.',
+    )
     args = parser.parse_args(argv)
+    if args.offline and not (args.preflight_only or args.dry_run):
+        parser.error('--offline only works with --preflight-only or --dry-run')
+    if args.no_mirror and (args.offline or args.refresh_mirror):
+        parser.error('--no-mirror cannot be combined with --offline or --refresh-mirror')
+    if args.resume and (args.dry_run or args.preflight_only or args.verify_engine):
+        parser.error('--resume cannot be combined with --dry-run, --preflight-only or --verify-engine')
+    if args.watch and (args.preflight_only or args.verify_engine):
+        parser.error('--watch cannot be combined with --preflight-only or --verify-engine')
+    if args.watch_interval <= 0:
+        parser.error('--watch-interval must be positive')
+    metrics = RunMetrics()
+
+    # Fix Windows console encoding
+    if sys.platform == 'win32':
+        import io
+        sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', write_through=True)
+        sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', write_through=True)
+
+    # Parse values.csv once (or map the cached parse); unknown players/events or malformed
+    # seats stop the run here, before anything is loaded from or written to Supabase.
+    try:
+        with metrics.phase('load_inputs'):
+            rating_engine = RatingEngine.from_files(
+                cache_dir=None if args.no_input_cache else args.input_cache_dir,
+                engine=args.engine,
+                parallel_ladders=args.parallel_ladders,
+                checkpoint_dir=None if args.no_checkpoints else args.checkpoint_dir,
+                metrics=metrics,
+                history=None if args.no_history or args.dry_run else HistoryRecorder(),
+                leaderboards=LeaderboardTracker(),
+                head_to_head=None if args.no_head_to_head or args.dry_run else HeadToHeadRecorder(),
+                strength_of_schedule=StrengthOfSchedule(),
+            )
+    except DatasetError as e:
+        print(f"Error loading values.csv: {e}", file=sys.stderr)
+        return 1
+    PLAYER_KEY.update(rating_engine.inputs.player_key)
+    EVENT_KEY.update(rating_engine.inputs.event_key)
+    RATED_EVENT.update(rating_engine.inputs.rated_event)
+
+    if args.verify_engine:
+        print("Verifying NumPy engine against openskill PlackettLuce...")
+        return 0 if rating_engine.verify_parity() else 1
+
+    with metrics.phase('connect'):
+        connect_supabase()
+    async_engine = None
+    if supabase:
+        # Count every PostgREST request (bytes, latency) made through the supabase-py client
+        metrics.attach(supabase.postgrest.session)
+    if args.async_sync and supabase:
+        async_engine = AsyncSupabaseSync(
+            SUPABASE_URL,
+            SUPABASE_KEY,
+            load_concurrency=args.load_concurrency,
+            write_concurrency=args.write_concurrency,
+            event_hooks=metrics.async_httpx_hooks(),
+        )
+    exit_code = None
+    try:
+        exit_code = run_sync(args, rating_engine, async_engine, metrics)
+        return exit_code
+    finally:
+        if async_engine:
+            async_engine.close()
+        extra = {'engine': args.engine, 'exit_code': exit_code}
+        if args.profile:
+            print("\nRun profile:")
+            for line in metrics.summary_lines():
+                print(f"  {line}")
+        if args.metrics_out:
+            metrics.write(args.metrics_out, extra)
+            print(f"Wrote run profile to {args.metrics_out}")
+
+
+def run_sync(
+    args,
+    rating_engine: RatingEngine,
+    async_engine: Optional[AsyncSupabaseSync] = None,
+    metrics: Optional[RunMetrics] = None,
+) -> int:
+    """Preflight, replay, Supabase sync and exports for parsed CLI args (phases timed into `metrics`)."""
+    if metrics is None:
+        metrics = RunMetrics()
     dry_run = args.dry_run
     allow_new_games = args.allow_new_games
     preflight_only = args.preflight_only
+    dataset = rating_engine.dataset
 
     log_supabase_target()
 
-    player_ratings = {
-        'all_time': {},
-        'one_versus_one': {},
-        'three_and_four_player': {},
-    }
-
-    rating_by_event = dict()
-
-    rating_for_supabase = dict()
-
-    all_events = list(EVENT_KEY.values())
-    one_versus_one_event_list = [key for key, value in RATED_EVENT.items() if value == 'false']
-    three_and_four_player_event_list = list(set(all_events) - set(one_versus_one_event_list))
-
-    # Load existing data from Supabase for incremental updates
-    print("Loading existing data from Supabase...")
-    print("  Loading games...", end='', flush=True)
-    existing_games = load_existing_games()
-    print(f" OK ({len(existing_games)} games)")
-
-    print("  Loading game IDs...", end='', flush=True)
-    existing_game_ids = load_existing_game_ids()  # Maps (event_id, name) -> id
-    print(f" OK ({len(existing_game_ids)} game IDs)")
-
-    print("  Loading game participation...", end='', flush=True)
-    existing_game_participation = load_existing_game_participation()
-    print(f" OK ({len(existing_game_participation)} participations)")
+    # An interrupted sync leaves its write-ahead journal behind (sync_journal.py)
+    journal_state = None
+    if supabase and not dry_run and not preflight_only:
+        try:
+            journal_state = read_journal(args.journal)
+        except ValueError as e:
+            print(f"Error reading sync journal: {e}", file=sys.stderr)
+            return 1
+    if args.resume:
+        if journal_state is None:
+            print(f"Nothing to resume (no sync journal at {args.journal}); running a normal sync.")
+        else:
+            if journal_state.target != supabase_target():
+                print(
+                    f"\nAbort: {args.journal} was written for {journal_state.target}, not {supabase_target()}. "
+                    "Point SUPABASE_URL at that project or delete the journal.",
+                    file=sys.stderr,
+                )
+                return 1
+            mirror = None if args.no_mirror else SupabaseMirror(args.mirror)
+            with metrics.phase('write.resume'):
+                finished = resume_sync(journal_state, mirror if mirror and mirror.target == supabase_target() else None)
+            if journal_state.sealed:
+                return 0 if finished else 1
+            print("The interrupted sync stopped before planning all of its writes; continuing with a normal sync.")
+    elif journal_state is not None:
+        print(
+            f"Warning: {args.journal} holds {len(journal_state.pending)} unacknowledged write chunk(s) from a sync "
+            f"started {journal_state.started}. This run re-syncs everything that differs and replaces it "
+            "(--resume would finish the old run without a replay)."
+        )
 
-    print("  Loading event participation...", end='', flush=True)
-    existing_event_participation = load_existing_event_participation()
-    print(f" OK ({len(existing_event_participation)} participations)", flush=True)
+    # Load existing data from Supabase for incremental updates (only the tables this mode compares)
+    tables = MODE_TABLES['preflight' if preflight_only else 'sync']
+    snapshot = {table: [] for table in tables}
+    mirror = None
+    if args.offline:
+        mirror = SupabaseMirror(args.mirror)
+        missing = [table for table in tables if mirror.loaded_at(table) is None]
+        if missing or (SUPABASE_URL and mirror.target != supabase_target()):
+            print(
+                f"\nAbort: the local mirror {args.mirror} has no {', '.join(missing) or 'tables'} for "
+                f"{supabase_target() or 'this project'}; run once without --offline to fill it.",
+                file=sys.stderr,
+            )
+            return 1
+        refreshed = min(mirror.loaded_at(table) for table in tables)
+        print(f"Loading existing data from the local mirror of {mirror.target} (--offline; refreshed {refreshed})...")
+        with metrics.phase('load_snapshot'):
+            snapshot = mirror.snapshot(tables)
+    elif supabase:
+        fetch_page = async_engine.page_fetcher() if async_engine else supabase_page_fetcher(supabase)
+        loader = SnapshotLoader(fetch_page, concurrency=args.load_concurrency)
+        if args.no_mirror:
+            print(f"Loading existing data from Supabase ({', '.join(tables)})...", flush=True)
+            with metrics.phase('load_snapshot'):
+                snapshot = loader.load(tables)
+            print(f"  Loaded in {loader.request_count} requests")
+            metrics.count('snapshot_requests', loader.request_count)
+        else:
+            # Only rows added since the last run are fetched; see mirror.py
+            mirror = SupabaseMirror(args.mirror)
+            count_rows = async_engine.row_counter() if async_engine else supabase_row_counter(supabase)
+            print(f"Refreshing the local mirror of Supabase ({', '.join(tables)})...", flush=True)
+            with metrics.phase('load_snapshot'):
+                try:
+                    refresh = mirror.refresh(tables, loader, count_rows, supabase_target(), full=args.refresh_mirror)
+                except RuntimeError as e:
+                    print(f"\nAbort: {e}; nothing was compared or written.", file=sys.stderr)
+                    return 1
+                snapshot = mirror.snapshot(tables)
+            requests = loader.request_count + refresh.count_requests
+            print(f"  {refresh.summary()} ({requests} requests)")
+            metrics.count('snapshot_requests', requests)
+    else:
+        print("Loading existing data from Supabase... skipped (no connection)")
+    with metrics.phase('index_snapshot'):
+        existing_game_ids = index_game_ids(snapshot['games'])  # Maps (event_id, name) -> id
+        existing_games = set(existing_game_ids)
+        existing_game_participation = index_game_participation(snapshot.get('game_participation', []))
+        existing_event_participation = index_event_participation(snapshot.get('event_participation', []))
+        existing_player_ratings = index_player_ratings(snapshot.get('players', []))
+    print(f"  Games: {len(existing_game_ids)}")
+    if not preflight_only:
+        print(f"  Game participation: {len(existing_game_participation)}")
+        print(f"  Event participation: {len(existing_event_participation)}")
+        print(f"  Player ratings: {len(existing_player_ratings)}", flush=True)
 
     initial_game_ids = dict(existing_game_ids)
-    initial_gp = set(existing_game_participation)
 
     values_path = 'values.csv'
-    missing_count, sample_missing, unique_in_values = preflight_values_vs_db(values_path, initial_game_ids)
+    with metrics.phase('preflight'):
+        missing_count, sample_missing, unique_in_values = preflight_values_vs_db(dataset, initial_game_ids)
     print(f"\nPreflight: {unique_in_values} unique games in {values_path}; {missing_count} not found in Supabase (by event + match name).")
     if sample_missing and missing_count > 0:
         print(f"  Sample of missing keys (event_id, name), up to 20:")
@@ -429,22 +803,36 @@ def main(argv=None) -> int:
     if not dry_run:
         print("Only new/changed records will be inserted or updated.")
 
+    # Writes are buffered per table and sent as chunked upserts at the end of each phase.
+    batch_writer = None
+    journal = None
+    if supabase and not dry_run:
+        # Chunks are journaled before they are sent and acknowledged after, for --resume
+        journal = SyncJournal(args.journal, supabase_target())
+        if async_engine:
+            batch_writer = AsyncBatchWriter(async_engine, journal=journal, mirror=mirror)
+        else:
+            batch_writer = BatchWriter(supabase, journal=journal, mirror=mirror)
+    # Replayed rows are compared to stored ones; only inserts/updates are queued.
+    changes = ChangeSet()
+    id_allocator = GameIdAllocator(existing_game_ids)
+    if batch_writer and missing_count > 0:
+        id_allocator.reserve(missing_count)
+    sync = SyncState(
+        existing_game_ids, existing_game_participation, existing_event_participation,
+        existing_player_ratings, id_allocator, batch_writer,
+    )
+
     # Optional: Generate CSV files for backup/reference (regenerated from values.csv each run)
     generate_csv = os.getenv('GENERATE_CSV', 'true').lower() == 'true' and not dry_run
     
-    # Prepare CSV file handles for batch writing
-    games_csv_rows = []
-    game_participation_csv_rows = []
+    export_format = args.export_format
 
     # Read the CSV file and process all games (for accurate rating calculations)
     # Note: We process ALL games to ensure ratings are calculated correctly,
     # but only new/changed records will be upserted to Supabase
     print("Processing games from values.csv...")
-    
-    # Count total rows first for progress tracking
-    with open(values_path, newline='', encoding='utf-8') as csvfile:
-        total_rows = sum(1 for _ in csv.DictReader(csvfile))
-
+    total_rows = len(dataset)
     print(f"Total games to process: {total_rows}")
     print("Progress will be shown every 100 games...")
 
@@ -452,27 +840,42 @@ def main(argv=None) -> int:
     new_games_count = 0
     updated_games_count = 0
     games_processed_this_run = set()  # Track games we've seen in this CSV run
-    would_gp_insert = 0
-    would_gp_update = 0
 
-    with open(values_path, newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
+    # Each game is synced and exported as soon as it is rated; per-game rows and each event's
+    # rating history are written out (not kept) so memory does not grow with values.csv.
+    with metrics.phase('replay'), ExitStack() as exports:
+        games_csv = participation_csv = rating_by_event_out = supabase_rating_out = standings_out = None
+        if generate_csv:
+            games_csv = exports.enter_context(CsvExporter('games_rows.csv', ['event', 'name']))
+            participation_csv = exports.enter_context(
+                CsvExporter('game_participation_rows.csv', ['game', 'player', 'ranking', 'updated_rating'])
+            )
+        if not dry_run:
+            rating_by_event_out = exports.enter_context(
+                JsonObjectExporter(export_path('rating_by_event', export_format), export_format, 'event', 'players')
+            )
+            supabase_rating_out = exports.enter_context(
+                JsonObjectExporter(export_path('supabase_rating', export_format), export_format, 'event', 'players')
+            )
+            standings_out = exports.enter_context(
+                JsonObjectExporter(export_path('standings_by_event', export_format), export_format, 'event', 'ladders')
+            )
+        shards = ShardedExporter(args.shard_dir, PLAYER_KEY) if args.shard_dir and not dry_run else None
 
-        for row in reader:
+        for game in rating_engine.iter_replay(keep_history=False):
+            row_index, event, game_name, players, ranks, participation_ratings, event_complete, standings = game
             game_counter += 1
-            # Extract information from the row
-            players = [row[f'player_{letter}'] for letter in 'abcd' if row[f'player_{letter}']]
-            ranks = [int(row[f'rank_{letter}']) for letter in 'abcd' if row[f'rank_{letter}']]
-            event = int(EVENT_KEY[row['event']])
-            game_name = row['match'].strip()
             game_key = (event, game_name)
 
             game_existed_before = game_key in initial_game_ids
+            if game_key not in games_processed_this_run:
+                changes.classify('games', {'event': event, 'name': game_name},
+                                 {} if game_existed_before else None)
 
             if dry_run:
                 game_id = initial_game_ids.get(game_key)
             else:
-                game_id = upsert_game(event, game_name, existing_game_ids)
+                game_id = upsert_game(event, game_name, existing_game_ids, id_allocator, batch_writer)
 
             if game_id:
                 existing_games.add(game_key)
@@ -487,182 +890,205 @@ def main(argv=None) -> int:
                 if game_key not in games_processed_this_run:
                     new_games_count += 1
                 games_processed_this_run.add(game_key)
-                would_gp_insert += len(players)
-
-            # Collect CSV rows for batch writing
-            if generate_csv:
-                games_csv_rows.append([event, game_name])
-
-            # Initialize ratings for players if they don't exist in the given event category
-            for player in players:
-                if event in one_versus_one_event_list:
-                    initialize_rating(player_ratings['one_versus_one'], player)
-                if event in three_and_four_player_event_list:
-                    initialize_rating(player_ratings['three_and_four_player'], player)
-
-                initialize_rating(player_ratings['all_time'], player)
-                initialize_event_rating(rating_by_event, player, event)
-                
-                initialize_supabase_rating(rating_for_supabase, player_ratings['three_and_four_player'], player, event)
-            
-            # Update the ratings    
-            if event in one_versus_one_event_list:
-                update_rating(player_ratings['one_versus_one'], players, ranks)
-
-            if event in three_and_four_player_event_list:
-                update_rating(player_ratings['three_and_four_player'], players, ranks)
+
+            if games_csv:
+                games_csv.write([event, game_name])
 
             # Upsert game participation to Supabase and write to CSV
             for i, player in enumerate(players):
                 player_id = PLAYER_KEY[player]
                 ranking = ranks[i]
-                
-                if player in player_ratings['three_and_four_player']:
-                    updated_rating = {
-                        "mu": player_ratings['three_and_four_player'][player].mu,
-                        "sigma": player_ratings['three_and_four_player'][player].sigma,
-                        "ordinal": player_ratings['three_and_four_player'][player].ordinal(z=3) * 24 + 1200
+
+                updated_rating = participation_ratings[i]
+
+                participation_row = {'ranking': ranking, 'updated_rating': updated_rating}
+                stored = existing_game_participation.get((game_id, player_id)) if game_id else None
+                action = changes.classify('game_participation', participation_row, stored)
+                if game_id and not dry_run and action != 'unchanged':
+                    upsert_game_participation(
+                        game_id, player_id, ranking, updated_rating, batch_writer
+                    )
+                    existing_game_participation[(game_id, player_id)] = {
+                        'game': game_id, 'player': player_id, **participation_row
                     }
-                else:
-                    updated_rating = {"mu": 25, "sigma": 8.333333333333334, "ordinal": 1200}
-                
-                if game_id:
-                    if dry_run:
-                        if (game_id, player_id) in initial_gp:
-                            would_gp_update += 1
-                        else:
-                            would_gp_insert += 1
-                    else:
-                        upsert_game_participation(
-                            game_id, player_id, ranking, updated_rating, existing_game_participation
-                        )
-                        existing_game_participation.add((game_id, player_id))
-
-                if generate_csv:
+
+                if participation_csv:
                     csv_game_id = game_id if game_id else game_counter
-                    game_participation_csv_rows.append(
-                        [csv_game_id, player_id, ranking, json.dumps(updated_rating)]
-                    )
+                    participation_csv.write([csv_game_id, player_id, ranking, json.dumps(updated_rating)])
+
+            # The event's history and event_participation ratings are final after its last game
+            if event_complete and rating_by_event_out:
+                rating_by_event_out.write(event, rating_engine.result.rating_by_event[event])
+                supabase_rating_out.write(event, rating_engine.result.rating_for_supabase[event])
+                standings_out.write(event, standings)
+            if event_complete and shards:
+                shards.add_event(
+                    event, rating_engine.result.rating_by_event[event], rating_engine.result.rating_for_supabase[event],
+                    standings,
+                )
 
-            updated_rating = update_rating(player_ratings['all_time'], players, ranks)
-            update_event_rating(rating_by_event[event], players, updated_rating)
+    replay = rating_engine.result
+    player_ratings = replay.player_ratings
+    rating_for_supabase = replay.rating_for_supabase
+    metrics.count('games', total_rows)
+    metrics.count('seats', dataset.seat_count)
+    metrics.count('resumed_games', replay.resumed_games)
+    if games_csv and games_csv.row_count:
+        print(f"\nWrote {games_csv.row_count} game records and "
+              f"{participation_csv.row_count} game participation records to CSV.")
+
+    if batch_writer:
+        print(
+            f"\nWriting {batch_writer.pending_count('games')} new games and "
+            f"{batch_writer.pending_count('game_participation')} game participations to Supabase..."
+        )
+        with metrics.phase('write.games'):
+            batch_writer.flush(('games', 'game_participation'))
 
-            # boolean variable for whether the event is a one versus one event
-            should_update = event in three_and_four_player_event_list
-            update_supabase_rating(rating_for_supabase[event], players, ranks, should_update, player_ratings['three_and_four_player'])
-            
-            # Progress indicator every 100 games
-            if game_counter % 100 == 0 and total_rows > 0:
-                print(f"  Processed {game_counter}/{total_rows} games... ({(game_counter/total_rows*100):.1f}%)")
-    
-    # Write CSV files in batch (write mode to regenerate from values.csv, not append)
-    if generate_csv and games_csv_rows:
-        print(f"\nWriting {len(games_csv_rows)} game records to CSV...")
-        with open('games_rows.csv', 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(['event', 'name'])  # Write header
-            writer.writerows(games_csv_rows)
-    
-    if generate_csv and game_participation_csv_rows:
-        print(f"Writing {len(game_participation_csv_rows)} game participation records to CSV...")
-        with open('game_participation_rows.csv', 'w', newline='') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(['game', 'player', 'ranking', 'updated_rating'])  # Write header
-            writer.writerows(game_participation_csv_rows)
-    
-    # Calculate final ordinal ratings
-    for category in player_ratings:
-        for player in player_ratings[category]:
-            player_ratings[category][player].ordinal = player_ratings[category][player].ordinal(z=3) * 24 + 1200
+    with metrics.phase('export.ratings_json'):
+        # Calculate final ordinal ratings
+        for category in player_ratings:
+            # Already ranked by the replay's leaderboard (ordinal descending, ties in first-rated order)
+            ratings = player_ratings[category]
+            player_ratings[category] = {player: ratings[player] for player, _ in rating_engine.leaderboards.ladders[category]}
 
-        player_ratings[category] = {k: v for k, v in sorted(player_ratings[category].items(), key=lambda item: item[1].ordinal, reverse=True)}
+            if not dry_run:
+                write_json_object(
+                    export_path(f"{category}_ratings", export_format),
+                    (
+                        (player, site_rating(rating))
+                        for player, rating in player_ratings[category].items()
+                    ),
+                    export_format,
+                    'player',
+                    'rating',
+                )
 
-        if not dry_run:
-            with open(f"{category}_ratings.json", "w", encoding='utf-8') as outfile:
-                outfile.write(json.dumps({player: {"mu": rating.mu, "sigma": rating.sigma, "ordinal": rating.ordinal } for player, rating in player_ratings[category].items()}, indent=2))
+    if shards:
+        with metrics.phase('export.shards'):
+            shards.finish({
+                category: {player: site_rating(rating) for player, rating in ratings.items()}
+                for category, ratings in player_ratings.items()
+            })
+        print(f"Wrote sharded exports: {shards.summary()}")
+
+    if rating_engine.history is not None:
+        with metrics.phase('export.history'):
+            history = rating_engine.history.build(dataset, rating_engine.inputs.event_dates)
+            if history.save(HISTORY_FILE):
+                print(f"Wrote rating history for {len(history.player_names)} players to {HISTORY_FILE}")
+            else:
+                print(f"Warning: Could not write {HISTORY_FILE} (a player or event name contains a NUL character)")
 
-    if not dry_run:
-        with open("rating_by_event.json", "w", encoding='utf-8') as outfile:
-            outfile.write(json.dumps(rating_by_event, indent=2))
+    if rating_engine.head_to_head is not None:
+        with metrics.phase('export.head_to_head'):
+            head_to_head = rating_engine.head_to_head.build(dataset.event_names)
+            if head_to_head.save(HEAD_TO_HEAD_FILE):
+                print(f"Wrote head-to-head records for {len(head_to_head.opponent) // 2} pairs to {HEAD_TO_HEAD_FILE}")
+            else:
+                print(f"Warning: Could not write {HEAD_TO_HEAD_FILE} (a player or event name contains a NUL character)")
+            write_json_object(
+                export_path(HEAD_TO_HEAD_EXPORT, export_format),
+                head_to_head.export_items(),
+                export_format,
+                'player',
+                'opponents',
+            )
 
-        with open("supabase_rating.json", "w", encoding='utf-8') as outfile:
-            outfile.write(json.dumps(rating_for_supabase, indent=2))
+    if not dry_run:
+        with metrics.phase('export.strength_of_schedule'):
+            write_json_object(
+                export_path(STRENGTH_OF_SCHEDULE_EXPORT, export_format),
+                rating_engine.strength_of_schedule.export_items(),
+                export_format,
+                'player',
+                'ladders',
+            )
 
-    event_counter = 0
     total_event_participations = sum(len(players) for players in rating_for_supabase.values())
 
     if supabase and not dry_run:
         print(f"\nUpserting event participation to Supabase...")
         print(f"Summary: {new_games_count} new games inserted, {updated_games_count} existing games recognized")
-        print(f"Updating {total_event_participations} event participation records...")
+        print(f"Checking {total_event_participations} event participation records for changes...")
     elif not supabase:
         print("\nSkipping Supabase updates (no credentials configured)")
     elif dry_run:
         print("\n[DRY RUN] Skipping event participation Supabase updates.")
 
-    for event in rating_for_supabase:
-        for player in rating_for_supabase[event]:
-            player_id = PLAYER_KEY[player]
-            games_won = rating_for_supabase[event][player][0]['games_won']
-            updated_rating = rating_for_supabase[event][player][1]
-            if not dry_run:
-                upsert_event_participation(event, player_id, games_won, updated_rating, existing_event_participation)
-                existing_event_participation[(event, player_id)] = {
-                    'event': event,
-                    'player': player_id,
-                    'games_won': games_won,
-                    'updated_rating': updated_rating
-                }
-            if supabase and not dry_run:
-                event_counter += 1
-                if event_counter % 50 == 0:
-                    print(f"  Updated {event_counter}/{total_event_participations} event participations...")
+    with metrics.phase('sync.event_participation'):
+        sync_event_participation(
+            ((event, player) for event in rating_for_supabase for player in rating_for_supabase[event]),
+            rating_for_supabase, sync, changes, dry_run,
+        )
+
+    if batch_writer:
+        print(f"Writing {batch_writer.pending_count('event_participation')} changed event participations...")
+        with metrics.phase('write.event_participation'):
+            batch_writer.flush(('event_participation',))
 
     # Write event_participation CSV if enabled
     if generate_csv:
-        with open('event_participation.csv', 'w', newline='') as csvfile:
+        with metrics.phase('export.event_participation_csv'), open('event_participation.csv', 'w', newline='') as csvfile:
             writer = csv.writer(csvfile)
-            writer.writerow(['event', 'player', 'games_won', 'updated_rating'])
+            writer.writerow(['event', 'player', 'games_won', 'updated_rating', 'strength_of_schedule'])
+            schedule = rating_engine.strength_of_schedule
             for event in rating_for_supabase:
                 for player in rating_for_supabase[event]:
-                    writer.writerow([event, PLAYER_KEY[player], rating_for_supabase[event][player][0]['games_won'], json.dumps(rating_for_supabase[event][player][1])])
+                    writer.writerow([event, PLAYER_KEY[player], rating_for_supabase[event][player][0]['games_won'], json.dumps(rating_for_supabase[event][player][1]), json.dumps(schedule.event_value(event, player))])
 
     if not dry_run:
         print("\nUpdating player ratings...")
+    else:
+        print("\n[DRY RUN] Skipping players_rows.csv and Supabase player rating updates.")
+    with metrics.phase('sync.players'):
         with open('players_rows.csv', 'r', encoding='utf-8') as csvfile:
             reader = csv.reader(csvfile)
             rows = list(reader)
-            if len(rows) == 0:
-                return 0
-
-            for i in range(len(rows)):
-                rows[i] = rows[i][:3]
+        if len(rows) == 0:
+            return 0
 
-            rows[0].append('current_rating')
+        for i in range(len(rows)):
+            rows[i] = rows[i][:3]
 
-            total_players = len(rows) - 1
-            print(f"Updating {total_players} player ratings...")
-            for i in range(1, len(rows)):
-                player_id = int(rows[i][0])
-                player_name = rows[i][2]
-                if player_name in player_ratings['three_and_four_player']:
-                    r = player_ratings['three_and_four_player'][player_name]
-                    rating_value = {"mu": r.mu, "sigma": r.sigma, "ordinal": r.ordinal}
-                else:
-                    rating_value = {"mu": 25, "sigma": 8.333333333333334, "ordinal": 1200}
+        rows[0].append('current_rating')
 
-                rows[i].append(json.dumps(rating_value))
+        for i in range(1, len(rows)):
+            player_id = int(rows[i][0])
+            player_name = rows[i][2]
+            rating_value = sync_player_rating(player_id, player_name, player_ratings, sync, changes, dry_run)
+            rows[i].append(json.dumps(rating_value))
 
-                update_player_rating(player_id, rating_value)
-
-                if (i - 1) % 50 == 0:
-                    print(f"  Updated {i - 1}/{total_players} player ratings...")
+    if not dry_run:
+        if batch_writer:
+            print(f"Updating {batch_writer.pending_count('players')} changed player ratings...")
+            with metrics.phase('write.players'):
+                batch_writer.flush(('players',), seal=True)
 
-            with open('players_rows.csv', 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerows(rows)
-    else:
-        print("\n[DRY RUN] Skipping players_rows.csv and Supabase player rating updates.")
+        with metrics.phase('export.players_csv'), open('players_rows.csv', 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerows(rows)
+
+    if isinstance(batch_writer, AsyncBatchWriter):
+        print("\nWaiting for pending Supabase writes...", flush=True)
+        with metrics.phase('write.wait'):
+            batch_writer.wait()
+    writes_failed = False
+    if journal:
+        if not journal.finish():
+            writes_failed = True
+            print(
+                f"\nWarning: {journal.unacknowledged} write chunk(s) failed; they are kept in {args.journal}. "
+                "Re-run with --resume to retry only those."
+            )
+        # --watch updates are small and re-diffed on the next run, so they are not journaled
+        batch_writer.journal = None
+    if batch_writer and (batch_writer.failed_game_ids or batch_writer.unsent_game_ids):
+        writes_failed = True
+        print(
+            f"\nWarning: {len(batch_writer.failed_game_ids | batch_writer.unsent_game_ids)} game(s) were not inserted; "
+            "their participations were skipped."
+        )
 
     print(f"\nProcessing complete!")
     print(f"  - Processed {game_counter} games")
@@ -670,11 +1096,24 @@ def main(argv=None) -> int:
         print(f"  - Would treat as new games (CSV rows whose keys were not in DB): {new_games_count}")
         print(f"  - Would treat as existing games: {updated_games_count}")
         print(f"  - [DRY RUN] Unique games in values.csv not in DB at preflight: {missing_count}")
-        print(f"  - [DRY RUN] game_participation rows: would insert {would_gp_insert}, would update {would_gp_update}")
+        print("  - [DRY RUN] Rows that would be written (by table):")
     else:
-        print(f"  - Inserted {new_games_count} new games")
+        print(f"  - Inserted {batch_writer.rows_written['games'] if batch_writer else 0} new games")
         print(f"  - Recognized {updated_games_count} existing games")
-
+        if batch_writer:
+            print(f"  - Supabase write requests: {batch_writer.request_count}")
+            metrics.count('write_requests', batch_writer.request_count)
+            print("  - Planned and written rows (by table):")
+        else:
+            print("  - Planned changes, not written (no Supabase connection):")
+    for line in changes.summary_lines(batch_writer.rows_written if batch_writer else None):
+        print(f"      {line}")
+
+    if writes_failed:
+        print("\nError: Some Supabase writes did not go through (see the warnings above).", file=sys.stderr)
+        return 1
+    if args.watch:
+        return watch_values(args, rating_engine, sync, metrics)
     return 0
 
 
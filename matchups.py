@@ -0,0 +1,333 @@
+"""Batch win-probability and match-quality predictions for seeding and pairing.
+
+openskill's predict_win / predict_draw score one table at a time. For a pairing search
+over a whole field, Field does it in bulk with NumPy:
+
+- win_matrix(n) / draw_matrix(n): every pair in the field, with the terms openskill uses
+  for an n-player table (n=2 gives predict_win for a 1v1 directly)
+- win_probabilities / draw_probabilities / plackett_luce_win: thousands of candidate
+  tables at once, as a (G, n) array of field indices or a list of player-name tables
+- score_groupings: whole candidate pairings (every table of a round), scored by their
+  mean and worst table quality
+
+The pairwise matrices are computed once per table size (F x F normal CDF evaluations for a
+field of F players); every table score after that is an array gather, so a 200-player field
+with thousands of 3/4-player candidates scores in milliseconds. Results match openskill's
+PlackettLuce predict_win / predict_draw to floating-point rounding.
+
+Ratings come from the final state (the *_ratings.json exports), a checkpoint file or the
+rating history at any game or date:
+
+    uv run python matchups.py matrix field.txt --out win_matrix.csv
+    uv run python matchups.py groups tables.csv --ladder three_and_four_player
+    uv run python matchups.py groups tables.csv --history rating_history.bin --on 2024-06-01
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+from statistics import NormalDist
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from array_engine import DEFAULT_BETA, DEFAULT_MU, DEFAULT_SIGMA
+from checkpoints import DEFAULT_CHECKPOINT_DIR
+from exporters import export_path
+from history import HISTORY_FILE, RatingHistory
+from ladders import LADDERS
+
+_erf = np.frompyfunc(math.erf, 1, 1)
+
+
+def normal_cdf(x) -> np.ndarray:
+    """Standard normal CDF elementwise (math.erf, as openskill's phi_major uses)."""
+    x = np.asarray(x, dtype=np.float64)
+    return 0.5 * (1.0 + _erf(x / math.sqrt(2.0)).astype(np.float64))
+
+
+class RatingState(NamedTuple):
+    """Every rated player on one ladder at one point in the replay."""
+    players: List[str]
+    mu: np.ndarray
+    sigma: np.ndarray
+
+    def field(self, players: Optional[Iterable[str]] = None, beta: float = DEFAULT_BETA) -> 'Field':
+        """A Field of `players` (default: everyone); unrated players get the default rating."""
+        if players is None:
+            return Field(self.players, self.mu, self.sigma, beta)
+        players = list(players)
+        index = {player: position for position, player in enumerate(self.players)}
+        positions = np.array([index.get(player, -1) for player in players], dtype=np.int64)
+        known = positions >= 0
+        mu = np.full(len(players), DEFAULT_MU)
+        sigma = np.full(len(players), DEFAULT_SIGMA)
+        mu[known] = self.mu[positions[known]]
+        sigma[known] = self.sigma[positions[known]]
+        return Field(players, mu, sigma, beta)
+
+
+def ratings_from_export(path: str) -> RatingState:
+    """RatingState from a *_ratings export written by main.py (json, compact or ndjson)."""
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.ndjson'):
+            entries = [json.loads(line) for line in f if line.strip()]
+            ratings = {entry['player']: entry['rating'] for entry in entries}
+        else:
+            ratings = json.load(f)
+    return RatingState(
+        list(ratings),
+        np.array([rating['mu'] for rating in ratings.values()], dtype=np.float64),
+        np.array([rating['sigma'] for rating in ratings.values()], dtype=np.float64),
+    )
+
+
+def latest_checkpoint(directory: str = DEFAULT_CHECKPOINT_DIR) -> Optional[str]:
+    """Path of the checkpoint with the highest segment index in `directory`."""
+    if not os.path.isdir(directory):
+        return None
+    names = sorted(name for name in os.listdir(directory) if name.endswith('.json') and name[:5].isdigit())
+    return os.path.join(directory, names[-1]) if names else None
+
+
+def ratings_from_checkpoint(path: str, ladder: str = 'all_time') -> RatingState:
+    """RatingState saved in a checkpoint file (the state after that event)."""
+    with open(path, encoding='utf-8') as f:
+        entries = json.load(f)['state']['player_ratings'].get(ladder, [])
+    return RatingState(
+        [player for player, _, _ in entries],
+        np.array([mu for _, mu, _ in entries], dtype=np.float64),
+        np.array([sigma for _, _, sigma in entries], dtype=np.float64),
+    )
+
+
+def ratings_from_history(history: RatingHistory, game: int, ladder: str = 'all_time') -> RatingState:
+    """RatingState after values.csv row `game` (use len(history) - 1 for the final state)."""
+    return RatingState(*history.ratings_after(game, ladder))
+
+
+def ratings_from_result(result, ladder: str = 'all_time') -> RatingState:
+    """RatingState from a ReplayResult (or any {ladder: {player: rating}} mapping's ladder)."""
+    ratings = result.player_ratings[ladder]
+    return RatingState(
+        list(ratings),
+        np.array([rating.mu for rating in ratings.values()], dtype=np.float64),
+        np.array([rating.sigma for rating in ratings.values()], dtype=np.float64),
+    )
+
+
+class GroupingScores(NamedTuple):
+    # per candidate grouping: mean and lowest draw probability over its tables
+    mean_quality: np.ndarray
+    min_quality: np.ndarray
+
+
+class Field:
+    """A fixed set of players with their ratings; tables are rows of indices into `players`."""
+
+    def __init__(self, players: Sequence[str], mu, sigma, beta: float = DEFAULT_BETA):
+        self.players = list(players)
+        self.index: Dict[str, int] = {player: position for position, player in enumerate(self.players)}
+        self.mu = np.asarray(mu, dtype=np.float64)
+        self.sigma = np.asarray(sigma, dtype=np.float64)
+        self.beta = beta
+        # table size -> F x F matrix
+        self._win: Dict[int, np.ndarray] = {}
+        self._draw: Dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.players)
+
+    def seats(self, tables) -> np.ndarray:
+        """(G, n) field indices from an integer array or equal-sized lists of player names."""
+        seats = np.asarray(tables)
+        if seats.dtype.kind not in 'iu':
+            seats = np.array([[self.index[player] for player in table] for table in tables], dtype=np.int64)
+        if seats.ndim != 2 or seats.shape[1] < 2:
+            raise ValueError(f"Expected tables of two or more players, got shape {seats.shape}")
+        return seats
+
+    def _pairs(self, n: int):
+        sigma_sq = self.sigma ** 2
+        difference = self.mu[:, None] - self.mu[None, :]
+        scale = np.sqrt(n * self.beta ** 2 + sigma_sq[:, None] + sigma_sq[None, :])
+        return difference, scale
+
+    def win_matrix(self, n: int = 2) -> np.ndarray:
+        """[i, j]: openskill's chance that i finishes ahead of j at an n-player table (n=2: predict_win)."""
+        if n not in self._win:
+            difference, scale = self._pairs(n)
+            self._win[n] = normal_cdf(difference / scale)
+        return self._win[n]
+
+    def draw_matrix(self, n: int = 2) -> np.ndarray:
+        """[i, j]: openskill's pairwise draw term for i and j at an n-player table."""
+        if n not in self._draw:
+            margin = math.sqrt(n) * self.beta * NormalDist().inv_cdf((1 + 1 / n) / 2)
+            difference, scale = self._pairs(n)
+            self._draw[n] = normal_cdf((margin - difference) / scale) - normal_cdf((difference - margin) / scale)
+        return self._draw[n]
+
+    def win_probabilities(self, tables) -> np.ndarray:
+        """(G, n) predict_win for each table: the chance each seat wins."""
+        seats = self.seats(tables)
+        n = seats.shape[1]
+        matrix = self.win_matrix(n)
+        total = matrix[seats[:, :, None], seats[:, None, :]].sum(axis=2) - matrix[seats, seats]
+        return total / (n * (n - 1) / 2)
+
+    def draw_probabilities(self, tables) -> np.ndarray:
+        """(G,) predict_draw for each table; higher means a more even table (match quality)."""
+        seats = self.seats(tables)
+        n = seats.shape[1]
+        matrix = self.draw_matrix(n)
+        total = matrix[seats[:, :, None], seats[:, None, :]].sum(axis=(1, 2)) - matrix[seats, seats].sum(axis=1)
+        return np.abs(total) / (n * (n - 1) if n > 2 else 1)
+
+    def plackett_luce_win(self, tables) -> np.ndarray:
+        """(G, n) Plackett-Luce first-place probabilities: exp(mu / c) shares, c as in rate()."""
+        seats = self.seats(tables)
+        mu = self.mu[seats]
+        c = np.sqrt(np.sum(self.sigma[seats] ** 2 + self.beta ** 2, axis=1))[:, None]
+        strength = np.exp(mu / c)
+        return strength / strength.sum(axis=1, keepdims=True)
+
+    def score_groupings(self, groupings) -> GroupingScores:
+        """Score candidate pairings of the field by the draw probability of their tables.
+
+        `groupings` is a (K, T, n) integer array (K pairings of T equal-sized tables) or a
+        sequence of pairings, each a list of tables (player names or indices) of any size.
+        """
+        if isinstance(groupings, np.ndarray) and groupings.ndim == 3:
+            k, t, n = groupings.shape
+            quality = self.draw_probabilities(groupings.reshape(k * t, n)).reshape(k, t)
+            return GroupingScores(quality.mean(axis=1), quality.min(axis=1))
+
+        tables_by_size: Dict[int, List[Sequence]] = {}
+        owners_by_size: Dict[int, List[int]] = {}
+        for owner, grouping in enumerate(groupings):
+            for table in grouping:
+                tables_by_size.setdefault(len(table), []).append(table)
+                owners_by_size.setdefault(len(table), []).append(owner)
+        count = len(groupings)
+        total = np.zeros(count)
+        tables = np.zeros(count)
+        lowest = np.full(count, np.inf)
+        for size, size_tables in tables_by_size.items():
+            quality = self.draw_probabilities(size_tables)
+            owners = np.array(owners_by_size[size], dtype=np.int64)
+            total += np.bincount(owners, weights=quality, minlength=count)
+            tables += np.bincount(owners, minlength=count)
+            np.minimum.at(lowest, owners, quality)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return GroupingScores(total / tables, lowest)
+
+
+def _read_tables(path: str) -> List[List[str]]:
+    with open(path, newline='', encoding='utf-8') as f:
+        return [[name.strip() for name in row if name.strip()] for row in csv.reader(f) if any(cell.strip() for cell in row)]
+
+
+def add_rating_source_arguments(parser: argparse.ArgumentParser) -> None:
+    """--ladder / --beta and where the ratings come from (export, checkpoint or history), as load_state() reads them."""
+    parser.add_argument('--ladder', choices=LADDERS, default='all_time', help='Rating ladder (default: all_time).')
+    parser.add_argument('--beta', type=float, default=DEFAULT_BETA, help=f'Model beta (default: {DEFAULT_BETA:g}).')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--ratings', metavar='PATH', help='A *_ratings export (default: <ladder>_ratings.json).')
+    source.add_argument('--checkpoint', metavar='PATH', help=f'A checkpoint file, or a directory for its latest (e.g. {DEFAULT_CHECKPOINT_DIR}).')
+    source.add_argument('--history', nargs='?', const=HISTORY_FILE, metavar='PATH', help=f'Rating history (default path: {HISTORY_FILE}).')
+    when = parser.add_mutually_exclusive_group()
+    when.add_argument('--before-game', type=int, metavar='N', help='With --history: going into values.csv row N.')
+    when.add_argument('--on', metavar='DATE', help='With --history: at the end of DATE (YYYY-MM-DD).')
+
+
+def load_state(args) -> RatingState:
+    """RatingState for parsed add_rating_source_arguments() options. ValueError if the source is missing."""
+    if args.history:
+        history = RatingHistory.load(args.history)
+        if history is None:
+            raise ValueError(f"No rating history at {args.history} (run main.py first)")
+        if args.before_game is not None:
+            game = args.before_game - 1
+        elif args.on:
+            game = history.games_through(args.on) - 1
+        else:
+            game = len(history) - 1
+        return ratings_from_history(history, game, args.ladder)
+    if args.checkpoint:
+        path = latest_checkpoint(args.checkpoint) if os.path.isdir(args.checkpoint) else args.checkpoint
+        if path is None:
+            raise ValueError(f"No checkpoints in {args.checkpoint}")
+        return ratings_from_checkpoint(path, args.ladder)
+    path = args.ratings or export_path(f'{args.ladder}_ratings')
+    if not os.path.exists(path) and not args.ratings:
+        path = export_path(f'{args.ladder}_ratings', 'ndjson')
+    return ratings_from_export(path)
+
+
+def main(argv=None) -> int:
+    common = argparse.ArgumentParser(add_help=False)
+    add_rating_source_arguments(common)
+    common.add_argument('--out', help='Write CSV here instead of stdout.')
+    parser = argparse.ArgumentParser(description='Batch win probabilities and match quality from the ratings main.py produces.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    matrix = commands.add_parser('matrix', parents=[common], help='Pairwise win-probability matrix for a field.')
+    matrix.add_argument('players', help='File with one player per line.')
+    matrix.add_argument('--table-size', type=int, default=2, help='Table size the pairwise terms are for (default: 2).')
+
+    groups = commands.add_parser('groups', parents=[common], help='Score candidate tables (one CSV row of players per table).')
+    groups.add_argument('tables', help='CSV file, one table per row.')
+    args = parser.parse_args(argv)
+
+    if (args.before_game is not None or args.on) and not args.history:
+        parser.error('--before-game/--on need --history')
+
+    try:
+        state = load_state(args)
+        if args.command == 'matrix':
+            with open(args.players, encoding='utf-8') as f:
+                players = [line.strip() for line in f if line.strip()]
+            field = state.field(players, args.beta)
+            rows = [['player', *players]]
+            for player, probabilities in zip(players, field.win_matrix(args.table_size).tolist()):
+                rows.append([player, *probabilities])
+        else:
+            tables = _read_tables(args.tables)
+            field = state.field(dict.fromkeys(player for table in tables for player in table), args.beta)
+            rows = [['table', 'size', 'quality', 'player', 'win_probability', 'plackett_luce_win']]
+            by_size: Dict[int, List[int]] = {}
+            for position, table in enumerate(tables):
+                by_size.setdefault(len(table), []).append(position)
+            scored: Dict[int, tuple] = {}
+            for size, positions in by_size.items():
+                size_tables = [tables[position] for position in positions]
+                quality = field.draw_probabilities(size_tables).tolist()
+                win = field.win_probabilities(size_tables).tolist()
+                plackett_luce = field.plackett_luce_win(size_tables).tolist()
+                for position, values in zip(positions, zip(quality, win, plackett_luce)):
+                    scored[position] = values
+            for position, table in enumerate(tables):
+                quality, win, plackett_luce = scored[position]
+                for player, player_win, player_pl in zip(table, win, plackett_luce):
+                    rows.append([position, len(table), quality, player, player_win, player_pl])
+    except KeyError as e:
+        print(f"Error: Unknown player {e.args[0]!r}", file=sys.stderr)
+        return 1
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    if args.out:
+        with open(args.out, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(rows)
+        print(f"Wrote {len(rows) - 1} rows to {args.out}")
+    else:
+        csv.writer(sys.stdout).writerows(rows)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,185 @@
+"""Run instrumentation: per-phase wall/CPU time and per-table Supabase HTTP statistics.
+
+main.py times each phase with `metrics.phase(name)` and attaches `httpx_hooks()` /
+`async_httpx_hooks()` to the Supabase HTTP clients, so every PostgREST request is counted
+with its bytes and latency. `report()` builds the JSON written by --metrics-out; `summary_lines()`
+is what --profile prints.
+"""
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# Bump when the report layout changes.
+REPORT_FORMAT = 1
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class RunMetrics:
+    def __init__(self):
+        self.started = time.time()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        # name -> [wall seconds, cpu seconds, calls]; insertion order is first-seen order
+        self.phases: Dict[str, List[float]] = {}
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._requests: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {'requests': 0, 'errors': 0, 'bytes_sent': 0, 'bytes_received': 0}
+        )
+        self._latencies: Dict[str, List[float]] = defaultdict(list)
+        self._in_flight: Dict[int, float] = {}
+
+    # Phases
+
+    @contextmanager
+    def phase(self, name: str):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+    def add_time(self, name: str, wall: float, cpu: float, calls: int = 1) -> None:
+        """Accumulate into a phase (for work timed elsewhere, e.g. a ladder in a worker process)."""
+        with self._lock:
+            entry = self.phases.setdefault(name, [0.0, 0.0, 0])
+            entry[0] += wall
+            entry[1] += cpu
+            entry[2] += calls
+
+    def count(self, name: str, value: int) -> None:
+        self.counts[name] = value
+
+    # HTTP
+
+    def record_request(self, method: str, table: str, seconds: float, sent: int, received: int, status: int) -> None:
+        with self._lock:
+            stats = self._requests[f'{method} {table}']
+            stats['requests'] += 1
+            stats['errors'] += status >= 400
+            stats['bytes_sent'] += sent
+            stats['bytes_received'] += received
+            self._latencies[f'{method} {table}'].append(seconds)
+
+    def _on_request(self, request) -> None:
+        with self._lock:
+            self._in_flight[id(request)] = time.perf_counter()
+
+    def _on_response(self, response) -> None:
+        request = response.request
+        with self._lock:
+            start = self._in_flight.pop(id(request), None)
+        seconds = time.perf_counter() - start if start is not None else 0.0
+        table = request.url.path.rstrip('/').rsplit('/', 1)[-1]
+        self.record_request(
+            request.method, table, seconds, len(request.content or b''), len(response.content), response.status_code
+        )
+
+    def httpx_hooks(self) -> Dict[str, list]:
+        """event_hooks for an httpx.Client (reads each response body so its size and full latency are known)."""
+        def on_response(response):
+            response.read()
+            self._on_response(response)
+        return {'request': [self._on_request], 'response': [on_response]}
+
+    def async_httpx_hooks(self) -> Dict[str, list]:
+        """event_hooks for an httpx.AsyncClient."""
+        async def on_request(request):
+            self._on_request(request)
+
+        async def on_response(response):
+            await response.aread()
+            self._on_response(response)
+        return {'request': [on_request], 'response': [on_response]}
+
+    def attach(self, client) -> None:
+        """Add the hooks to an httpx.Client's existing event_hooks."""
+        for event, hooks in self.httpx_hooks().items():
+            client.event_hooks[event].extend(hooks)
+
+    # Report
+
+    def report(self, extra: Optional[dict] = None) -> dict:
+        http: Dict[str, dict] = {}
+        all_latencies: List[float] = []
+        with self._lock:
+            for key in sorted(self._requests):
+                latencies = sorted(self._latencies[key])
+                all_latencies.extend(latencies)
+                http[key] = dict(self._requests[key], latency_ms=self._latency_summary(latencies))
+            total = {
+                field: sum(stats[field] for stats in self._requests.values())
+                for field in ('requests', 'errors', 'bytes_sent', 'bytes_received')
+            }
+        total['latency_ms'] = self._latency_summary(sorted(all_latencies))
+        report = {
+            'format': REPORT_FORMAT,
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(self.started)),
+            'argv': sys.argv[1:],
+            'pid': os.getpid(),
+            'wall_seconds': time.perf_counter() - self._wall_start,
+            'cpu_seconds': time.process_time() - self._cpu_start,
+            'peak_rss_mb': peak_rss_mb(),
+            'phases': [
+                {'name': name, 'wall_seconds': wall, 'cpu_seconds': cpu, 'calls': int(calls)}
+                for name, (wall, cpu, calls) in self.phases.items()
+            ],
+            'counts': dict(self.counts),
+            'http': {'by_request': http, 'total': total},
+        }
+        if extra:
+            report.update(extra)
+        return report
+
+    @staticmethod
+    def _latency_summary(latencies: List[float]) -> dict:
+        summary = {f'p{pct}': percentile(latencies, pct) * 1000 for pct in PERCENTILES}
+        summary['max'] = latencies[-1] * 1000 if latencies else 0.0
+        summary['mean'] = sum(latencies) / len(latencies) * 1000 if latencies else 0.0
+        return summary
+
+    def write(self, path: str, extra: Optional[dict] = None) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(extra), f, indent=2)
+
+    def summary_lines(self) -> List[str]:
+        report = self.report()
+        lines = [f"{'phase':<40} {'wall s':>9} {'cpu s':>9} {'calls':>7}"]
+        for phase in report['phases']:
+            lines.append(
+                f"{phase['name']:<40} {phase['wall_seconds']:>9.3f} {phase['cpu_seconds']:>9.3f} {phase['calls']:>7}"
+            )
+        lines.append(f"{'total':<40} {report['wall_seconds']:>9.3f} {report['cpu_seconds']:>9.3f}")
+        if report['http']['by_request']:
+            lines.append('')
+            lines.append(f"{'request':<32} {'count':>6} {'sent KB':>9} {'recv KB':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}")
+            rows = list(report['http']['by_request'].items()) + [('total', report['http']['total'])]
+            for key, stats in rows:
+                latency = stats['latency_ms']
+                lines.append(
+                    f"{key:<32} {stats['requests']:>6} {stats['bytes_sent'] / 1024:>9.1f} "
+                    f"{stats['bytes_received'] / 1024:>9.1f} {latency['p50']:>8.1f} {latency['p90']:>8.1f} {latency['p99']:>8.1f}"
+                )
+        lines.append(f"peak RSS: {report['peak_rss_mb']:.0f} MB")
+        return lines
@@ -0,0 +1,210 @@
+"""Local SQLite mirror of the Supabase tables the sync compares against.
+
+`.supabase_mirror.sqlite3` keeps games, game_participation, event_participation and
+players (the snapshot.TABLE_SPECS columns; ratings as JSON text) plus the Supabase host
+they came from. Instead of re-reading whole tables, a run refreshes the mirror:
+
+- rows after the mirror's last key (the high-water mark: games/players `id`,
+  `(game, player)`, `(event, player)`) are fetched with snapshot.py's keyset pages;
+- one count request per table then checks that the mirror holds as many rows as
+  Supabase. A table that still differs (rows inserted below the mark by another client,
+  or deleted) is reloaded in full.
+
+main.py applies every acknowledged write to the mirror (BatchWriter(mirror=...)), so its
+own updates need no re-read. Changes to existing rows made by anything else are invisible
+to both checks; --refresh-mirror reloads every table. --offline reads the mirror as it is,
+for --preflight-only and --dry-run without any Supabase request.
+"""
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from snapshot import TABLE_SPECS, RowCounter, SnapshotLoader
+
+# Bump when the schema changes; an older mirror is dropped and reloaded.
+MIRROR_FORMAT = 1
+
+DEFAULT_MIRROR_PATH = '.supabase_mirror.sqlite3'
+
+_JSON_COLUMNS = frozenset({'updated_rating', 'current_rating'})
+
+
+def _columns(table: str) -> List[str]:
+    return TABLE_SPECS[table][0].split(',')
+
+
+class RefreshStats:
+    """What SupabaseMirror.refresh() did, for the run log and metrics."""
+
+    def __init__(self):
+        # table -> rows fetched (the delta, or the whole table when reloaded)
+        self.fetched: Dict[str, int] = {}
+        self.reloaded: List[str] = []
+        self.count_requests = 0
+
+    def summary(self) -> str:
+        return ', '.join(
+            f"{table} reloaded ({count} rows)" if table in self.reloaded else f"{table} +{count}"
+            for table, count in self.fetched.items()
+        )
+
+
+class SupabaseMirror:
+    """The mirror database; safe to update from the async writer's thread."""
+
+    def __init__(self, path: str = DEFAULT_MIRROR_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        if self._meta('format') != str(MIRROR_FORMAT):
+            self._reset(target='')
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    # -- metadata -------------------------------------------------------------------------
+
+    def _meta(self, name: str) -> Optional[str]:
+        row = self._db.execute('SELECT value FROM meta WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, name: str, value: str) -> None:
+        self._db.execute('INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)', (name, value))
+
+    @property
+    def target(self) -> str:
+        return self._meta('target') or ''
+
+    def loaded_at(self, table: str) -> Optional[str]:
+        """When `table` was last refreshed (None if it never was)."""
+        return self._meta(f'refreshed:{table}')
+
+    def _reset(self, target: str) -> None:
+        """Drop every table and start an empty mirror of `target`."""
+        with self._lock, self._db:
+            for table, (columns, key) in TABLE_SPECS.items():
+                self._db.execute(f'DROP TABLE IF EXISTS {table}')
+                self._db.execute(f"CREATE TABLE {table} ({columns}, PRIMARY KEY ({', '.join(key)})) WITHOUT ROWID")
+            self._db.execute('DELETE FROM meta')
+            self._set_meta('format', str(MIRROR_FORMAT))
+            self._set_meta('target', target)
+
+    # -- reads ----------------------------------------------------------------------------
+
+    def row_count(self, table: str) -> int:
+        return self._db.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+    def last_key(self, table: str) -> Optional[Tuple]:
+        key = TABLE_SPECS[table][1]
+        order = ', '.join(f'{column} DESC' for column in key)
+        return self._db.execute(f"SELECT {', '.join(key)} FROM {table} ORDER BY {order} LIMIT 1").fetchone()
+
+    def rows(self, table: str) -> List[dict]:
+        """Every mirrored row as the snapshot loader returns it (ratings decoded from JSON)."""
+        columns = _columns(table)
+        decode = [column in _JSON_COLUMNS for column in columns]
+        rows = []
+        for values in self._db.execute(f"SELECT {', '.join(columns)} FROM {table}"):
+            rows.append({
+                column: (json.loads(value) if is_json and value is not None else value)
+                for column, value, is_json in zip(columns, values, decode)
+            })
+        return rows
+
+    def snapshot(self, tables: Sequence[str]) -> Dict[str, List[dict]]:
+        return {table: self.rows(table) for table in tables}
+
+    # -- writes ---------------------------------------------------------------------------
+
+    def apply(self, table: str, rows: List[dict]) -> None:
+        """Upsert rows written to Supabase (extra columns, e.g. players.username, are ignored)."""
+        if not rows:
+            return
+        columns = _columns(table)
+        key = TABLE_SPECS[table][1]
+        updates = [column for column in columns if column not in key]
+        # Rows need not carry every column (players writes have no created_at etc.): keep stored values
+        sent = [column for column in columns if column in rows[0]]
+        assignments = ', '.join(f'{column} = excluded.{column}' for column in updates if column in sent)
+        conflict = f"DO UPDATE SET {assignments}" if assignments else 'DO NOTHING'
+        sql = (
+            f"INSERT INTO {table} ({', '.join(sent)}) VALUES ({', '.join('?' * len(sent))}) "
+            f"ON CONFLICT ({', '.join(key)}) {conflict}"
+        )
+        values = [
+            tuple(json.dumps(row[column]) if column in _JSON_COLUMNS and row[column] is not None and not isinstance(row[column], str)
+                  else row[column] for column in sent)
+            for row in rows
+        ]
+        with self._lock, self._db:
+            self._db.executemany(sql, values)
+
+    def _replace(self, table: str, rows: List[dict]) -> None:
+        with self._lock, self._db:
+            self._db.execute(f'DELETE FROM {table}')
+        self.apply(table, rows)
+
+    def _mark_refreshed(self, table: str) -> None:
+        with self._lock, self._db:
+            self._set_meta(f'refreshed:{table}', time.strftime('%Y-%m-%dT%H:%M:%S'))
+
+    # -- refresh --------------------------------------------------------------------------
+
+    def refresh(
+        self,
+        tables: Sequence[str],
+        loader: SnapshotLoader,
+        count_rows: RowCounter,
+        target: str,
+        full: bool = False,
+    ) -> RefreshStats:
+        """Bring `tables` up to date with Supabase: delta past the high-water mark, count check, reload on mismatch.
+
+        A failed delta falls back to a full reload; RuntimeError if that fails too.
+        """
+        stats = RefreshStats()
+        if target != self.target:
+            # another project (or a new mirror): nothing here can be reused
+            self._reset(target)
+        reload = [table for table in tables if full or self.loaded_at(table) is None]
+        for table in tables:
+            if table in reload:
+                continue
+            try:
+                cursor = self.last_key(table)
+                fetched = loader.load_after(table, cursor) if cursor is not None else loader.load_table(table)
+                self.apply(table, fetched)
+                stats.fetched[table] = len(fetched)
+                stats.count_requests += 1
+                in_step = count_rows(table) == self.row_count(table)
+            except Exception as e:
+                # the mirror may now be partly updated; trust only a full reload
+                print(f"Warning: Could not refresh the {table} mirror from Supabase ({e}); reloading it in full")
+                reload.append(table)
+                continue
+            if in_step:
+                self._mark_refreshed(table)
+            else:
+                reload.append(table)
+        if reload:
+            snapshot = loader.load(reload)
+            for table in reload:
+                if table in loader.failed:
+                    with self._lock, self._db:
+                        self._db.execute('DELETE FROM meta WHERE name = ?', (f'refreshed:{table}',))
+                    continue
+                self._replace(table, snapshot[table])
+                self._mark_refreshed(table)
+                stats.fetched[table] = len(snapshot[table])
+                stats.reloaded.append(table)
+            failed = [table for table in reload if table in loader.failed]
+            if failed:
+                # a stale mirror would read as rows to re-insert or skip; the next run reloads these
+                raise RuntimeError(f"Could not load {', '.join(failed)} from Supabase")
+        return stats
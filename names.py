@@ -0,0 +1,315 @@
+"""Resolve sheet spellings of player (and event) names to the canonical ones.
+
+NameIndex follows the matching order of docs/ADD_AN_EVENT.md step 1: exact, then
+case-insensitive, then alphanumeric-normalized (Discord tags like "#4892" and trailing
+"(He/Him)" notes dropped), then fuzzy. All indexes are built once from the canonical
+list:
+
+- dicts from casefolded and normalized keys to the names that share them;
+- a BK-tree over normalized keys, so "within k edits" visits a small part of the list;
+- an inverted index of character trigrams, which finds names that share most of their
+  letters but are too far apart in edits (e.g. "DonKikong/Grunz" for "DonKikong").
+
+dataset.py uses it to add "did you mean" hints to unknown-player/event errors; the CLI
+resolves names from the command line or from the columns of a raw sheet.
+"""
+import argparse
+import csv
+import re
+import sys
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+EXACT = 'exact'
+CASE = 'case'
+NORMALIZED = 'normalized'
+FUZZY = 'fuzzy'
+_TIER = {EXACT: 0, CASE: 1, NORMALIZED: 2, FUZZY: 3}
+
+# Fuzzy candidates: within max(MIN_EDITS, len // 3) edits, or this trigram (Dice) similarity
+MIN_EDITS = 2
+MIN_SIMILARITY = 0.5
+DEFAULT_SUGGESTIONS = 3
+
+_DISCORD_TAG = re.compile(r'#\d{4}$')
+_TRAILING_NOTE = re.compile(r'\s*\([^)]*\)\s*$')
+
+
+def normalize(name: str) -> str:
+    """Casefolded letters and digits only, without a Discord tag or a trailing (note)."""
+    name = _TRAILING_NOTE.sub('', _DISCORD_TAG.sub('', name.strip()))
+    return ''.join(ch for ch in name.casefold() if ch.isalnum())
+
+
+def trigrams(key: str) -> set:
+    padded = f'  {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: Optional[int] = None) -> int:
+    """Levenshtein distance; stops early and returns limit + 1 once it must exceed `limit`."""
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        current = [i]
+        for j, cb in enumerate(b, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class BKTree:
+    """Burkhard-Keller tree over strings under edit distance."""
+
+    def __init__(self, keys: Iterable[str] = ()):
+        # node: [key, {distance: child node index}]
+        self._nodes: List[list] = []
+        for key in keys:
+            self.add(key)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def add(self, key: str) -> None:
+        if not self._nodes:
+            self._nodes.append([key, {}])
+            return
+        node = self._nodes[0]
+        while True:
+            distance = edit_distance(key, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = len(self._nodes)
+                self._nodes.append([key, {}])
+                return
+            node = self._nodes[child]
+
+    def search(self, key: str, max_distance: int) -> List[Tuple[int, str]]:
+        """(distance, key) for every key within `max_distance` edits, nearest first."""
+        if not self._nodes:
+            return []
+        found = []
+        stack = [0]
+        while stack:
+            node_key, children = self._nodes[stack.pop()]
+            distance = edit_distance(key, node_key)
+            if distance <= max_distance:
+                found.append((distance, node_key))
+            # triangle inequality: only subtrees at distance - max .. distance + max can match
+            for edge, child in children.items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        found.sort()
+        return found
+
+
+class NameMatch(NamedTuple):
+    name: str
+    # EXACT, CASE, NORMALIZED or FUZZY
+    kind: str
+    # edits between the normalized spellings
+    distance: int
+    # trigram Dice similarity of the normalized spellings (1.0 for non-fuzzy matches)
+    similarity: float
+
+
+class NameIndex:
+    """Canonical names with exact, casefold, normalized, BK-tree and trigram indexes."""
+
+    def __init__(self, names: Iterable[str]):
+        self.names = list(dict.fromkeys(names))
+        self._exact = set(self.names)
+        self._casefold: Dict[str, List[str]] = {}
+        self._normalized: Dict[str, List[str]] = {}
+        for name in self.names:
+            self._casefold.setdefault(name.casefold(), []).append(name)
+            self._normalized.setdefault(normalize(name), []).append(name)
+        self._keys = [key for key in self._normalized if key]
+        self._key_grams = [trigrams(key) for key in self._keys]
+        self._grams: Dict[str, List[int]] = {}
+        for index, grams in enumerate(self._key_grams):
+            for gram in grams:
+                self._grams.setdefault(gram, []).append(index)
+        self._tree = BKTree(self._keys)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._exact
+
+    def resolve(self, name: str) -> Optional[NameMatch]:
+        """The canonical name when exactly one matches without fuzzing (None otherwise)."""
+        if name in self._exact:
+            return NameMatch(name, EXACT, 0, 1.0)
+        for kind, key, table in ((CASE, name.casefold(), self._casefold), (NORMALIZED, normalize(name), self._normalized)):
+            candidates = table.get(key)
+            if candidates:
+                return NameMatch(candidates[0], kind, 0, 1.0) if len(candidates) == 1 else None
+        return None
+
+    def suggest(self, name: str, limit: int = DEFAULT_SUGGESTIONS) -> List[NameMatch]:
+        """Up to `limit` likely canonical names, best first (tier, then edits, then similarity)."""
+        matches: Dict[str, NameMatch] = {}
+
+        def offer(match: NameMatch) -> None:
+            best = matches.get(match.name)
+            if best is None or _rank(match) < _rank(best):
+                matches[match.name] = match
+
+        if name in self._exact:
+            offer(NameMatch(name, EXACT, 0, 1.0))
+        for candidate in self._casefold.get(name.casefold(), ()):
+            offer(NameMatch(candidate, CASE, 0, 1.0))
+        key = normalize(name)
+        for candidate in self._normalized.get(key, ()):
+            offer(NameMatch(candidate, NORMALIZED, 0, 1.0))
+
+        if key:
+            grams = trigrams(key)
+            max_edits = max(MIN_EDITS, len(key) // 3)
+            near = {found: distance for distance, found in self._tree.search(key, max_edits)}
+            shared: Dict[int, int] = {}
+            for gram in grams:
+                for index in self._grams.get(gram, ()):
+                    shared[index] = shared.get(index, 0) + 1
+            similar = {}
+            for index, count in shared.items():
+                similarity = 2 * count / (len(grams) + len(self._key_grams[index]))
+                if similarity >= MIN_SIMILARITY:
+                    similar[self._keys[index]] = similarity
+            for found in near.keys() | similar.keys():
+                if found == key:
+                    continue
+                distance = near.get(found)
+                if distance is None:
+                    distance = edit_distance(key, found)
+                similarity = similar.get(found)
+                if similarity is None:
+                    found_grams = trigrams(found)
+                    similarity = 2 * len(grams & found_grams) / (len(grams) + len(found_grams))
+                for candidate in self._normalized[found]:
+                    offer(NameMatch(candidate, FUZZY, distance, similarity))
+
+        return sorted(matches.values(), key=_rank)[:limit]
+
+    def hint(self, name: str) -> str:
+        """'; did you mean 'X' or 'Y'?' for error messages ('' when nothing is close)."""
+        match = self.resolve(name)
+        suggestions = [repr(match.name)] if match else [repr(match.name) for match in self.suggest(name)]
+        return f"; did you mean {' or '.join(suggestions)}?" if suggestions else ''
+
+
+def _rank(match: NameMatch):
+    return _TIER[match.kind], match.distance, -match.similarity, match.name
+
+
+def sheet_names(path: str, columns: Sequence[str]) -> Dict[str, int]:
+    """{name: rows it appears in} from the given columns of a CSV (blank cells skipped)."""
+    counts: Dict[str, int] = {}
+    with open(path, newline='', encoding='utf-8-sig') as csvfile:
+        reader = csv.DictReader(csvfile)
+        missing = [column for column in columns if column not in (reader.fieldnames or ())]
+        if missing:
+            raise ValueError(f"{path} has no column(s) {', '.join(missing)} (columns: {', '.join(reader.fieldnames or ())})")
+        for row in reader:
+            for column in columns:
+                name = (row[column] or '').strip()
+                if name:
+                    counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def remap_rows(index: NameIndex, names: Iterable[str]) -> List[List[str]]:
+    """[sheet name, match kind, canonical name, suggestions] for every name that is not exact."""
+    rows = []
+    for name in names:
+        if name in index:
+            continue
+        match = index.resolve(name)
+        suggestions = index.suggest(name)
+        rows.append([
+            name,
+            match.kind if match else (FUZZY if suggestions else 'unmatched'),
+            match.name if match else '',
+            ' | '.join(f"{s.name} ({s.kind}, {s.distance} edits)" for s in suggestions),
+        ])
+    return rows
+
+
+def _read_usernames(path: str) -> List[str]:
+    with open(path, newline='', encoding='utf-8') as csvfile:
+        return [row['username'] for row in csv.DictReader(csvfile)]
+
+
+def main(argv=None) -> int:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--players', default='players_rows.csv', help='Canonical usernames (default: players_rows.csv).')
+    parser = argparse.ArgumentParser(description='Match sheet spellings of player names to players_rows.csv.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    check = commands.add_parser('check', help='Validate values.csv against players_rows.csv / events_rows.csv, with name suggestions.')
+    check.add_argument('--values', default='values.csv')
+    check.add_argument('--players', default='players_rows.csv')
+    check.add_argument('--events', default='events_rows.csv')
+
+    resolve = commands.add_parser('resolve', parents=[common], help='Canonical name or suggestions for each NAME.')
+    resolve.add_argument('name', nargs='+')
+
+    scan = commands.add_parser('scan', parents=[common], help='Remap table for the name columns of a raw sheet.')
+    scan.add_argument('sheet', help='CSV export (e.g. under data/source/).')
+    scan.add_argument('--columns', required=True, help='Comma-separated name columns, e.g. Winner,Loser.')
+    scan.add_argument('--out', help='Write the remap table as CSV here instead of printing it.')
+    args = parser.parse_args(argv)
+
+    if args.command == 'check':
+        from dataset import DatasetError, load_values
+        from input_cache import load_reference_tables
+        player_key, event_key, _, _ = load_reference_tables(args.players, args.events)
+        try:
+            dataset = load_values(args.values, event_key, player_key)
+        except DatasetError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        print(f"{args.values}: {len(dataset)} games, {len(dataset.player_names)} players, all known.")
+        return 0
+
+    index = NameIndex(_read_usernames(args.players))
+    if args.command == 'resolve':
+        for name in args.name:
+            match = index.resolve(name)
+            if match:
+                print(f"{name!r}: {match.name!r} ({match.kind})")
+                continue
+            suggestions = index.suggest(name)
+            listed = ', '.join(f"{s.name!r} ({s.kind}, {s.distance} edits)" for s in suggestions) or 'nothing close'
+            print(f"{name!r}: no match; closest: {listed}")
+        return 0
+
+    try:
+        counts = sheet_names(args.sheet, [column.strip() for column in args.columns.split(',') if column.strip()])
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    rows = remap_rows(index, sorted(counts, key=str.casefold))
+    header = ['sheet_name', 'match', 'canonical', 'suggestions']
+    if args.out:
+        with open(args.out, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(header)
+            writer.writerows(rows)
+        print(f"Wrote {len(rows)} non-exact names to {args.out}")
+    else:
+        for name, kind, canonical, suggestions in rows:
+            print(f"{name:<30} {kind:<10} {canonical:<30} {suggestions}")
+    exact = len(counts) - len(rows)
+    print(f"{len(counts)} names: {exact} exact, {sum(1 for row in rows if row[2])} resolved, "
+          f"{sum(1 for row in rows if not row[2])} need a decision (new player or alias).")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,408 @@
+"""Monte Carlo projections for an event in progress: each player's chance to reach every
+stage and to win, from the current ratings and the rest of the bracket or Swiss.
+
+The event is a JSON list of stages, played in order. Seats of later stages refer to
+places in earlier ones, using the match names from docs/ADD_AN_EVENT.md:
+
+    {"stages": [
+      {"name": "Qualifiers", "type": "swiss", "table_size": 3, "rounds": 2, "advance": 12,
+       "players": ["a", "b", ...], "points": {"a": 3, "b": 2}},
+      {"name": "R9", "tables": [["Qualifiers#1", "Qualifiers#8", "Qualifiers#12"], ...]},
+      {"name": "FF", "tables": [{"seats": ["R9 A#1", "R9 B#1", "R9 C#1", "R9 D#1"], "games": 2}]}
+    ]}
+
+- `tables` stages (the default type): table i is named "<stage> <letter>" (R9 A, R9 B, ...)
+  and "R9 A#1" is that table's winner. A seat is a player name or such a reference.
+  `games` plays a table several times (a multi-game final: most wins, ties broken at
+  random). A table already played is given as {"result": [finish order]}.
+- `swiss`: `rounds` more rounds of `table_size` tables among `players`. Each round pairs
+  players by points (ties at random) and gives `place_points` (default [1, 0, ...]) by
+  finish. "<stage>#k" is the k-th place in the final standings. `points` holds the
+  points already scored.
+- `league`: the remaining `games` (tables of player names) of a league such as a 1v1 tier.
+  Standings and references work as for swiss.
+
+The last stage decides the event: its first table's winner, or first place in its
+standings. A game's finish order is sampled from the Plackett-Luce model that rate()
+uses: exp(mu / c) strengths with c = sqrt(sum(sigma^2 + beta^2)) over the table, drawn
+exactly with the Gumbel-max trick. Ratings stay fixed within a simulation.
+
+Simulations run in vectorized batches (every table of a stage is one array operation over
+the batch), spread over worker processes. Batches are seeded from --seed, so a projection
+is reproducible whatever the worker count. Probabilities come with 95% Wilson score
+intervals:
+
+    uv run python projection.py snowdown.json --ladder three_and_four_player --simulations 100000
+    uv run python projection.py season9_t1.json --ladder one_versus_one --history --on 2025-03-01 --out odds.csv
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from matchups import add_rating_source_arguments, load_state
+
+DEFAULT_SIMULATIONS = 20_000
+BATCH_SIZE = 5_000
+STAGE_TYPES = ('tables', 'swiss', 'league')
+
+# 95% two-sided
+_Z = 1.959963984540054
+
+
+class Table(NamedTuple):
+    # per seat: ('player', field index) or ('place', stage index, table index, place index)
+    seats: Tuple[tuple, ...]
+    games: int
+    # fixed finish order (field indices) of a table already played
+    result: Optional[Tuple[int, ...]]
+
+
+class Stage(NamedTuple):
+    name: str
+    kind: str
+    # tables stages: the stage's tables; league: its remaining games
+    tables: Tuple[Table, ...]
+    # swiss / league: field indices and the points already scored
+    players: Tuple[int, ...]
+    points: Tuple[float, ...]
+    table_size: int
+    rounds: int
+    place_points: Tuple[float, ...]
+
+
+class Projection(NamedTuple):
+    players: List[str]
+    stages: List[str]
+    simulations: int
+    # (stages, players): simulations in which the player was seated in the stage
+    reached: np.ndarray
+    # (players,): simulations the player won
+    won: np.ndarray
+
+    def probabilities(self, counts: np.ndarray) -> np.ndarray:
+        return counts / self.simulations
+
+    def intervals(self, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return wilson_interval(counts, self.simulations)
+
+
+def wilson_interval(successes, trials: int, z: float = _Z) -> Tuple[np.ndarray, np.ndarray]:
+    """(low, high) Wilson score interval for successes out of trials, elementwise."""
+    p = np.asarray(successes, dtype=np.float64) / trials
+    denominator = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denominator
+    margin = z * np.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return np.clip(centre - margin, 0.0, 1.0), np.clip(centre + margin, 0.0, 1.0)
+
+
+def table_label(index: int) -> str:
+    """A, B, ..., Z, AA, AB, ... (group numbering as in the match names)."""
+    label = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        label = chr(ord('A') + remainder) + label
+    return label
+
+
+def read_structure(path: str) -> List[dict]:
+    with open(path, encoding='utf-8') as f:
+        structure = json.load(f)
+    stages = structure.get('stages') if isinstance(structure, dict) else structure
+    if not isinstance(stages, list) or not stages:
+        raise ValueError(f"{path}: expected a list of stages (or {{\"stages\": [...]}})")
+    return stages
+
+
+def compile_stages(stages: Sequence[dict]) -> Tuple[List[Stage], List[str]]:
+    """Stages with seats resolved to field indices and references; plus the field (player names)."""
+    players: Dict[str, int] = {}
+    # "R9 A" / "Qualifiers" -> (stage index, table index, seats it has)
+    places: Dict[str, Tuple[int, int, int]] = {}
+    compiled: List[Stage] = []
+
+    def player(name) -> int:
+        if not isinstance(name, str) or not name:
+            raise ValueError(f"Expected a player name, got {name!r}")
+        return players.setdefault(name, len(players))
+
+    def seat(value) -> tuple:
+        if isinstance(value, str) and '#' in value:
+            source, _, place = value.rpartition('#')
+            if source not in places:
+                raise ValueError(f"Seat {value!r} refers to {source!r}, which is not an earlier table or stage")
+            stage_index, table_index, size = places[source]
+            if not place.isdigit() or not 1 <= int(place) <= size:
+                raise ValueError(f"Seat {value!r}: {source} has places 1..{size}")
+            return ('place', stage_index, table_index, int(place) - 1)
+        return ('player', player(value))
+
+    def table(value) -> Table:
+        if isinstance(value, list):
+            value = {'seats': value}
+        if 'result' in value:
+            result = tuple(player(name) for name in value['result'])
+            return Table(tuple(('player', index) for index in result), 1, result)
+        seats = tuple(seat(item) for item in value.get('seats', ()))
+        if len(seats) < 2:
+            raise ValueError(f"A table needs two or more seats, got {value!r}")
+        return Table(seats, int(value.get('games', 1)), None)
+
+    for stage_index, stage in enumerate(stages):
+        name = str(stage.get('name') or f"Stage {stage_index + 1}")
+        kind = stage.get('type', 'tables')
+        if kind not in STAGE_TYPES:
+            raise ValueError(f"Stage {name!r}: unknown type {kind!r} (expected one of {', '.join(STAGE_TYPES)})")
+        if kind == 'tables':
+            tables = tuple(table(value) for value in stage.get('tables', ()))
+            if not tables:
+                raise ValueError(f"Stage {name!r} has no tables")
+            for table_index, compiled_table in enumerate(tables):
+                places[f"{name} {table_label(table_index)}"] = (stage_index, table_index, len(compiled_table.seats))
+            compiled.append(Stage(name, kind, tables, (), (), 0, 0, ()))
+            continue
+
+        members = tuple(player(member) for member in stage.get('players', ()))
+        names = list(stage.get('players', ()))
+        if len(members) < 2 or len(set(members)) != len(members):
+            raise ValueError(f"Stage {name!r} needs two or more distinct players")
+        scored = stage.get('points', {})
+        unknown = sorted(set(scored) - set(names))
+        if unknown:
+            raise ValueError(f"Stage {name!r}: points for players not in it: {', '.join(unknown)}")
+        points = tuple(float(scored.get(member, 0)) for member in names)
+        if kind == 'swiss':
+            table_size = int(stage.get('table_size', 3))
+            if table_size < 2 or len(members) % table_size:
+                raise ValueError(f"Stage {name!r}: {len(members)} players do not fill tables of {table_size}")
+            tables, rounds = (), int(stage.get('rounds', 1))
+        else:
+            tables = tuple(table(value) for value in stage.get('games', ()))
+            for game in tables:
+                if any(kind_ != 'player' or index not in members for kind_, index, *_ in game.seats):
+                    raise ValueError(f"Stage {name!r}: league games must be between its players")
+            table_size = max((len(game.seats) for game in tables), default=2)
+            rounds = 0
+        place_points = tuple(float(value) for value in stage.get('place_points', (1,)))
+        advance = int(stage.get('advance', len(members)))
+        places[name] = (stage_index, 0, min(advance, len(members)))
+        compiled.append(Stage(name, kind, tables, members, points, table_size, rounds, place_points))
+    return compiled, list(players)
+
+
+def _finish_orders(strength: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """(B, n) seat positions in sampled finish order: Plackett-Luce via Gumbel-max on log strengths."""
+    return np.argsort(-(strength + rng.gumbel(size=strength.shape)), axis=1)
+
+
+def _log_strength(seats: np.ndarray, mu: np.ndarray, sigma: np.ndarray, beta: float) -> np.ndarray:
+    """log exp(mu / c) per seat of (B, n) field indices, c as in rate()."""
+    c = np.sqrt(np.sum(sigma[seats] ** 2 + beta ** 2, axis=1, keepdims=True))
+    return mu[seats] / c
+
+
+def _points_for_places(place_points: Sequence[float], size: int) -> np.ndarray:
+    points = np.zeros(size)
+    points[:min(size, len(place_points))] = place_points[:size]
+    return points
+
+
+def _standings(members: np.ndarray, points: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """(B, P) field indices by points, ties in random order."""
+    order = np.argsort(-(points + rng.random(points.shape) * 0.5), axis=1)
+    return members[order]
+
+
+def _play_table(table: Table, outcomes: List[List[np.ndarray]], batch: int, mu, sigma, beta, rng) -> Tuple[np.ndarray, np.ndarray]:
+    """(seats, finish order) of one table over the batch, both (B, n) field indices."""
+    if table.result is not None:
+        order = np.broadcast_to(np.array(table.result, dtype=np.int64), (batch, len(table.result)))
+        return order, order
+    columns = []
+    for source in table.seats:
+        if source[0] == 'player':
+            columns.append(np.full(batch, source[1], dtype=np.int64))
+        else:
+            _, stage_index, table_index, place = source
+            columns.append(outcomes[stage_index][table_index][:, place])
+    seats = np.stack(columns, axis=1)
+    strength = _log_strength(seats, mu, sigma, beta)
+    if table.games == 1:
+        return seats, np.take_along_axis(seats, _finish_orders(strength, rng), axis=1)
+    wins = np.zeros(seats.shape)
+    rows = np.arange(batch)
+    for _ in range(table.games):
+        wins[rows, _finish_orders(strength, rng)[:, 0]] += 1
+    order = np.argsort(-(wins + rng.random(wins.shape) * 0.5), axis=1)
+    return seats, np.take_along_axis(seats, order, axis=1)
+
+
+def simulate(
+    stages: Sequence[Stage],
+    mu: np.ndarray,
+    sigma: np.ndarray,
+    beta: float,
+    simulations: int,
+    rng: np.random.Generator,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Play `simulations` copies of the event at once; (reached (stages, players), won (players)) counts."""
+    field = len(mu)
+    reached = np.zeros((len(stages), field), dtype=np.int64)
+    # per stage, per table: (B, n) finish orders (swiss / league: one table, the standings)
+    outcomes: List[List[np.ndarray]] = []
+    for stage_index, stage in enumerate(stages):
+        if stage.kind == 'tables':
+            results = []
+            for table in stage.tables:
+                seats, order = _play_table(table, outcomes, simulations, mu, sigma, beta, rng)
+                reached[stage_index] += np.bincount(seats.ravel(), minlength=field)
+                results.append(order)
+            outcomes.append(results)
+            continue
+
+        members = np.array(stage.players, dtype=np.int64)
+        reached[stage_index, members] += simulations
+        points = np.tile(np.array(stage.points), (simulations, 1))
+        rows = np.arange(simulations)[:, None]
+        if stage.kind == 'swiss':
+            awards = _points_for_places(stage.place_points, stage.table_size)
+            for _ in range(stage.rounds):
+                # pair by points: consecutive standings positions share a table
+                pairing = np.argsort(-(points + rng.random(points.shape) * 0.5), axis=1)
+                tables = pairing.reshape(simulations * (len(members) // stage.table_size), stage.table_size)
+                seats = members[tables]
+                finish = _finish_orders(_log_strength(seats, mu, sigma, beta), rng)
+                table_rows = np.repeat(rows, len(members) // stage.table_size, axis=0)
+                np.add.at(points, (table_rows, np.take_along_axis(tables, finish, axis=1)), awards)
+        else:
+            position = {index: local for local, index in enumerate(stage.players)}
+            for game in stage.tables:
+                local = np.array([position[index] for _, index in game.seats], dtype=np.int64)
+                awards = _points_for_places(stage.place_points, len(local))
+                if game.result is not None:
+                    points[:, [position[index] for index in game.result]] += awards
+                    continue
+                seats = np.broadcast_to(members[local], (simulations, len(local)))
+                finish = _finish_orders(_log_strength(seats, mu, sigma, beta), rng)
+                np.add.at(points, (rows, local[finish]), awards)
+        outcomes.append([_standings(members, points, rng)])
+
+    won = np.bincount(outcomes[-1][0][:, 0], minlength=field)
+    return reached, won
+
+
+# Worker state, set once per process by the pool initializer
+_WORKER: Optional[tuple] = None
+
+
+def _init_worker(stages, mu, sigma, beta) -> None:
+    global _WORKER
+    _WORKER = (stages, mu, sigma, beta)
+
+
+def _run_batch(job: Tuple[np.random.SeedSequence, int]) -> Tuple[np.ndarray, np.ndarray]:
+    seed, size = job
+    stages, mu, sigma, beta = _WORKER
+    return simulate(stages, mu, sigma, beta, size, np.random.default_rng(seed))
+
+
+def project(
+    stages: Sequence[Stage],
+    players: List[str],
+    mu: np.ndarray,
+    sigma: np.ndarray,
+    beta: float,
+    simulations: int = DEFAULT_SIMULATIONS,
+    seed: Optional[int] = None,
+    workers: Optional[int] = None,
+    batch_size: int = BATCH_SIZE,
+) -> Projection:
+    """Simulate the event `simulations` times in batches (in `workers` processes, default one per core)."""
+    sizes = [batch_size] * (simulations // batch_size)
+    if simulations % batch_size:
+        sizes.append(simulations % batch_size)
+    jobs = list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers == 1:
+        _init_worker(stages, mu, sigma, beta)
+        results = [_run_batch(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(stages, mu, sigma, beta)) as pool:
+            results = list(pool.map(_run_batch, jobs))
+    reached = sum(result[0] for result in results)
+    won = sum(result[1] for result in results)
+    return Projection(players, [stage.name for stage in stages], simulations, reached, won)
+
+
+def _percent(value: float) -> str:
+    return f"{100 * value:5.1f}%"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Monte Carlo odds for an event in progress from the ratings main.py produces.')
+    parser.add_argument('structure', help='Event structure JSON (stages; see the module docstring).')
+    add_rating_source_arguments(parser)
+    parser.add_argument('--simulations', type=int, default=DEFAULT_SIMULATIONS, help=f'Simulated events (default: {DEFAULT_SIMULATIONS}).')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed (default: fresh each run).')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per core).')
+    parser.add_argument('--top', type=int, default=20, help='Players to print (default: 20; 0 for all).')
+    parser.add_argument('--out', help='Write every player\'s probabilities and 95%% intervals to this CSV.')
+    args = parser.parse_args(argv)
+
+    if (args.before_game is not None or args.on) and not args.history:
+        parser.error('--before-game/--on need --history')
+    if args.simulations < 1:
+        parser.error('--simulations must be positive')
+
+    try:
+        stages, players = compile_stages(read_structure(args.structure))
+        field = load_state(args).field(players, args.beta)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    projection = project(stages, players, field.mu, field.sigma, args.beta, args.simulations, args.seed, args.workers)
+    final = projection.reached[-1]
+    final_share, win_share = projection.probabilities(final), projection.probabilities(projection.won)
+    win_low, win_high = projection.intervals(projection.won)
+    final_low, final_high = projection.intervals(final)
+    order = sorted(range(len(players)), key=lambda index: (-projection.won[index], -final[index], players[index]))
+
+    print(f"{projection.simulations} simulations, {args.ladder} ratings (95% intervals):")
+    print(f"  {'player':<30} {'final':>6}  {'':<15} {'win':>6}")
+    for index in order[:args.top] if args.top else order:
+        print(
+            f"  {players[index]:<30} {_percent(final_share[index])} "
+            f"[{_percent(final_low[index])}, {_percent(final_high[index])}]"
+            f" {_percent(win_share[index])} "
+            f"[{_percent(win_low[index])}, {_percent(win_high[index])}]"
+        )
+
+    if args.out:
+        header = ['player', 'mu', 'sigma']
+        columns = []
+        for stage_index, stage in enumerate(projection.stages):
+            header += [f'reach {stage}', f'reach {stage} low', f'reach {stage} high']
+            columns.append((projection.reached[stage_index], *projection.intervals(projection.reached[stage_index])))
+        header += ['win', 'win low', 'win high']
+        columns.append((projection.won, win_low, win_high))
+        with open(args.out, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            for index in order:
+                row = [players[index], float(field.mu[index]), float(field.sigma[index])]
+                for counts, low, high in columns:
+                    row += [float(counts[index]) / projection.simulations, float(low[index]), float(high[index])]
+                writer.writerow(row)
+        print(f"Wrote {len(players)} players to {args.out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,512 @@
+"""Importable rating replay: parsed inputs in, ladder ratings and per-event history out.
+
+Nothing here touches the network, reads files or builds a model at import time, so other
+tools can replay values.csv without the Supabase client:
+
+    from rating_engine import RatingEngine
+    result = RatingEngine.from_files().replay()
+    result.player_ratings['all_time']['some player'].mu
+
+main.py is the CLI around it: preflight, Supabase sync and exports over a ReplayResult.
+"""
+import time
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from checkpoints import (
+    CheckpointStore,
+    chain_digests,
+    event_boundaries,
+    input_seed,
+    restore_ratings,
+    snapshot_ratings,
+)
+from input_cache import DEFAULT_CACHE_DIR, Inputs, load_inputs
+from ladders import LADDERS, game_ladders, precompute_ladder_ratings
+
+ENGINES = ('openskill', 'numpy')
+
+# Rating stored for a player with no three_and_four_player games yet.
+DEFAULT_SITE_RATING = {"mu": 25, "sigma": 8.333333333333334, "ordinal": 1200}
+
+
+def site_rating(rating) -> dict:
+    """{mu, sigma, ordinal} as stored in Supabase and the exports (ordinal on the site scale)."""
+    return {"mu": rating.mu, "sigma": rating.sigma, "ordinal": rating.ordinal(z=3) * 24 + 1200}
+
+
+def site_ordinal(mu, sigma):
+    """Site-scale ordinal from mu/sigma (floats or arrays); equals site_rating()'s ordinal."""
+    return (mu - 3 * sigma) * 24 + 1200
+
+
+def initialize_rating(model, player_ratings, player):
+    if player not in player_ratings:
+        player_ratings[player] = model.rating(name=player)
+
+def initialize_event_rating(rating_by_event, player, event):
+    if event not in rating_by_event:
+        rating_by_event[event] = {}
+    if player not in rating_by_event[event]:
+        rating_by_event[event][player] = []
+
+def update_rating(model, player_ratings, players, ranks):
+    updated_rating = model.rate(teams=[[player_ratings[player]] for player in players], ranks=ranks)
+    for i in range(len(players)):
+        player_ratings[players[i]] = updated_rating[i][0]
+    return updated_rating
+
+def apply_precomputed_rating(player_ratings, players, ladder_result):
+    """Store post-game ratings rated ahead of time per ladder (same return shape as update_rating).
+
+    Updates each player's rating object in place: building a new openskill rating costs a
+    uuid4 per seat, and nothing keeps a reference to the pre-game object.
+    """
+    mus, sigmas = ladder_result
+    updated_rating = []
+    for player, mu, sigma in zip(players, mus, sigmas):
+        rating = player_ratings[player]
+        rating.mu = mu
+        rating.sigma = sigma
+        updated_rating.append([rating])
+    return updated_rating
+
+def post_game_values(updated_rating) -> List[List[float]]:
+    """[mus, sigmas] of a rate_ladder result (read now: precomputed ratings are updated in place)."""
+    return [[team[0].mu for team in updated_rating], [team[0].sigma for team in updated_rating]]
+
+def update_event_rating(event_rating, players, updated_rating):
+    # each player in players needs their updated_rating stored in player_ratings
+    for i in range(len(players)):
+        event_rating[players[i]].append(site_rating(updated_rating[i][0]))
+
+def initialize_supabase_rating(rating_for_supabase, current_rating, player, event):
+    if event not in rating_for_supabase:
+        rating_for_supabase[event] = {}
+    if player not in rating_for_supabase[event]:
+        if player not in current_rating:
+            rating_for_supabase[event][player] = [{"games_won": 0}, dict(DEFAULT_SITE_RATING)]
+        else:
+            rating_for_supabase[event][player] = [{"games_won": 0}, site_rating(current_rating[player])]
+
+def update_supabase_rating(rating_for_supabase, players, ranks, should_update, previous_ratings):
+    for i in range(len(players)):
+        player = players[i]
+        if ranks[i] == 1:
+            rating_for_supabase[player][0]['games_won'] += 1
+        if should_update:
+            if player in previous_ratings:
+                rating_for_supabase[player][1] = site_rating(previous_ratings[player])
+            else:
+                rating_for_supabase[player].append(dict(DEFAULT_SITE_RATING))
+
+
+class ReplayResult(NamedTuple):
+    # {ladder: {player: openskill rating}} after the last game
+    player_ratings: Dict[str, Dict[str, object]]
+    # {event_id: {player: [site rating after each all_time game in the event]}}
+    rating_by_event: Dict[int, Dict[str, List[dict]]]
+    # {event_id: {player: [{'games_won': n}, three_and_four_player rating]}} (event_participation rows)
+    rating_for_supabase: Dict[int, Dict[str, list]]
+    # per values.csv row: each seat's three_and_four_player rating after the game (game_participation rows)
+    game_ratings: List[List[dict]]
+    # games restored from a checkpoint instead of re-rated
+    resumed_games: int
+    # {event_id: standings snapshot after the event} when the engine has leaderboards
+    standings: Dict[int, dict]
+
+
+class ReplayedGame(NamedTuple):
+    """One values.csv row as RatingEngine.iter_replay() yields it."""
+    row_index: int
+    event: int
+    name: str
+    players: List[str]
+    ranks: List[int]
+    # each seat's three_and_four_player rating after the game (the game_participation row)
+    participation_ratings: List[dict]
+    # True on the event's last row: rating_by_event[event] and rating_for_supabase[event] are final
+    event_complete: bool
+    # on the event's last row, when the engine has leaderboards: LeaderboardTracker.snapshot()
+    standings: Optional[Dict[str, dict]] = None
+
+
+class RatingEngine:
+    """Replays every game of a parsed values.csv through the three rating ladders.
+
+    `model` defaults to openskill's PlackettLuce (imported on first use). `engine` and
+    `parallel_ladders` pick how ladders are rated (see ladders.py); `checkpoint_dir` enables
+    event-boundary checkpoints (see checkpoints.py). `log` receives progress lines and
+    `metrics` (a metrics.RunMetrics) the replay's phase timings. `history` (a
+    history.HistoryRecorder) receives every post-game rating on every ladder,
+    `leaderboards` (a leaderboard.LeaderboardTracker) is kept ranked after every game,
+    `head_to_head` (a head_to_head.HeadToHeadRecorder) receives every game's seats and ranks,
+    and `strength_of_schedule` (a strength_of_schedule.StrengthOfSchedule) every post-game
+    rating with its event.
+    """
+
+    def __init__(
+        self,
+        inputs: Inputs,
+        model=None,
+        engine: str = 'openskill',
+        parallel_ladders: bool = False,
+        checkpoint_dir: Optional[str] = None,
+        log: Callable[[str], None] = print,
+        metrics=None,
+        history=None,
+        leaderboards=None,
+        head_to_head=None,
+        strength_of_schedule=None,
+    ):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine!r} (expected one of {', '.join(ENGINES)})")
+        if model is None:
+            from openskill.models import PlackettLuce
+            model = PlackettLuce()
+        self.inputs = inputs
+        self.dataset = inputs.dataset
+        self.model = model
+        self.engine = engine
+        self.parallel_ladders = parallel_ladders
+        self.checkpoint_dir = checkpoint_dir
+        self.log = log
+        self.metrics = metrics
+        self.history = history
+        self.leaderboards = leaderboards
+        self.head_to_head = head_to_head
+        self.strength_of_schedule = strength_of_schedule
+        # set by iter_replay() / replay()
+        self.result: Optional[ReplayResult] = None
+        # rows rated so far (values.csv rows, then any rate_appended() games)
+        self.rows_rated = 0
+        # sets: membership is checked several times per game
+        self.one_versus_one_event_list = {key for key, value in inputs.rated_event.items() if value == 'false'}
+        self.three_and_four_player_event_list = set(inputs.event_key.values()) - self.one_versus_one_event_list
+
+    @classmethod
+    def from_files(
+        cls,
+        values_path: str = 'values.csv',
+        players_path: str = 'players_rows.csv',
+        events_path: str = 'events_rows.csv',
+        cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+        **kwargs,
+    ) -> 'RatingEngine':
+        """Engine over the input CSVs (through the input cache). Raises dataset.DatasetError."""
+        return cls(load_inputs(values_path, players_path, events_path, cache_dir), **kwargs)
+
+    def ladders_for(self, event: int) -> List[str]:
+        return game_ladders(event, self.one_versus_one_event_list, self.three_and_four_player_event_list)
+
+    def _phase(self, name: str):
+        return self.metrics.phase(name) if self.metrics is not None else nullcontext()
+
+    def replay(self) -> ReplayResult:
+        """Rate every game in values.csv order (resuming from a checkpoint when one matches)."""
+        for _ in self.iter_replay():
+            pass
+        return self.result
+
+    def iter_replay(self, keep_history: bool = True) -> Iterator[ReplayedGame]:
+        """Rate every game in values.csv order, yielding each one as soon as it is rated.
+
+        `self.result` is set before the first game is yielded and its containers fill as the
+        replay runs. With keep_history=False, game_ratings is not kept and each event's
+        rating_by_event entry is dropped once the consumer has seen its last game, so memory
+        does not grow with the length of the history (exporters write it as they go).
+        """
+        model = self.model
+        games = self.dataset.games()
+        total_rows = len(games)
+        one_versus_one_event_list = self.one_versus_one_event_list
+        three_and_four_player_event_list = self.three_and_four_player_event_list
+
+        player_ratings = {ladder: {} for ladder in LADDERS}
+        rating_by_event = dict()
+        rating_for_supabase = dict()
+
+        # Resume from the last event-boundary checkpoint whose values.csv prefix still matches;
+        # games before it are re-emitted from the checkpoint instead of re-rated.
+        boundaries = event_boundaries(self.dataset.game_event.tolist())
+        boundary_segments = {rows: segment for segment, rows in enumerate(boundaries)}
+        checkpoint_store = None
+        digests: List[str] = []
+        cached_games: List[list] = []
+        if self.checkpoint_dir:
+            checkpoint_store = CheckpointStore(self.checkpoint_dir)
+            with self._phase('replay.checkpoint_resume'):
+                seed = input_seed(self.inputs.event_key, self.inputs.rated_event, model, self.engine)
+                digests = chain_digests(seed, self.dataset.row_keys(), boundaries)
+                _, resume_state, cached_games = checkpoint_store.resume_point(digests)
+            if resume_state is not None:
+                player_ratings = restore_ratings(resume_state['player_ratings'], model)
+                # JSON object keys are strings; events are keyed by int id everywhere else
+                rating_for_supabase = {
+                    int(event): players for event, players in resume_state['rating_for_supabase'].items()
+                }
+                self.log(
+                    f"Resuming from checkpoint: {len(cached_games)} games restored, "
+                    f"{total_rows - len(cached_games)} to replay."
+                )
+            else:
+                self.log("No matching checkpoint; replaying from the first game.")
+        resume_rows = len(cached_games)
+        segment_games: List[list] = []
+        game_events = self.dataset.game_event.tolist()
+        last_rows = {event: row_index for row_index, event in enumerate(game_events)}
+
+        # Ladders are rated up front (per-ladder, optionally one process each) for the NumPy engine
+        # or parallel_ladders; otherwise inline, game by game, in the loop below.
+        ladder_results = None
+        if self.engine == 'numpy' or self.parallel_ladders:
+            mode = 'one worker process per ladder' if self.parallel_ladders else 'in process'
+            self.log(f"Rating {total_rows - resume_rows} games with the {self.engine} engine ({mode})...")
+            timings: Dict[str, tuple] = {}
+            ladder_results = precompute_ladder_ratings(
+                [
+                    (row_index, event, players, ranks)
+                    for row_index, (event, _, players, ranks) in enumerate(games)
+                    if row_index >= resume_rows
+                ],
+                player_ratings,
+                one_versus_one_event_list,
+                three_and_four_player_event_list,
+                model,
+                engine=self.engine,
+                parallel=self.parallel_ladders,
+                timings=timings,
+            )
+            if self.metrics is not None:
+                for ladder, (wall, cpu) in timings.items():
+                    self.metrics.add_time(f'replay.rate.{ladder}', wall, cpu)
+
+        def rate_ladder(ladder, row_index, players, ranks):
+            if ladder_results is not None:
+                return apply_precomputed_rating(player_ratings[ladder], players, ladder_results[ladder][row_index])
+            return update_rating(model, player_ratings[ladder], players, ranks)
+
+        # Rated inline: time each ladder's model.rate calls ([wall, cpu, calls] per ladder)
+        ladder_time = {ladder: [0.0, 0.0, 0] for ladder in LADDERS}
+        if self.metrics is not None and ladder_results is None:
+            untimed_rate_ladder = rate_ladder
+
+            def rate_ladder(ladder, row_index, players, ranks):
+                wall, cpu = time.perf_counter(), time.process_time()
+                updated_rating = untimed_rate_ladder(ladder, row_index, players, ranks)
+                spent = ladder_time[ladder]
+                spent[0] += time.perf_counter() - wall
+                spent[1] += time.process_time() - cpu
+                spent[2] += 1
+                return updated_rating
+
+        # Post-game mu/sigma per ladder, for the history recorder / leaderboards / strength of
+        # schedule and the checkpoint (so a resumed run can still observe the games it does not re-rate)
+        observed = self.observed
+        keep_ladder_ratings = observed or checkpoint_store is not None
+
+        game_ratings: List[List[dict]] = []
+        self.result = ReplayResult(player_ratings, rating_by_event, rating_for_supabase, game_ratings, resume_rows, {})
+        for row_index, (event, game_name, players, ranks) in enumerate(games):
+            cached = cached_games[row_index] if row_index < resume_rows else None
+
+            # Ratings before the resume point are restored from the checkpoint
+            self._initialize_players(event, players, restored=cached is not None)
+
+            if cached is not None:
+                participation_ratings = cached[0]
+                for player, event_entry in zip(players, cached[1]):
+                    rating_by_event[event][player].append(event_entry)
+                if observed:
+                    self._observe(row_index, event, players, cached[2])
+                yield from self._emit(row_index, event, game_name, players, ranks, participation_ratings,
+                                      last_rows[event] == row_index, game_ratings, keep_history)
+                continue
+
+            participation_ratings, ladder_ratings = self._rate_game(
+                rate_ladder, row_index, event, players, ranks, keep_ladder_ratings
+            )
+            if observed:
+                self._observe(row_index, event, players, ladder_ratings)
+
+            segment_games.append(
+                [participation_ratings, [rating_by_event[event][player][-1] for player in players], ladder_ratings]
+            )
+
+            # Checkpoint the full rating state at each event boundary past the resume point
+            segment = boundary_segments.get(row_index + 1)
+            if checkpoint_store is not None and segment is not None:
+                with self._phase('replay.checkpoint_save'):
+                    checkpoint_store.save(
+                        segment,
+                        digests[segment],
+                        row_index + 1,
+                        {
+                            'player_ratings': snapshot_ratings(player_ratings),
+                            'rating_for_supabase': rating_for_supabase,
+                        },
+                        segment_games,
+                    )
+                segment_games = []
+
+            # Progress indicator every 100 games
+            if (row_index + 1) % 100 == 0:
+                self.log(f"  Rated {row_index + 1}/{total_rows} games... ({((row_index + 1)/total_rows*100):.1f}%)")
+
+            yield from self._emit(row_index, event, game_name, players, ranks, participation_ratings,
+                                  last_rows[event] == row_index, game_ratings, keep_history)
+
+        self.rows_rated = total_rows
+        if checkpoint_store is not None:
+            checkpoint_store.prune(len(boundaries))
+        if self.metrics is not None:
+            for ladder, (wall, cpu, calls) in ladder_time.items():
+                if calls:
+                    self.metrics.add_time(f'replay.rate.{ladder}', wall, cpu, calls)
+
+    def rate_appended(self, games) -> Iterator[ReplayedGame]:
+        """Rate games appended to values.csv after the replay, continuing from its final state.
+
+        For watch mode: `games` are (event, match, players, ranks) tuples, numbered after the
+        last rated row. Appended batches are small, so they are rated with the openskill
+        model whatever the engine. History and leaderboards are updated as in the replay;
+        an appended game never completes its event (more rows may follow).
+        """
+        model = self.model
+        player_ratings = self.result.player_ratings
+        observed = self.observed
+
+        def rate_ladder(ladder, row_index, players, ranks):
+            return update_rating(model, player_ratings[ladder], players, ranks)
+
+        for event, game_name, players, ranks in games:
+            row_index = self.rows_rated
+            self._initialize_players(event, players)
+            participation_ratings, ladder_ratings = self._rate_game(
+                rate_ladder, row_index, event, players, ranks, observed
+            )
+            if observed:
+                self._observe(row_index, event, players, ladder_ratings)
+            if self.head_to_head is not None:
+                self.head_to_head.record(event, players, ranks, self.ladders_for(event))
+            self.rows_rated += 1
+            yield ReplayedGame(row_index, event, game_name, players, ranks, participation_ratings, False)
+
+    def add_events(self, event_key: Dict[str, int], rated_event: Dict[int, str]) -> bool:
+        """Adopt events added to events_rows.csv since the replay (watch mode).
+
+        Returns False, changing nothing, when an event the engine already rated was renumbered
+        or re-categorized: its games would rate differently, so only a new replay is correct.
+        """
+        for name, event_id in self.inputs.event_key.items():
+            if event_key.get(name) != event_id or rated_event.get(event_id) != self.inputs.rated_event.get(event_id):
+                return False
+        self.inputs = self.inputs._replace(event_key=event_key, rated_event=rated_event)
+        self.one_versus_one_event_list = {key for key, value in rated_event.items() if value == 'false'}
+        self.three_and_four_player_event_list = set(event_key.values()) - self.one_versus_one_event_list
+        return True
+
+    def _initialize_players(self, event, players, restored: bool = False) -> None:
+        """Default ratings for players new to the game's ladders and event (restored: state came from a checkpoint)."""
+        model = self.model
+        player_ratings = self.result.player_ratings
+        for player in players:
+            if not restored:
+                if event in self.one_versus_one_event_list:
+                    initialize_rating(model, player_ratings['one_versus_one'], player)
+                if event in self.three_and_four_player_event_list:
+                    initialize_rating(model, player_ratings['three_and_four_player'], player)
+
+                initialize_rating(model, player_ratings['all_time'], player)
+            initialize_event_rating(self.result.rating_by_event, player, event)
+
+            if not restored:
+                initialize_supabase_rating(
+                    self.result.rating_for_supabase, player_ratings['three_and_four_player'], player, event
+                )
+
+    def _rate_game(self, rate_ladder, row_index, event, players, ranks, keep_ladder_ratings):
+        """Rate one game on its ladders; (participation_ratings, {ladder: [mus, sigmas]} when kept)."""
+        player_ratings = self.result.player_ratings
+        ladder_ratings = {}
+        if event in self.one_versus_one_event_list:
+            updated_rating = rate_ladder('one_versus_one', row_index, players, ranks)
+            if keep_ladder_ratings:
+                ladder_ratings['one_versus_one'] = post_game_values(updated_rating)
+
+        if event in self.three_and_four_player_event_list:
+            updated_rating = rate_ladder('three_and_four_player', row_index, players, ranks)
+            if keep_ladder_ratings:
+                ladder_ratings['three_and_four_player'] = post_game_values(updated_rating)
+
+        participation_ratings = [
+            site_rating(player_ratings['three_and_four_player'][player])
+            if player in player_ratings['three_and_four_player'] else dict(DEFAULT_SITE_RATING)
+            for player in players
+        ]
+
+        updated_rating = rate_ladder('all_time', row_index, players, ranks)
+        update_event_rating(self.result.rating_by_event[event], players, updated_rating)
+        if keep_ladder_ratings:
+            ladder_ratings['all_time'] = post_game_values(updated_rating)
+
+        # boolean variable for whether the event is a one versus one event
+        should_update = event in self.three_and_four_player_event_list
+        update_supabase_rating(
+            self.result.rating_for_supabase[event], players, ranks, should_update, player_ratings['three_and_four_player']
+        )
+        return participation_ratings, ladder_ratings
+
+    @property
+    def observed(self) -> bool:
+        """Whether anything needs each game's post-game ladder ratings."""
+        return self.history is not None or self.leaderboards is not None or self.strength_of_schedule is not None
+
+    def _observe(self, row_index, event, players, ladder_ratings) -> None:
+        for ladder, (mus, sigmas) in ladder_ratings.items():
+            if self.strength_of_schedule is not None:
+                self.strength_of_schedule.observe(event, ladder, players, mus, sigmas)
+            if self.history is not None:
+                self.history.record(ladder, row_index, players, mus, sigmas)
+            if self.leaderboards is not None:
+                self.leaderboards.update(ladder, players, map(site_ordinal, mus, sigmas))
+
+    def _emit(self, row_index, event, game_name, players, ranks, participation_ratings, event_complete,
+              game_ratings, keep_history) -> Iterator[ReplayedGame]:
+        if self.head_to_head is not None:
+            self.head_to_head.record(event, players, ranks, self.ladders_for(event))
+        standings = None
+        if event_complete and self.leaderboards is not None:
+            standings = self.leaderboards.snapshot(self.result.rating_by_event[event])
+            if keep_history:
+                self.result.standings[event] = standings
+        if keep_history:
+            game_ratings.append(participation_ratings)
+        yield ReplayedGame(
+            row_index, event, game_name, players, ranks, participation_ratings, event_complete, standings
+        )
+        if event_complete and not keep_history:
+            del self.result.rating_by_event[event]
+
+    def verify_parity(self, tolerance: float = 1e-9) -> bool:
+        """Replay every ladder through openskill and the NumPy engine; False if any post-game value differs by more than tolerance."""
+        from array_engine import max_parity_error
+
+        ok = True
+        for ladder in LADDERS:
+            players_per_game = []
+            ranks_per_game = []
+            for event, _, players, ranks in self.dataset.games():
+                if ladder not in self.ladders_for(event):
+                    continue
+                players_per_game.append(players)
+                ranks_per_game.append(ranks)
+            errors = max_parity_error(players_per_game, ranks_per_game, type(self.model)())
+            worst = max(errors['mu'], errors['sigma'], errors['ordinal'])
+            status = 'OK' if worst <= tolerance else 'MISMATCH'
+            ok = ok and worst <= tolerance
+            self.log(
+                f"  {ladder}: {errors['games']} games; max |diff| mu {errors['mu']:.3e}, "
+                f"sigma {errors['sigma']:.3e}, ordinal {errors['ordinal']:.3e} -> {status}"
+            )
+        return ok
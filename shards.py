@@ -0,0 +1,122 @@
+"""Sharded rating exports (main.py --shard-dir DIR) for static hosting.
+
+Next to the whole-history exports, a run can write one small compact JSON file per event
+and per player, plus a manifest the site reads first:
+
+    DIR/manifest.json        {"format": 1, "events": {"12": {"path": "events/12.json",
+                              "sha256": "...", "bytes": 812}, ...}, "players": {"name": {...}}}
+    DIR/events/<id>.json     {"event": 12, "players": {name: [{"games_won": n}, rating]},
+                              "standings": {ladder: ...}}
+    DIR/players/<id>.json    {"player": name, "id": 7, "ratings": {ladder: rating},
+                              "events": [{"event": 12, "games_won": n, "ratings": [...]}]}
+
+Shards are keyed by Supabase id (events_rows.csv / players_rows.csv), so names never need
+escaping in a path. A shard is only rewritten when its content hash differs from the
+previous manifest (or the file is missing or has the wrong size), so a run that adds one
+event rewrites that event, the players in it and the manifest. Shards of events or players
+that are gone are removed. Each file is replaced atomically and the manifest is written
+last, so a publisher syncing DIR never sees a manifest pointing at a half-written shard.
+"""
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+SHARD_FORMAT = 1
+MANIFEST_NAME = 'manifest.json'
+
+_COMPACT = (',', ':')
+
+
+def _read_manifest(path: str) -> Dict[str, Dict[str, dict]]:
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'events': {}, 'players': {}}
+    if manifest.get('format') != SHARD_FORMAT:
+        return {'events': {}, 'players': {}}
+    return {kind: manifest.get(kind, {}) for kind in ('events', 'players')}
+
+
+class ShardedExporter:
+    """Collects events as the replay completes them and writes the changed shards under `root`."""
+
+    def __init__(self, root: str, player_ids: Dict[str, int]):
+        self.root = root
+        self.player_ids = player_ids
+        self._previous = _read_manifest(os.path.join(root, MANIFEST_NAME))
+        self._manifest: Dict[str, Dict[str, dict]] = {'events': {}, 'players': {}}
+        # player -> their per-event entries, in event order
+        self._history: Dict[str, List[dict]] = {}
+        self.written = 0
+        self.unchanged = 0
+        self.removed = 0
+        for kind in ('events', 'players'):
+            os.makedirs(os.path.join(root, kind), exist_ok=True)
+
+    def _write(self, kind: str, name: str, shard_id: int, content: dict) -> None:
+        data = json.dumps(content, separators=_COMPACT).encode('utf-8')
+        relative = f"{kind}/{shard_id}.json"
+        entry = {'path': relative, 'sha256': hashlib.sha256(data).hexdigest(), 'bytes': len(data)}
+        self._manifest[kind][name] = entry
+        path = os.path.join(self.root, relative)
+        previous = self._previous[kind].get(name)
+        if previous == entry:
+            try:
+                if os.path.getsize(path) == len(data):
+                    self.unchanged += 1
+                    return
+            except OSError:
+                pass
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(data)
+        os.replace(temporary, path)
+        self.written += 1
+
+    def add_event(
+        self,
+        event: int,
+        ratings: Dict[str, List[dict]],
+        participation: Dict[str, list],
+        standings: Optional[dict],
+    ) -> None:
+        """Write an event's shard once it is complete (its rating_by_event / rating_for_supabase entries)."""
+        self._write('events', str(event), event, {'event': event, 'players': participation, 'standings': standings})
+        for player, event_ratings in ratings.items():
+            entry = participation.get(player)
+            self._history.setdefault(player, []).append({
+                'event': event,
+                'games_won': entry[0]['games_won'] if entry else 0,
+                'ratings': event_ratings,
+            })
+
+    def finish(self, ladder_ratings: Dict[str, Dict[str, dict]]) -> None:
+        """Write the player shards ({ladder: {player: site rating}}), drop stale shards, then the manifest."""
+        for player, events in self._history.items():
+            player_id = self.player_ids[player]
+            ratings = {ladder: ratings[player] for ladder, ratings in ladder_ratings.items() if player in ratings}
+            self._write('players', player, player_id, {
+                'player': player, 'id': player_id, 'ratings': ratings, 'events': events,
+            })
+        for kind in ('events', 'players'):
+            current = {entry['path'] for entry in self._manifest[kind].values()}
+            for name, entry in self._previous[kind].items():
+                if entry.get('path') not in current:
+                    try:
+                        os.remove(os.path.join(self.root, entry['path']))
+                        self.removed += 1
+                    except OSError:
+                        pass
+        manifest_path = os.path.join(self.root, MANIFEST_NAME)
+        with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'format': SHARD_FORMAT, **self._manifest}, f, separators=_COMPACT)
+        os.replace(manifest_path + '.tmp', manifest_path)
+
+    def summary(self) -> str:
+        total = self.written + self.unchanged
+        return (
+            f"{self.written} of {total} shards rewritten ({self.unchanged} unchanged"
+            + (f", {self.removed} removed" if self.removed else '') + f") in {self.root}"
+        )
@@ -0,0 +1,162 @@
+"""One-pass snapshot of the Supabase tables the sync compares against.
+
+Each table is read once with keyset pagination (`key > last`, never OFFSET), so a page
+costs the same at row 1,000 as at row 1,000,000. When the first page comes back full,
+the rest of the leading key's range is split into slices that are paged concurrently.
+Only the tables the run mode needs are fetched (see MODE_TABLES).
+
+Pages are fetched through a blocking `fetch_page` callable, so the same loader runs over
+the sync supabase client (worker threads) or the asyncio engine (see async_sync.py).
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# PostgREST/Supabase default max rows per request.
+PAGE_SIZE = 1000
+
+DEFAULT_LOAD_CONCURRENCY = 8
+
+# table -> (columns, key columns). The leading key column is an integer and is used to
+# split the table into ranges; the full key orders rows and drives the keyset cursor.
+TABLE_SPECS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    'games': ('id,event,name', ('id',)),
+    'game_participation': ('game,player,ranking,updated_rating', ('game', 'player')),
+    'event_participation': ('event,player,games_won,updated_rating', ('event', 'player')),
+    'players': ('id,current_rating', ('id',)),
+}
+
+# Tables each run mode compares against.
+MODE_TABLES: Dict[str, Tuple[str, ...]] = {
+    'preflight': ('games',),
+    'sync': ('games', 'game_participation', 'event_participation', 'players'),
+}
+
+# (column, operator, value), e.g. ('id', 'gt', 1000)
+Filter = Tuple[str, str, object]
+# fetch_page(table, columns, order, filters, or_filter, limit) -> rows
+# order items are PostgREST 'column.asc' / 'column.desc' strings; or_filter is the body of a
+# PostgREST or=(...) filter without the parentheses (as supabase-py's or_() takes it).
+PageFetcher = Callable[[str, str, Sequence[str], Sequence[Filter], Optional[str], int], List[dict]]
+# count_rows(table) -> rows in the table (PostgREST count=exact)
+RowCounter = Callable[[str], int]
+
+
+def supabase_page_fetcher(client) -> PageFetcher:
+    """PageFetcher over a supabase-py client."""
+    def fetch_page(table, columns, order, filters, or_filter, limit):
+        query = client.table(table).select(columns)
+        for column, operator, value in filters:
+            query = query.filter(column, operator, value)
+        if or_filter:
+            query = query.or_(or_filter)
+        for item in order:
+            column, direction = item.split('.')
+            query = query.order(column, desc=direction == 'desc')
+        return query.limit(limit).execute().data or []
+    return fetch_page
+
+
+def supabase_row_counter(client) -> RowCounter:
+    """RowCounter over a supabase-py client (one request, at most one row returned)."""
+    def count_rows(table):
+        lead = TABLE_SPECS[table][1][0]
+        return client.table(table).select(lead, count='exact').limit(1).execute().count or 0
+    return count_rows
+
+
+def _after(key: Sequence[str], cursor: Sequence[object]) -> Tuple[List[Filter], Optional[str]]:
+    """Filters selecting rows strictly after `cursor` in `key` order."""
+    if len(key) == 1:
+        return [(key[0], 'gt', cursor[0])], None
+    lead, rest = key[0], key[1]
+    return [], f'{lead}.gt.{cursor[0]},and({lead}.eq.{cursor[0]},{rest}.gt.{cursor[1]})'
+
+
+class SnapshotLoader:
+    """Loads whole tables through `fetch_page` with up to `concurrency` range slices per table."""
+
+    def __init__(self, fetch_page: PageFetcher, concurrency: int = DEFAULT_LOAD_CONCURRENCY, page_size: int = PAGE_SIZE):
+        self.fetch_page = fetch_page
+        self.concurrency = max(1, concurrency)
+        self.page_size = page_size
+        self.request_count = 0
+        # tables load() could not read (they map to [])
+        self.failed: List[str] = []
+        self._count_lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def _fetch(self, table, columns, order, filters, or_filter, limit=None) -> List[dict]:
+        with self._count_lock:
+            self.request_count += 1
+        return self.fetch_page(table, columns, order, filters, or_filter, limit or self.page_size)
+
+    def _page_range(self, table: str, cursor: Optional[Sequence[object]], low, high) -> List[dict]:
+        """All rows with low <= lead < high (either bound may be None), after `cursor`, in key order."""
+        columns, key = TABLE_SPECS[table]
+        order = [f'{column}.asc' for column in key]
+        bounds: List[Filter] = []
+        if low is not None:
+            bounds.append((key[0], 'gte', low))
+        if high is not None:
+            bounds.append((key[0], 'lt', high))
+        rows: List[dict] = []
+        while True:
+            filters, or_filter = _after(key, cursor) if cursor is not None else ([], None)
+            batch = self._fetch(table, columns, order, bounds + filters, or_filter)
+            rows.extend(batch)
+            if len(batch) < self.page_size:
+                return rows
+            cursor = [batch[-1][column] for column in key]
+
+    def load_after(self, table: str, cursor: Sequence[object]) -> List[dict]:
+        """Rows after `cursor` (a full key, e.g. a mirror's last row) in key order, one page at a time."""
+        return self._page_range(table, cursor, None, None)
+
+    def load_table(self, table: str) -> List[dict]:
+        """Every row of `table`: first page, then the rest of the key range in concurrent slices."""
+        columns, key = TABLE_SPECS[table]
+        lead = key[0]
+        if self.concurrency == 1 or self._pool is None:
+            return self._page_range(table, None, None, None)
+
+        order = [f'{column}.asc' for column in key]
+        rows = self._fetch(table, columns, order, [], None)
+        if len(rows) < self.page_size:
+            return rows
+        cursor = [rows[-1][column] for column in key]
+        last = self._fetch(table, lead, [f'{lead}.desc'], [], None, 1)
+        start, end = rows[-1][lead], last[0][lead] if last else rows[-1][lead]
+
+        # Estimate how many rows remain from the first page's density and split the rest of
+        # the leading key range into that many pages' worth of slices (at most `concurrency`).
+        span = max(1, rows[-1][lead] - rows[0][lead] + 1)
+        remaining = (end - start) * len(rows) / span
+        slices = int(min(self.concurrency, max(1, -(-remaining // self.page_size))))
+        step = max(1, -(-(end - start + 1) // slices))
+        edges = [start + i * step for i in range(slices)] + [None]
+        futures = [
+            self._pool.submit(
+                self._page_range, table, cursor if i == 0 else None, edges[i] if i else None, edges[i + 1]
+            )
+            for i in range(slices)
+        ]
+        for future in futures:
+            rows.extend(future.result())
+        return rows
+
+    def load(self, tables: Sequence[str]) -> Dict[str, List[dict]]:
+        """{table: rows}; a table that fails to load maps to [] (with a warning)."""
+        with ThreadPoolExecutor(max_workers=self.concurrency + len(tables)) as pool:
+            self._pool = pool
+            futures = {table: pool.submit(self.load_table, table) for table in tables}
+            snapshot: Dict[str, List[dict]] = {}
+            for table, future in futures.items():
+                try:
+                    snapshot[table] = future.result()
+                except Exception as e:
+                    print(f"Warning: Could not load {table} from Supabase: {e}")
+                    snapshot[table] = []
+                    self.failed.append(table)
+        self._pool = None
+        return snapshot
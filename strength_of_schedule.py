@@ -0,0 +1,106 @@
+"""Strength of schedule: how strong each player's opponents were going into their games.
+
+RatingEngine(strength_of_schedule=...) hands StrengthOfSchedule every game's post-game
+ratings on each ladder, as it does for the history recorder. The tracker keeps its own copy
+of each player's latest mu/sigma per ladder, so the pre-game ratings of a game's seats are
+known before the game is applied. That also holds for games restored from a checkpoint or
+rated up front by the NumPy engine.
+
+Per game and ladder, each seat adds its opponents' pre-game mu and site ordinal to two
+streaming accumulators:
+
+- (player, event, ladder): the event's strength of schedule
+- (player, ladder): the career strength of schedule
+
+Each accumulator is a count and two sums, so a game costs O(seats) whatever the length of
+the history. main.py writes the per-event values to event_participation.csv and the
+career values to strength_of_schedule.json.
+"""
+from typing import Dict, Iterator, List, NamedTuple, Sequence, Tuple
+
+from ladders import LADDERS
+from rating_engine import DEFAULT_SITE_RATING, site_ordinal
+
+STRENGTH_OF_SCHEDULE_EXPORT = 'strength_of_schedule'
+
+
+class ScheduleStrength(NamedTuple):
+    # opponent seats faced (a 4-player game counts 3)
+    opponents: int
+    # mean pre-game mu and site ordinal of those opponents
+    mu: float
+    ordinal: float
+
+    def as_dict(self) -> dict:
+        return {'opponents': self.opponents, 'mu': self.mu, 'ordinal': self.ordinal}
+
+
+NO_OPPONENTS = ScheduleStrength(0, 0.0, 0.0)
+
+
+def _strength(accumulator: List[float]) -> ScheduleStrength:
+    count, mu_sum, ordinal_sum = accumulator
+    if not count:
+        return NO_OPPONENTS
+    return ScheduleStrength(int(count), mu_sum / count, ordinal_sum / count)
+
+
+class StrengthOfSchedule:
+    """Streaming per-event and career strength of schedule on every ladder."""
+
+    def __init__(self, default_mu: float = DEFAULT_SITE_RATING['mu'], default_sigma: float = DEFAULT_SITE_RATING['sigma']):
+        self._default = (default_mu, default_sigma)
+        # ladder -> player -> (mu, sigma) after their latest game
+        self._current: Dict[str, Dict[str, Tuple[float, float]]] = {ladder: {} for ladder in LADDERS}
+        # ladder -> player -> [opponents, sum of mu, sum of ordinal]
+        self._career: Dict[str, Dict[str, List[float]]] = {ladder: {} for ladder in LADDERS}
+        # event -> player -> ladder -> [opponents, sum of mu, sum of ordinal]
+        self._events: Dict[int, Dict[str, Dict[str, List[float]]]] = {}
+
+    def observe(self, event: int, ladder: str, players: Sequence[str], mus: Sequence[float], sigmas: Sequence[float]) -> None:
+        """Account one game on `ladder`, given its seats' post-game mu/sigma."""
+        current = self._current[ladder]
+        before = [current.get(player, self._default) for player in players]
+        ordinals = [site_ordinal(mu, sigma) for mu, sigma in before]
+        mu_total = sum(mu for mu, _ in before)
+        ordinal_total = sum(ordinals)
+        opponents = len(players) - 1
+        career = self._career[ladder]
+        event_players = self._events.setdefault(event, {})
+        for player, (mu, _), ordinal in zip(players, before, ordinals):
+            # everyone else at the table: the totals minus the player's own seat
+            mu_sum = mu_total - mu
+            ordinal_sum = ordinal_total - ordinal
+            for accumulator in (
+                career.setdefault(player, [0, 0.0, 0.0]),
+                event_players.setdefault(player, {}).setdefault(ladder, [0, 0.0, 0.0]),
+            ):
+                accumulator[0] += opponents
+                accumulator[1] += mu_sum
+                accumulator[2] += ordinal_sum
+        for player, mu, sigma in zip(players, mus, sigmas):
+            current[player] = (mu, sigma)
+
+    def career(self, player: str, ladder: str = 'all_time') -> ScheduleStrength:
+        accumulator = self._career[ladder].get(player)
+        return _strength(accumulator) if accumulator else NO_OPPONENTS
+
+    def event(self, event: int, player: str, ladder: str = 'all_time') -> ScheduleStrength:
+        accumulator = self._events.get(event, {}).get(player, {}).get(ladder)
+        return _strength(accumulator) if accumulator else NO_OPPONENTS
+
+    def event_value(self, event: int, player: str) -> Dict[str, dict]:
+        """{ladder: {opponents, mu, ordinal}} for the ladders the player's games in `event` were rated on."""
+        return {
+            ladder: _strength(accumulator).as_dict()
+            for ladder, accumulator in self._events.get(event, {}).get(player, {}).items()
+        }
+
+    def export_items(self) -> Iterator[Tuple[str, Dict[str, dict]]]:
+        """(player, {ladder: {opponents, mu, ordinal}}) career values, for the JSON export."""
+        players = dict.fromkeys(player for ladder in LADDERS for player in self._career[ladder])
+        for player in players:
+            yield player, {
+                ladder: _strength(self._career[ladder][player]).as_dict()
+                for ladder in LADDERS if player in self._career[ladder]
+            }
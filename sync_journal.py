@@ -0,0 +1,162 @@
+"""Write-ahead journal of Supabase write chunks, so an interrupted sync can resume.
+
+BatchWriter records every chunk of a flush in the journal (one JSON object per line,
+fsynced) before it sends any of them, and acknowledges each chunk once its request
+succeeds:
+
+    {"op": "begin", "format": 1, "target": "<project host>", "started": "2025-01-31T12:00:00"}
+    {"op": "plan", "seq": 7, "table": "game_participation", "rows": [...]}
+    {"op": "ack", "seq": 7}
+    {"op": "ack", "seq": 3, "failed_games": [2791]}     # games chunk: ids that were not inserted
+    {"op": "sealed"}                                     # the run's last flush is planned
+
+A run that ends with every chunk acknowledged removes the file. Otherwise (killed, network
+down, a failed request) it stays, and `main.py --resume` sends only the unacknowledged
+chunks, in plan order. Once the journal is sealed that is the whole remaining sync: no
+snapshot load and no replay. All writes are upserts on natural keys, so re-sending a chunk
+whose ack was lost is harmless; re-sent games inserts look up ids the interrupted run may
+already have created. A torn last line (crash mid-write) is ignored.
+"""
+import json
+import os
+import threading
+import time
+from typing import List, NamedTuple, Optional, Set
+
+JOURNAL_FORMAT = 1
+DEFAULT_JOURNAL_PATH = '.sync_journal.ndjson'
+
+
+class PendingChunk(NamedTuple):
+    seq: int
+    table: str
+    rows: List[dict]
+
+
+class JournalState(NamedTuple):
+    """What read_journal() found: the chunks still to send and what the run had done."""
+    path: str
+    target: str
+    started: str
+    # the run planned its last flush, so `pending` is all that is left of it
+    sealed: bool
+    acknowledged: int
+    pending: List[PendingChunk]
+    # games ids whose insert did not happen; their participations are skipped again
+    failed_game_ids: Set[int]
+    next_seq: int
+
+
+def read_journal(path: str = DEFAULT_JOURNAL_PATH) -> Optional[JournalState]:
+    """The journal at `path`, or None when there is none. ValueError if it is unreadable."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().split('\n')
+    except FileNotFoundError:
+        return None
+    records = []
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            if number == len(lines):
+                break  # torn last line (no newline yet): the chunks it planned were never sent
+            raise ValueError(f"{path}: line {number} is not valid JSON")
+    if not records or records[0].get('op') != 'begin':
+        raise ValueError(f"{path}: not a sync journal (no begin record)")
+    if records[0].get('format') != JOURNAL_FORMAT:
+        raise ValueError(f"{path}: journal format {records[0].get('format')} (expected {JOURNAL_FORMAT})")
+
+    planned = {}
+    acknowledged = 0
+    failed_game_ids: Set[int] = set()
+    sealed = False
+    for record in records[1:]:
+        op = record.get('op')
+        if op == 'plan':
+            planned[record['seq']] = PendingChunk(record['seq'], record['table'], record['rows'])
+        elif op == 'ack':
+            if planned.pop(record['seq'], None) is not None:
+                acknowledged += 1
+            failed_game_ids.update(record.get('failed_games', ()))
+        elif op == 'sealed':
+            sealed = True
+    next_seq = max((record['seq'] for record in records if 'seq' in record), default=-1) + 1
+    return JournalState(
+        path, records[0].get('target', ''), records[0].get('started', ''), sealed, acknowledged,
+        [planned[seq] for seq in sorted(planned)], failed_game_ids, next_seq,
+    )
+
+
+class SyncJournal:
+    """Append-only journal a BatchWriter plans and acknowledges its chunks in (thread-safe)."""
+
+    def __init__(self, path: str, target: str, state: Optional[JournalState] = None):
+        """Start a new journal at `path` (replacing any old one), or continue `state`'s."""
+        self.path = path
+        self._lock = threading.Lock()
+        self._unacknowledged: Set[int] = set()
+        self.sealed = False
+        if state is None:
+            self._file = open(path, 'w', encoding='utf-8')
+            self._next_seq = 0
+            self._append({
+                'op': 'begin', 'format': JOURNAL_FORMAT, 'target': target,
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            }, durable=True)
+        else:
+            self._file = open(path, 'a', encoding='utf-8')
+            self._next_seq = state.next_seq
+            self._unacknowledged.update(chunk.seq for chunk in state.pending)
+            self.sealed = state.sealed
+
+    @property
+    def unacknowledged(self) -> int:
+        return len(self._unacknowledged)
+
+    def _append(self, record: dict, durable: bool) -> None:
+        self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self._file.flush()
+        if durable:
+            os.fsync(self._file.fileno())
+
+    def plan(self, table: str, chunks: List[List[dict]]) -> List[int]:
+        """Record chunks about to be sent (durably, before any request); returns their seqs."""
+        with self._lock:
+            seqs = []
+            for rows in chunks:
+                seq = self._next_seq
+                self._next_seq += 1
+                self._file.write(json.dumps({'op': 'plan', 'seq': seq, 'table': table, 'rows': rows},
+                                            separators=(',', ':')) + '\n')
+                self._unacknowledged.add(seq)
+                seqs.append(seq)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            return seqs
+
+    def ack(self, seq: int, failed_games: Optional[List[int]] = None) -> None:
+        """Mark a chunk as written. Not fsynced: a lost ack only means the chunk is re-sent."""
+        record = {'op': 'ack', 'seq': seq}
+        if failed_games:
+            record['failed_games'] = failed_games
+        with self._lock:
+            self._append(record, durable=False)
+            self._unacknowledged.discard(seq)
+
+    def seal(self) -> None:
+        """Every chunk of the run is planned: --resume needs nothing but the journal."""
+        with self._lock:
+            self._append({'op': 'sealed'}, durable=True)
+            self.sealed = True
+
+    def finish(self) -> bool:
+        """Close the journal; remove it when the run is sealed and fully acknowledged (returns True)."""
+        with self._lock:
+            self._file.close()
+            if self.sealed and not self._unacknowledged:
+                os.remove(self.path)
+                return True
+        return False
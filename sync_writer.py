@@ -0,0 +1,263 @@
+"""Batched Supabase writes: collect rows per table, flush as chunked multi-row upserts."""
+import json
+import math
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Natural key each table is upserted on (PostgREST `on_conflict`).
+# Requires a matching UNIQUE constraint in the database (see docs/ADD_AN_EVENT.md).
+UPSERT_KEYS: Dict[str, Tuple[str, ...]] = {
+    'games': ('event', 'name'),
+    'game_participation': ('game', 'player'),
+    'event_participation': ('event', 'player'),
+    'players': ('id',),
+}
+
+# Parents before children so FK references exist when participations land.
+FLUSH_ORDER: Tuple[str, ...] = ('games', 'game_participation', 'event_participation', 'players')
+
+# Rows per upsert request; keeps request bodies well under PostgREST/proxy limits.
+UPSERT_CHUNK_SIZE = 500
+
+# Stored ratings round-trip through jsonb numerics; drift below this counts as unchanged.
+RATING_TOLERANCE = 1e-9
+
+# Columns compared when deciding whether a replayed row differs from the stored one.
+COMPARED_FIELDS: Dict[str, Tuple[str, ...]] = {
+    'games': (),
+    'game_participation': ('ranking', 'updated_rating'),
+    'event_participation': ('games_won', 'updated_rating'),
+    'players': ('current_rating',),
+}
+_RATING_FIELDS = frozenset({'updated_rating', 'current_rating'})
+
+SYNC_ACTIONS: Tuple[str, ...] = ('insert', 'update', 'unchanged')
+
+
+def ratings_equal(stored, computed: dict, tolerance: float = RATING_TOLERANCE) -> bool:
+    """True when a stored {"mu","sigma","ordinal"} value matches the replayed one within tolerance."""
+    if isinstance(stored, str):
+        try:
+            stored = json.loads(stored)
+        except ValueError:
+            return False
+    if not isinstance(stored, dict):
+        return False
+    for field in ('mu', 'sigma', 'ordinal'):
+        old = stored.get(field)
+        new = computed.get(field)
+        if old is None or new is None:
+            return False
+        if not math.isclose(float(old), float(new), rel_tol=tolerance, abs_tol=tolerance):
+            return False
+    return True
+
+
+class ChangeSet:
+    """Classifies replayed rows against stored rows and tallies insert/update/unchanged per table."""
+
+    def __init__(self):
+        self.counts: Dict[str, Dict[str, int]] = {
+            table: {action: 0 for action in SYNC_ACTIONS} for table in FLUSH_ORDER
+        }
+
+    def classify(self, table: str, row: dict, stored: Optional[dict]) -> str:
+        """Return 'insert', 'update' or 'unchanged' for `row` and record it."""
+        if stored is None:
+            action = 'insert'
+        else:
+            action = 'unchanged'
+            for field in COMPARED_FIELDS[table]:
+                if field in _RATING_FIELDS:
+                    same = ratings_equal(stored.get(field), row[field])
+                else:
+                    same = stored.get(field) == row[field]
+                if not same:
+                    action = 'update'
+                    break
+        self.counts[table][action] += 1
+        return action
+
+    def dirty_count(self, table: str) -> int:
+        return self.counts[table]['insert'] + self.counts[table]['update']
+
+    def summary_lines(self, rows_written: Optional[Dict[str, int]] = None) -> List[str]:
+        """One line per table; `rows_written` (BatchWriter.rows_written) adds the rows Supabase acknowledged."""
+        return [
+            f"{table}: insert {c['insert']}, update {c['update']}, unchanged {c['unchanged']}"
+            + (f"; written {rows_written.get(table, 0)} of {self.dirty_count(table)}" if rows_written is not None else '')
+            for table, c in self.counts.items()
+        ]
+
+
+class GameIdAllocator:
+    """Hands out explicit games.id values (the column has no DB default/sequence).
+
+    The next free id is computed once from the loaded games; blocks are reserved
+    up front so each new game costs O(1) instead of a max() over every known id.
+    """
+
+    def __init__(self, existing_game_ids: Dict[Tuple[int, str], int]):
+        self._next_id = (max(existing_game_ids.values()) if existing_game_ids else 0) + 1
+        self._reserved: List[int] = []
+
+    def reserve(self, count: int) -> range:
+        """Reserve `count` consecutive ids for games about to be inserted."""
+        block = range(self._next_id, self._next_id + count)
+        self._next_id += count
+        self._reserved.extend(reversed(block))
+        return block
+
+    def take(self) -> int:
+        """Return the next reserved id, extending the reservation if it ran out."""
+        if not self._reserved:
+            self.reserve(1)
+        return self._reserved.pop()
+
+
+class BatchWriter:
+    """Buffers rows per table and writes them as chunked multi-row upserts.
+
+    Rows are keyed on the table's natural key, so queueing the same key twice
+    keeps only the latest row (PostgREST rejects a batch that touches a row twice).
+    With a `journal` (sync_journal.SyncJournal) every chunk of a flush is recorded
+    before the first request and acknowledged once written, so --resume can finish
+    an interrupted sync. With a `mirror` (mirror.SupabaseMirror) written rows are
+    applied to the local mirror as their requests succeed.
+    """
+
+    def __init__(self, client, chunk_size: int = UPSERT_CHUNK_SIZE, journal=None, mirror=None):
+        self.client = client
+        self.chunk_size = chunk_size
+        self.journal = journal
+        self.mirror = mirror
+        self._pending: Dict[str, Dict[tuple, dict]] = {table: {} for table in FLUSH_ORDER}
+        self.failed_game_ids: Set[int] = set()
+        # failed because their request failed (not because the key existed): a journal
+        # keeps their participation chunks unacknowledged so --resume sends them later
+        self.unsent_game_ids: Set[int] = set()
+        self.request_count = 0
+        self.rows_written: Dict[str, int] = {table: 0 for table in FLUSH_ORDER}
+
+    def queue(self, table: str, row: dict) -> None:
+        key = tuple(row[col] for col in UPSERT_KEYS[table])
+        self._pending[table][key] = row
+
+    def pending_count(self, table: Optional[str] = None) -> int:
+        if table is not None:
+            return len(self._pending[table])
+        return sum(len(rows) for rows in self._pending.values())
+
+    def flush(self, tables: Iterable[str] = FLUSH_ORDER, seal: bool = False) -> None:
+        """Write every queued row for `tables`, parents first.
+
+        seal=True marks this as the run's last flush: once its chunks are journaled,
+        the journal alone can finish the sync.
+        """
+        for table, chunks, seqs in self._plan(tables, seal):
+            for seq, chunk, start in zip(seqs, chunks, range(0, len(chunks) * self.chunk_size, self.chunk_size)):
+                self._send_chunk(table, chunk, seq, start)
+
+    def resend(self, pending) -> None:
+        """Send journaled chunks an interrupted run never got acknowledged (sync_journal.PendingChunk)."""
+        for chunk in pending:
+            self._send_chunk(chunk.table, chunk.rows, chunk.seq, 0, resumed=True)
+
+    def _plan(self, tables: Iterable[str], seal: bool) -> List[Tuple[str, List[List[dict]], List[Optional[int]]]]:
+        """Take the queued rows of `tables` as chunks, journaled (before any request) when there is a journal."""
+        wanted = set(tables)
+        planned = []
+        for table in FLUSH_ORDER:
+            if table not in wanted or not self._pending[table]:
+                continue
+            rows = list(self._pending[table].values())
+            self._pending[table] = {}
+            chunks = [rows[start:start + self.chunk_size] for start in range(0, len(rows), self.chunk_size)]
+            seqs = self.journal.plan(table, chunks) if self.journal else [None] * len(chunks)
+            planned.append((table, chunks, seqs))
+        if seal and self.journal:
+            self.journal.seal()
+        return planned
+
+    def _without_failed_games(self, table: str, chunk: List[dict]) -> Tuple[List[dict], bool]:
+        """(rows to send, whether the chunk is complete once they are written)."""
+        if table != 'game_participation' or not self.failed_game_ids:
+            return chunk, True
+        kept = [row for row in chunk if row['game'] not in self.failed_game_ids]
+        if len(kept) == len(chunk):
+            return chunk, True
+        print(f"Skipping {len(chunk) - len(kept)} game_participation rows whose game insert failed.")
+        return kept, not any(row['game'] in self.unsent_game_ids for row in chunk)
+
+    def _ack(self, seq: Optional[int], failed_games: Optional[List[int]] = None) -> None:
+        if seq is not None and self.journal:
+            self.journal.ack(seq, failed_games)
+
+    def _written(self, table: str, rows: List[dict]) -> None:
+        self.rows_written[table] += len(rows)
+        if self.mirror:
+            self.mirror.apply(table, rows)
+
+    def _send_chunk(self, table: str, chunk: List[dict], seq: Optional[int], start: int, resumed: bool = False) -> None:
+        if table == 'games':
+            self._insert_games(chunk, seq, resumed)
+            return
+        chunk, complete = self._without_failed_games(table, chunk)
+        try:
+            if chunk:
+                self.request_count += 1
+                self.client.table(table).upsert(
+                    chunk, on_conflict=','.join(UPSERT_KEYS[table]), returning='minimal'
+                ).execute()
+                self._written(table, chunk)
+            if complete:
+                self._ack(seq)
+        except Exception as e:
+            print(f"Error upserting {len(chunk)} {table} rows (batch starting at {start}): {e}")
+
+    def _insert_games(self, chunk: List[dict], seq: Optional[int] = None, resumed: bool = False) -> None:
+        """Insert new games; a key that already exists (inserted concurrently) keeps its DB id,
+        so the reserved id is marked failed and its participations are skipped.
+
+        resumed: the interrupted run may have inserted some of these rows already (its ack
+        was lost), so ids that exist with the same key count as inserted.
+        """
+        try:
+            self.request_count += 1
+            response = self.client.table('games').upsert(
+                chunk, on_conflict=','.join(UPSERT_KEYS['games']), ignore_duplicates=True
+            ).execute()
+            inserted = {row['id'] for row in (response.data or [])}
+            if resumed and len(inserted) < len(chunk):
+                inserted |= self._existing_games([row for row in chunk if row['id'] not in inserted])
+        except Exception as e:
+            print(f"Error inserting {len(chunk)} games (ids {chunk[0]['id']}..{chunk[-1]['id']}): {e}")
+            self._record_game_inserts(chunk, set())
+            self.unsent_game_ids.update(row['id'] for row in chunk)
+            return
+        failed = self._record_game_inserts(chunk, inserted)
+        self._ack(seq, failed)
+
+    def _existing_games(self, rows: List[dict]) -> Set[int]:
+        """Ids of `rows` already stored under the same (event, name)."""
+        self.request_count += 1
+        response = self.client.table('games').select('id,event,name').in_('id', [row['id'] for row in rows]).execute()
+        return _matching_game_ids(rows, response.data or [])
+
+    def _record_game_inserts(self, chunk: List[dict], inserted: Set[int]) -> List[int]:
+        """Count inserted games and mark the rest failed; returns the failed ids."""
+        self._written('games', [row for row in chunk if row['id'] in inserted])
+        failed = []
+        for row in chunk:
+            if row['id'] not in inserted:
+                failed.append(row['id'])
+                self.failed_game_ids.add(row['id'])
+                print(
+                    f"Error inserting game {row['name']} for event {row['event']}: "
+                    "not inserted (already exists or request failed); re-run to pick up its id."
+                )
+        return failed
+
+
+def _matching_game_ids(rows: List[dict], stored: List[dict]) -> Set[int]:
+    by_id = {row['id']: (row['event'], row['name']) for row in stored}
+    return {row['id'] for row in rows if by_id.get(row['id']) == (row['event'], row['name'])}
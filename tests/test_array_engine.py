@@ -0,0 +1,96 @@
+"""ArrayPlackettLuce against openskill 5.1.1 PlackettLuce, seat by seat."""
+import random
+
+import numpy as np
+import pytest
+from openskill.models import PlackettLuce
+
+from array_engine import ArrayPlackettLuce, batch_schedule
+
+TOLERANCE = 1e-9
+
+
+def openskill_replay(model, players, ranks):
+    """Post-game (mu, sigma) of every seat, rating each game with openskill in order."""
+    ratings = {}
+    after = []
+    for game, game_ranks in zip(players, ranks):
+        teams = [[ratings.setdefault(player, model.rating(name=player))] for player in game]
+        for player, team in zip(game, model.rate(teams=teams, ranks=list(game_ranks))):
+            ratings[player] = team[0]
+            after.append((team[0].mu, team[0].sigma))
+    return after
+
+
+def assert_parity(players, ranks, model=None):
+    model = model or PlackettLuce()
+    engine = ArrayPlackettLuce(mu=model.mu, sigma=model.sigma, beta=model.beta, kappa=model.kappa, tau=model.tau)
+    _, mu_after, sigma_after = engine.rate_games(players, ranks)
+    expected = openskill_replay(model, players, ranks)
+    assert len(expected) == len(mu_after)
+    for seat, (mu, sigma) in enumerate(expected):
+        assert abs(mu_after[seat] - mu) <= TOLERANCE, f"mu of seat {seat}"
+        assert abs(sigma_after[seat] - sigma) <= TOLERANCE, f"sigma of seat {seat}"
+
+
+@pytest.mark.parametrize('ranks', [
+    [1, 2],
+    [2, 1],
+    [1, 1],
+    [1, 2, 3],
+    [3, 1, 2],
+    [1, 1, 3],
+    [1, 2, 2],
+    [2, 2, 2],
+    [1, 2, 3, 4],
+    [4, 3, 2, 1],
+    [1, 1, 3, 4],
+    [1, 2, 2, 4],
+    [1, 2, 3, 3],
+    [1, 1, 3, 3],
+    [1, 1, 1, 4],
+    [2, 2, 2, 2],
+])
+def test_single_game(ranks):
+    assert_parity([[f"p{seat}" for seat in range(len(ranks))]], [ranks])
+
+
+def test_shared_players_across_games():
+    # the same players in consecutive games force several dependency levels
+    players = [['a', 'b'], ['a', 'b', 'c'], ['c', 'd', 'a', 'b'], ['d', 'e'], ['b', 'e', 'a']]
+    ranks = [[1, 2], [2, 2, 1], [1, 3, 3, 2], [1, 1], [3, 1, 2]]
+    assert_parity(players, ranks)
+
+
+def test_random_history_with_ties():
+    rng = random.Random(5)
+    names = [f"player{i}" for i in range(12)]
+    players, ranks = [], []
+    for _ in range(300):
+        size = rng.randint(2, 4)
+        players.append(rng.sample(names, size))
+        ranks.append(sorted(rng.randint(1, size) for _ in range(size)))
+        rng.shuffle(ranks[-1])
+    assert_parity(players, ranks)
+
+
+def test_non_default_model():
+    model = PlackettLuce(mu=30.0, sigma=7.0, beta=3.0, kappa=0.001, tau=0.2)
+    assert_parity([['a', 'b', 'c'], ['b', 'c'], ['a', 'c', 'b', 'd']], [[1, 1, 3], [2, 1], [1, 2, 3, 3]], model)
+
+
+def test_batch_schedule_keeps_each_players_games_in_order():
+    engine = ArrayPlackettLuce()
+    players = [['a', 'b'], ['c', 'd'], ['a', 'c'], ['b', 'd'], ['a', 'b', 'c']]
+    seat_ids = np.array([engine.intern(player) for game in players for player in game], dtype=np.int64)
+    offsets = np.array([0, 2, 4, 6, 8, 11], dtype=np.int64)
+    seen = {}
+    for positions in batch_schedule(seat_ids, offsets, len(engine.players)):
+        batch_players = seat_ids[positions].ravel().tolist()
+        # nobody twice in a batch
+        assert len(batch_players) == len(set(batch_players))
+        for position in positions[:, 0].tolist():
+            game = int(np.searchsorted(offsets, position, side='right')) - 1
+            for player in seat_ids[offsets[game]:offsets[game + 1]].tolist():
+                assert seen.get(player, -1) < game
+                seen[player] = game
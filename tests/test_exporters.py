@@ -0,0 +1,69 @@
+"""Streaming exporters write the same bytes as serializing the whole object at once."""
+import csv
+import json
+
+import pytest
+
+from exporters import CsvExporter, JsonObjectExporter, export_path, json_object_chunks, write_json_object
+
+RATINGS = {
+    1: {'alice': [{'games_won': 3}, {'mu': 27.5, 'sigma': 7.9, 'ordinal': 1291.0}], 'bob': []},
+    12: {'carol': {'ladders': {'all_time': None, 'one_versus_one': [1, 2.5, 'x']}}, 'dée': 'ünicode'},
+    'name': [],
+    40: {},
+}
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('items', [RATINGS, {}, {7: 1}])
+def test_json_matches_json_dump(tmp_path, items):
+    expected = json.dumps({str(key): value for key, value in items.items()}, indent=2).encode()
+    with JsonObjectExporter(str(tmp_path / 'streamed.json')) as out:
+        for key, value in items.items():
+            out.write(key, value)
+    write_json_object(str(tmp_path / 'written.json'), items.items())
+    assert read(tmp_path / 'streamed.json') == expected
+    assert read(tmp_path / 'written.json') == expected
+
+
+@pytest.mark.parametrize('items', [RATINGS, {}])
+def test_compact_matches_json_dump(items):
+    text = ''.join(json_object_chunks(items.items(), 'compact'))
+    assert text == json.dumps({str(key): value for key, value in items.items()}, separators=(',', ':'))
+
+
+def test_ndjson_one_entry_per_line(tmp_path):
+    path = tmp_path / export_path('rating_by_event', 'ndjson')
+    assert path.name == 'rating_by_event.ndjson'
+    write_json_object(str(path), RATINGS.items(), 'ndjson', 'event', 'players')
+    lines = read(path).decode().splitlines()
+    assert [json.loads(line) for line in lines] == [{'event': key, 'players': value} for key, value in RATINGS.items()]
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        JsonObjectExporter(str(tmp_path / 'x.json'), 'yaml')
+
+
+def test_csv_matches_csv_writer(tmp_path):
+    header = ['event', 'player', 'updated_rating']
+    rows = [[1, 99, json.dumps({'mu': 25.0})], [2, 'a,b', 'line\nbreak'], [3, '', None]]
+    with CsvExporter(str(tmp_path / 'streamed.csv'), header) as out:
+        for row in rows:
+            out.write(row)
+    with open(tmp_path / 'expected.csv', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    assert out.row_count == 3
+    assert read(tmp_path / 'streamed.csv') == read(tmp_path / 'expected.csv')
+
+
+def test_csv_not_created_without_rows(tmp_path):
+    with CsvExporter(str(tmp_path / 'empty.csv'), ['a']):
+        pass
+    assert not (tmp_path / 'empty.csv').exists()
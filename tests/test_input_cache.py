@@ -0,0 +1,70 @@
+"""The input cache is reused across the players_rows.csv rewrite a live sync does."""
+import csv
+
+import pytest
+
+import input_cache
+from input_cache import load_inputs
+
+PLAYERS = [('1', 'alice'), ('2', 'bob'), ('3', 'carol')]
+
+
+def write_players(path, ratings, players=PLAYERS):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'created_at', 'username', 'current_rating'])
+        for (player_id, username), rating in zip(players, ratings):
+            writer.writerow([player_id, '2024-04-01', username, rating])
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    (tmp_path / 'values.csv').write_text(
+        'event,match,player_a,rank_a,player_b,rank_b,player_c,rank_c,player_d,rank_d\n'
+        'Open,A1,alice,1,bob,2,carol,3,,\n'
+        'Open,A2,carol,1,alice,2,,,,\n',
+        encoding='utf-8',
+    )
+    (tmp_path / 'events_rows.csv').write_text(
+        'id,created_at,start_date,name,bid,draft,num_players_per_game,rating_event\n'
+        '1,2024-04-01,2024-05-10 00:00:00+00,Open,true,false,4,true\n',
+        encoding='utf-8',
+    )
+    write_players(tmp_path / 'players_rows.csv', ['', '', ''])
+    return tmp_path
+
+
+def load(directory):
+    return load_inputs(
+        str(directory / 'values.csv'), str(directory / 'players_rows.csv'), str(directory / 'events_rows.csv'),
+        cache_dir=str(directory / 'cache'),
+    )
+
+
+def count_parses(monkeypatch):
+    parses = []
+    real = input_cache.load_values
+
+    def load_values(*args):
+        parses.append(args)
+        return real(*args)
+    monkeypatch.setattr(input_cache, 'load_values', load_values)
+    return parses
+
+
+def test_new_current_ratings_keep_the_cache(inputs, monkeypatch):
+    parses = count_parses(monkeypatch)
+    first = load(inputs)
+    write_players(inputs / 'players_rows.csv', ['{"mu": 26.1}', '{"mu": 24.0}', '{"mu": 25.2}'])
+    second = load(inputs)
+    assert len(parses) == 1
+    assert second.player_key == first.player_key == {'alice': 1, 'bob': 2, 'carol': 3}
+    assert second.dataset.seat_player.tolist() == first.dataset.seat_player.tolist()
+
+
+def test_changed_player_id_rebuilds_the_cache(inputs, monkeypatch):
+    parses = count_parses(monkeypatch)
+    load(inputs)
+    write_players(inputs / 'players_rows.csv', ['', '', ''], [('1', 'alice'), ('7', 'bob'), ('3', 'carol')])
+    assert load(inputs).player_key == {'alice': 1, 'bob': 7, 'carol': 3}
+    assert len(parses) == 2
@@ -0,0 +1,77 @@
+"""OrderedScores / Leaderboard against a plain sorted list."""
+import random
+from bisect import bisect_left
+
+import pytest
+
+from leaderboard import Leaderboard, LeaderboardTracker, OrderedScores
+
+
+def assert_matches(scores, expected):
+    assert len(scores) == len(expected)
+    assert list(scores) == expected
+    for position in range(0, len(expected), 7):
+        assert scores[position] == expected[position]
+        assert scores.rank(expected[position]) == bisect_left(expected, expected[position])
+    assert list(scores.islice(3, 20)) == expected[3:20]
+
+
+def test_ordered_scores_random_operations():
+    # a small block size splits and empties blocks often
+    rng = random.Random(3)
+    scores = OrderedScores(block_size=4)
+    expected = []
+    for step in range(3000):
+        action = rng.random()
+        if expected and action < 0.3:
+            key = expected.pop(rng.randrange(len(expected)))
+            scores.remove(key)
+        elif expected and action < 0.6:
+            old = expected.pop(rng.randrange(len(expected)))
+            new = rng.randint(0, 500)
+            expected.insert(bisect_left(expected, new), new)
+            scores.replace(old, new)
+        else:
+            key = rng.randint(0, 500)
+            expected.insert(bisect_left(expected, key), key)
+            scores.add(key)
+        if step % 50 == 0:
+            assert_matches(scores, expected)
+    assert_matches(scores, expected)
+
+
+def test_ordered_scores_errors():
+    scores = OrderedScores()
+    scores.add(5)
+    with pytest.raises(KeyError):
+        scores.remove(6)
+    with pytest.raises(IndexError):
+        scores[1]
+    assert scores[-1] == 5
+    assert scores.rank(100) == 1
+
+
+def test_leaderboard_ranks_highest_first_and_ties_by_first_seen():
+    board = Leaderboard(block_size=2)
+    for player, ordinal in [('a', 1200.0), ('b', 1300.0), ('c', 1200.0), ('d', 1100.0)]:
+        board.update(player, ordinal)
+    assert board.top(4) == [('b', 1300.0), ('a', 1200.0), ('c', 1200.0), ('d', 1100.0)]
+    assert [board.rank(player) for player in 'bacd'] == [1, 2, 3, 4]
+
+    board.update('d', 1400.0)
+    board.update('a', 1200.0)
+    assert list(board) == [('d', 1400.0), ('b', 1300.0), ('a', 1200.0), ('c', 1200.0)]
+    assert 'e' not in board
+    with pytest.raises(KeyError):
+        board.rank('e')
+
+
+def test_tracker_snapshot():
+    tracker = LeaderboardTracker(top_k=2)
+    tracker.update('all_time', ['a', 'b', 'c'], [1250.0, 1150.0, 1300.0])
+    tracker.update('one_versus_one', ['a', 'b'], [1210.0, 1190.0])
+    standings = tracker.snapshot(['b', 'c'])
+    assert standings == {
+        'all_time': {'players': 3, 'top': [['c', 1300.0], ['a', 1250.0]], 'ranks': {'b': 3, 'c': 1}},
+        'one_versus_one': {'players': 2, 'top': [['a', 1210.0], ['b', 1190.0]], 'ranks': {'b': 2}},
+    }
@@ -0,0 +1,144 @@
+"""SyncJournal + BatchWriter: failed or lost chunks are resent by a resume, and nothing else."""
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from sync_journal import SyncJournal, read_journal
+from sync_writer import UPSERT_KEYS, BatchWriter
+
+
+class FakeTable:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self._rows = None
+        self._ids = None
+
+    def upsert(self, rows, on_conflict, ignore_duplicates=False, returning=None):
+        self._rows = (rows, ignore_duplicates)
+        return self
+
+    def select(self, columns):
+        return self
+
+    def in_(self, column, ids):
+        self._ids = set(ids)
+        return self
+
+    def execute(self):
+        stored = self.client.tables.setdefault(self.name, {})
+        if self._ids is not None:
+            return SimpleNamespace(data=[row for row in stored.values() if row.get('id') in self._ids])
+        self.client.calls += 1
+        rows, ignore_duplicates = self._rows
+        failure = self.client.failures.pop(self.client.calls, None)
+        if failure == 'before':
+            raise RuntimeError('injected')
+        inserted = []
+        for row in rows:
+            key = tuple(row[column] for column in UPSERT_KEYS[self.name])
+            if key in stored and ignore_duplicates:
+                continue
+            stored[key] = dict(row)
+            inserted.append(row)
+        if failure == 'after':
+            # applied, but the response (and so the ack) is lost
+            raise RuntimeError('injected after apply')
+        return SimpleNamespace(data=inserted)
+
+
+class FakeClient:
+    def __init__(self, failures=None):
+        self.tables = {}
+        self.calls = 0
+        self.failures = dict(failures or {})
+
+    def table(self, name):
+        return FakeTable(self, name)
+
+
+def queue_run(writer):
+    for game_id in range(1, 7):
+        writer.queue('games', {'id': game_id, 'event': 1, 'name': f'R1 G{game_id}'})
+        for player in (10, 11):
+            writer.queue('game_participation', {'game': game_id, 'player': player, 'ranking': 1, 'updated_rating': {}})
+    writer.queue('players', {'id': 10, 'username': 'a', 'current_rating': {'mu': 25.0}})
+
+
+def run(client, path, chunk_size=2):
+    journal = SyncJournal(str(path), 'example.supabase.co')
+    writer = BatchWriter(client, chunk_size=chunk_size, journal=journal)
+    queue_run(writer)
+    writer.flush(('games', 'game_participation'))
+    writer.flush(('players',), seal=True)
+    return writer, journal.finish()
+
+
+def resume(client, path):
+    state = read_journal(str(path))
+    journal = SyncJournal(state.path, state.target, state)
+    writer = BatchWriter(client, chunk_size=2, journal=journal)
+    writer.failed_game_ids.update(state.failed_game_ids)
+    writer.resend(state.pending)
+    return state, journal.finish()
+
+
+def test_clean_run_removes_the_journal(tmp_path):
+    path = tmp_path / 'journal.ndjson'
+    client = FakeClient()
+    writer, finished = run(client, path)
+    assert finished
+    assert not path.exists()
+    assert writer.rows_written == {'games': 6, 'game_participation': 12, 'event_participation': 0, 'players': 1}
+
+
+@pytest.mark.parametrize('failures', [
+    # games chunk 2 lost its ack; a participation chunk and the players chunk failed outright
+    {2: 'after', 5: 'before', 8: 'before'},
+    # a games chunk never reached the server: its participations wait for the resume
+    {1: 'before'},
+])
+def test_resume_sends_only_the_unacknowledged_chunks(tmp_path, failures):
+    clean = FakeClient()
+    run(clean, tmp_path / 'clean.ndjson')
+
+    path = tmp_path / 'journal.ndjson'
+    client = FakeClient(failures)
+    _, finished = run(client, path)
+    assert not finished
+    assert path.exists()
+
+    state = read_journal(str(path))
+    assert state.sealed
+    assert state.target == 'example.supabase.co'
+    assert all(chunk.seq >= 0 for chunk in state.pending)
+    calls = client.calls
+    client.failures.clear()
+    _, finished = resume(client, path)
+    assert finished
+    assert not path.exists()
+    # one request per pending chunk (participations of skipped games are the only ones left out)
+    assert client.calls - calls <= len(state.pending)
+    assert client.tables == clean.tables
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    path = tmp_path / 'journal.ndjson'
+    client = FakeClient({1: 'before'})
+    run(client, path)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"op": "ack", "se')
+    state = read_journal(str(path))
+    assert [chunk.table for chunk in state.pending][0] == 'games'
+
+
+def test_unreadable_journal(tmp_path):
+    path = tmp_path / 'journal.ndjson'
+    assert read_journal(str(path)) is None
+    path.write_text(json.dumps({'op': 'plan', 'seq': 0}) + '\n')
+    with pytest.raises(ValueError):
+        read_journal(str(path))
+    path.write_text('not json\n' + json.dumps({'op': 'begin', 'format': 1}) + '\n')
+    with pytest.raises(ValueError):
+        read_journal(str(path))
@@ -0,0 +1,28 @@
+"""tuning.report_lines marks and pins the default row, also when its values were typed by hand."""
+from tuning import DEFAULT_CONFIG, Config, is_default, report_lines
+
+
+def result(config, log_loss):
+    scores = {'games': 10, 'log_loss': log_loss, 'accuracy': 0.5, 'ordinal_accuracy': {'3.0': 0.5}}
+    return {'config': config._asdict(), 'tune': scores, 'holdout': scores}
+
+
+def test_typed_defaults_are_marked_and_pinned():
+    typed = Config(25.0, 8.333, 4.1667, 0.0001, 0.0833)
+    results = [
+        result(DEFAULT_CONFIG._replace(sigma=6.0), 1.0),
+        result(DEFAULT_CONFIG._replace(sigma=10.0), 1.1),
+        result(typed, 1.2),
+    ]
+    lines = report_lines(results, [3.0], {'tune': 1.4, 'holdout': 1.4}, top=1)
+    rows = lines[1:-1]
+    assert len(rows) == 2
+    assert rows[0].startswith('  1 ')
+    assert rows[1].startswith('  3*')
+
+
+def test_is_default():
+    assert is_default(DEFAULT_CONFIG._asdict())
+    assert is_default(Config(25, 8.3333, 4.167, 0.0001, 0.08333)._asdict())
+    assert not is_default(DEFAULT_CONFIG._replace(sigma=8.2)._asdict())
+    assert not is_default(DEFAULT_CONFIG._replace(tau=0.08)._asdict())
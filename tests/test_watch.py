@@ -0,0 +1,94 @@
+"""ValuesTail: appended rows, half-written last rows and edits to applied bytes."""
+import itertools
+import os
+
+from watch import APPEND, REWRITE, ValuesTail, appended_lines, first_changed_row
+
+HEADER = b'event,name,player,rank\n'
+
+_mtimes = itertools.count(1)
+
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    # distinct mtimes even when the filesystem clock is coarse
+    mtime = next(_mtimes) * 10**9
+    os.utime(path, ns=(mtime, mtime))
+
+
+def start(path, data):
+    write(path, data)
+    tail = ValuesTail(str(path))
+    tail.advance(tail.read_all())
+    return tail
+
+
+def test_appended_rows(tmp_path):
+    path = tmp_path / 'values.csv'
+    tail = start(path, HEADER + b'1,R1,a,1\n')
+    assert tail.poll() is None
+
+    write(path, HEADER + b'1,R1,a,1\n1,R2,b,1\n1,R2,c,2\n')
+    change = tail.poll()
+    assert change.kind == APPEND
+    assert appended_lines(change.data) == ['1,R2,b,1\n', '1,R2,c,2\n']
+    tail.advance(change)
+    assert tail.poll() is None
+
+
+def test_change_is_offered_again_until_advanced(tmp_path):
+    path = tmp_path / 'values.csv'
+    tail = start(path, HEADER)
+    write(path, HEADER + b'1,R1,a,1\n')
+    first = tail.poll()
+    write(path, HEADER + b'1,R1,a,1\n1,R1,b,2\n')
+    again = tail.poll()
+    assert again.kind == APPEND
+    assert again.data.startswith(first.data)
+    assert again.offset == len(HEADER) + len(b'1,R1,a,1\n1,R1,b,2\n')
+
+
+def test_partial_last_line_waits_one_poll(tmp_path):
+    path = tmp_path / 'values.csv'
+    tail = start(path, HEADER)
+    write(path, HEADER + b'1,R1,a,1\n1,R1,b')
+    change = tail.poll()
+    assert change.data == b'1,R1,a,1\n'
+    tail.advance(change)
+
+    # still being written: grows, so it is not taken yet
+    write(path, HEADER + b'1,R1,a,1\n1,R1,b,2')
+    assert tail.poll() is None
+    # unchanged for a whole poll: taken without a newline
+    change = tail.poll()
+    assert change.data == b'1,R1,b,2'
+    tail.advance(change)
+    assert tail.poll() is None
+
+
+def test_edit_of_applied_bytes_is_a_rewrite(tmp_path):
+    path = tmp_path / 'values.csv'
+    tail = start(path, HEADER + b'1,R1,a,1\n1,R1,b,2\n')
+    write(path, HEADER + b'1,R1,a,2\n1,R1,b,1\n')
+    change = tail.poll()
+    assert change.kind == REWRITE
+    assert change.data == HEADER + b'1,R1,a,2\n1,R1,b,1\n'
+    tail.advance(change)
+    assert tail.poll() is None
+
+    write(path, HEADER + b'1,R1,a,2\n')
+    assert tail.poll().kind == REWRITE
+
+
+def test_missing_file(tmp_path):
+    tail = ValuesTail(str(tmp_path / 'missing.csv'))
+    assert tail.poll() is None
+    assert tail.read_all() is None
+
+
+def test_first_changed_row():
+    assert first_changed_row(['a', 'b'], ['a', 'b', 'c']) == 2
+    assert first_changed_row(['a', 'b', 'c'], ['a', 'x', 'c']) == 1
+    assert first_changed_row(['a', 'b', 'c'], ['a', 'b']) == 2
+    assert appended_lines(b'\n1,R1,a,1\r\n  \n') == ['1,R1,a,1\r\n']
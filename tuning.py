@@ -0,0 +1,356 @@
+"""Hyperparameter tuning: replay one ladder under many PlackettLuce parameter sets and score each.
+
+Every game is predicted from the ratings going into it and only then rated, so each
+prediction is out of sample. For each configuration the harness reports:
+
+- log_loss: -log of the Plackett-Luce probability given to the actual winner (the
+  exp(mu / c) shares rate() uses; tied winners' shares are added)
+- accuracy: how often the seat with the highest win probability finished first
+- ordinal accuracy per z: the share of decided seat pairs ordered correctly by mu - z * sigma
+
+A ladder's games are split in values.csv order into a warm-up (not scored), a tuning window
+and a holdout. Configurations are ranked by tuning log-loss; the holdout columns show whether
+the choice generalizes. The site scale's `* 24 + 1200` is affine and cannot change any score;
+z is the part of the ordinal that decides how players rank.
+
+The inputs are parsed once (through the input cache) and the numpy engine's batch schedule
+is built once. Worker processes receive both once, through the pool initializer, so each
+configuration is a pure NumPy replay:
+
+    uv run python tuning.py --beta 2.5,4.1667,6 --tau 0.04,0.0833,0.15 --workers 8
+    uv run python tuning.py --ladder three_and_four_player --z 2,3 --out tuning.csv
+"""
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from array_engine import (
+    DEFAULT_BETA,
+    DEFAULT_KAPPA,
+    DEFAULT_MU,
+    DEFAULT_SIGMA,
+    DEFAULT_TAU,
+    ArrayPlackettLuce,
+    batch_schedule,
+)
+from dataset import DatasetError
+from input_cache import DEFAULT_CACHE_DIR, Inputs, load_inputs
+from ladders import LADDERS, game_ladders
+
+WINDOWS = ('tune', 'holdout')
+
+# Probabilities are clipped here before taking logs.
+_EPSILON = 1e-15
+
+
+class Config(NamedTuple):
+    mu: float
+    sigma: float
+    beta: float
+    kappa: float
+    tau: float
+
+
+DEFAULT_CONFIG = Config(DEFAULT_MU, DEFAULT_SIGMA, DEFAULT_BETA, DEFAULT_KAPPA, DEFAULT_TAU)
+
+# Grid values typed to 4-5 significant digits (8.3333 for 25/3, 0.0833 for 1/12) still
+# count as the default.
+_DEFAULT_REL_TOL = 1e-3
+
+
+def is_default(config: Dict[str, float]) -> bool:
+    return all(
+        math.isclose(config[field], default, rel_tol=_DEFAULT_REL_TOL)
+        for field, default in DEFAULT_CONFIG._asdict().items()
+    )
+
+
+class Batch(NamedTuple):
+    """One rate_batch call's games, with everything that does not depend on the Config."""
+    # ladder game index of each row
+    games: np.ndarray
+    # (G, n) player ids and ranks
+    seats: np.ndarray
+    ranks: np.ndarray
+    # (G, n) seat finished first (ties included)
+    won: np.ndarray
+    # seat pairs (first[k], second[k]) and (G, pairs) outcome: +1 when the first finished ahead
+    first: np.ndarray
+    second: np.ndarray
+    outcome: np.ndarray
+
+
+class TuningData(NamedTuple):
+    """One ladder's games, ready to replay under any Config."""
+    player_names: List[str]
+    # in rating order
+    batches: List[Batch]
+    game_count: int
+    # per ladder game: seat pairs that did not tie
+    decided_pairs: np.ndarray
+
+
+def prepare(inputs: Inputs, ladder: str = 'all_time') -> TuningData:
+    """Select `ladder`'s games (as RatingEngine does) and build their batch schedule."""
+    dataset = inputs.dataset
+    one_versus_one = {key for key, value in inputs.rated_event.items() if value == 'false'}
+    three_and_four_player = set(inputs.event_key.values()) - one_versus_one
+    ladder_events = [
+        event for event in np.unique(dataset.game_event).tolist()
+        if ladder in game_ladders(event, one_versus_one, three_and_four_player)
+    ]
+    _, offsets, seat_player, seat_rank = dataset.subset(np.isin(dataset.game_event, ladder_events))
+    seat_player = seat_player.astype(np.int64)
+    seat_rank = seat_rank.astype(np.float64)
+    game_count = len(offsets) - 1
+    decided_pairs = np.zeros(game_count)
+    pairs = {n: np.triu_indices(n, 1) for n in range(2, int(np.diff(offsets).max(initial=2)) + 1)}
+    batches = []
+    for positions in batch_schedule(seat_player, offsets, len(dataset.player_names)):
+        games = np.searchsorted(offsets, positions[:, 0])
+        ranks = seat_rank[positions]
+        first, second = pairs[positions.shape[1]]
+        outcome = np.sign(ranks[:, second] - ranks[:, first])
+        decided_pairs[games] = np.count_nonzero(outcome, axis=1)
+        batches.append(Batch(
+            games, seat_player[positions], ranks, ranks == ranks.min(axis=1, keepdims=True), first, second, outcome,
+        ))
+    return TuningData(list(dataset.player_names), batches, game_count, decided_pairs)
+
+
+class GameScores(NamedTuple):
+    # per ladder game
+    winner_probability: np.ndarray
+    favourite_won: np.ndarray
+    decided_pairs: np.ndarray
+    # (len(zs), games): correctly ordered pairs (ordinal ties count half)
+    correct_pairs: np.ndarray
+
+
+def replay_scores(config: Config, data: TuningData, zs: Sequence[float] = (3.0,)) -> GameScores:
+    """Replay the ladder under `config`, predicting each game from the ratings before it."""
+    model = ArrayPlackettLuce(*config)
+    for name in data.player_names:
+        model.intern(name)
+    winner_probability = np.empty(data.game_count)
+    favourite_won = np.empty(data.game_count)
+    correct_pairs = np.zeros((len(zs), data.game_count))
+    beta_sq = config.beta ** 2
+    for batch in data.batches:
+        mu = model.mu[batch.seats]
+        sigma = model.sigma[batch.seats]
+
+        c = np.sqrt((sigma ** 2 + beta_sq).sum(axis=1))[:, None]
+        strength = np.exp(mu / c)
+        share = strength / strength.sum(axis=1)[:, None]
+        winner_probability[batch.games] = (share * batch.won).sum(axis=1)
+        favourite_won[batch.games] = batch.won[np.arange(len(batch.games)), share.argmax(axis=1)]
+
+        for k, z in enumerate(zs):
+            ordinal = mu - z * sigma
+            predicted = np.sign(ordinal[:, batch.first] - ordinal[:, batch.second])
+            # ordinal ties count half; tied results (outcome 0) count nothing
+            correct = np.where(predicted == 0, 0.5, predicted == batch.outcome) * (batch.outcome != 0)
+            correct_pairs[k, batch.games] = correct.sum(axis=1)
+
+        model.rate_batch(batch.seats, batch.ranks)
+    return GameScores(winner_probability, favourite_won, data.decided_pairs, correct_pairs)
+
+
+def window_bounds(game_count: int, warmup: float, holdout: float) -> Dict[str, Tuple[int, int]]:
+    """[start, end) ladder game indexes of the tuning and holdout windows."""
+    tune_start = int(game_count * warmup)
+    holdout_start = max(tune_start, game_count - int(game_count * holdout))
+    return {'tune': (tune_start, holdout_start), 'holdout': (holdout_start, game_count)}
+
+
+def summarize(scores: GameScores, start: int, end: int, zs: Sequence[float]) -> dict:
+    games = end - start
+    if games <= 0:
+        return {'games': 0}
+    probability = np.clip(scores.winner_probability[start:end], _EPSILON, 1.0)
+    decided = scores.decided_pairs[start:end].sum()
+    return {
+        'games': games,
+        'log_loss': float(-np.mean(np.log(probability))),
+        'accuracy': float(np.mean(scores.favourite_won[start:end])),
+        'ordinal_accuracy': {
+            str(z): float(scores.correct_pairs[k, start:end].sum() / decided) if decided else None
+            for k, z in enumerate(zs)
+        },
+    }
+
+
+def uniform_log_loss(data: TuningData, start: int, end: int) -> Optional[float]:
+    """Log-loss of predicting every seat equally likely to win (the no-skill reference)."""
+    if end <= start:
+        return None
+    losses = np.empty(data.game_count)
+    for batch in data.batches:
+        losses[batch.games] = -np.log(batch.won.sum(axis=1) / batch.won.shape[1])
+    return float(np.mean(losses[start:end]))
+
+
+# Worker-process state, set once per worker by the pool initializer
+_worker: dict = {}
+
+
+def _init_worker(data: TuningData, zs: Sequence[float], windows: Dict[str, Tuple[int, int]]) -> None:
+    _worker.update(data=data, zs=zs, windows=windows)
+
+
+def score_config(config: Config) -> dict:
+    """Replay and summarize one configuration (uses the data given to _init_worker)."""
+    start = time.perf_counter()
+    scores = replay_scores(config, _worker['data'], _worker['zs'])
+    result = {'config': config._asdict()}
+    for window, (first, last) in _worker['windows'].items():
+        result[window] = summarize(scores, first, last, _worker['zs'])
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def run_grid(
+    data: TuningData,
+    configs: Sequence[Config],
+    zs: Sequence[float] = (3.0,),
+    warmup: float = 0.1,
+    holdout: float = 0.2,
+    workers: Optional[int] = None,
+) -> List[dict]:
+    """Score every configuration (in `workers` processes, default one per core), best first."""
+    windows = window_bounds(data.game_count, warmup, holdout)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(configs) == 1:
+        _init_worker(data, zs, windows)
+        results = [score_config(config) for config in configs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data, zs, windows)) as pool:
+            results = list(pool.map(score_config, configs))
+    rank_window = 'tune' if windows['tune'][1] > windows['tune'][0] else 'holdout'
+    results.sort(key=lambda result: result[rank_window].get('log_loss', float('inf')))
+    return results
+
+
+def _floats(value: str) -> List[float]:
+    try:
+        return [float(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected comma-separated numbers, got {value!r}") from None
+
+
+def _format(value, width: int, digits: int = 4) -> str:
+    return f"{value:>{width}.{digits}f}" if isinstance(value, float) else f"{'-':>{width}}"
+
+
+def report_lines(results: List[dict], zs: Sequence[float], baseline: Dict[str, Optional[float]], top: int) -> List[str]:
+    z_columns = ''.join(f"{'ord@z=' + format(z, 'g'):>11}" for z in zs)
+    lines = [
+        f"{'#':>3} {'mu':>7} {'sigma':>7} {'beta':>7} {'tau':>7} {'kappa':>8}  "
+        f"{'tune ll':>8} {'tune acc':>8}  {'hold ll':>8} {'hold acc':>8}{z_columns}"
+    ]
+    shown = results[:top] if top else results
+    if top and not any(is_default(result['config']) for result in shown):
+        shown = shown + [result for result in results if is_default(result['config'])]
+    for result in shown:
+        config, tune, hold = result['config'], result['tune'], result['holdout']
+        position = results.index(result) + 1
+        marker = '*' if is_default(config) else ' '
+        ordinal = hold if hold.get('games') else tune
+        lines.append(
+            f"{position:>3}{marker}{config['mu']:>7.3f} {config['sigma']:>7.3f} {config['beta']:>7.3f} "
+            f"{config['tau']:>7.4f} {config['kappa']:>8.5f}  "
+            f"{_format(tune.get('log_loss'), 8)} {_format(tune.get('accuracy'), 8)}  "
+            f"{_format(hold.get('log_loss'), 8)} {_format(hold.get('accuracy'), 8)}"
+            + ''.join(_format((ordinal.get('ordinal_accuracy') or {}).get(str(z)), 11) for z in zs)
+        )
+    lines.append(
+        f"uniform-guess log-loss: tune {_format(baseline['tune'], 0)}, holdout {_format(baseline['holdout'], 0)}; "
+        f"* = current defaults; ord@z = ordinal pair accuracy (holdout, or tune without one)"
+    )
+    return lines
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Score PlackettLuce parameter sets by out-of-sample predictive accuracy.')
+    parser.add_argument('--ladder', choices=LADDERS, default='all_time', help='Ladder to replay (default: all_time).')
+    parser.add_argument('--mu', type=_floats, default=[DEFAULT_MU], help=f'Comma-separated values (default: {DEFAULT_MU:g}).')
+    parser.add_argument('--sigma', type=_floats, default=[6.25, DEFAULT_SIGMA, 10.0], help='Comma-separated values (default: 6.25,8.333,10).')
+    parser.add_argument('--beta', type=_floats, default=[2.5, DEFAULT_BETA, 6.0], help='Comma-separated values (default: 2.5,4.167,6).')
+    parser.add_argument('--tau', type=_floats, default=[0.04, DEFAULT_TAU, 0.15, 0.3], help='Comma-separated values (default: 0.04,0.0833,0.15,0.3).')
+    parser.add_argument('--kappa', type=_floats, default=[DEFAULT_KAPPA], help=f'Comma-separated values (default: {DEFAULT_KAPPA:g}).')
+    parser.add_argument('--z', type=_floats, default=[2.0, 3.0], help='Ordinal z values to score (default: 2,3; the site uses 3).')
+    parser.add_argument('--warmup', type=float, default=0.1, help='Leading share of games that is not scored (default: 0.1).')
+    parser.add_argument('--holdout', type=float, default=0.2, help='Trailing share of games kept out of the ranking (default: 0.2).')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per core).')
+    parser.add_argument('--top', type=int, default=20, help='Rows to print (default: 20; 0 for all).')
+    parser.add_argument('--out', help='Write every configuration\'s scores to this CSV.')
+    parser.add_argument('--json', dest='json_out', help='Write the full report to this JSON file.')
+    parser.add_argument('--no-input-cache', action='store_true', help='Re-parse the input CSVs.')
+    args = parser.parse_args(argv)
+
+    if not (0 <= args.warmup < 1 and 0 <= args.holdout < 1 and args.warmup + args.holdout < 1):
+        parser.error('--warmup and --holdout must be in [0, 1) and leave games to tune on')
+
+    try:
+        inputs = load_inputs(cache_dir=None if args.no_input_cache else DEFAULT_CACHE_DIR)
+    except DatasetError as e:
+        print(f"Error loading values.csv: {e}", file=sys.stderr)
+        return 1
+    start = time.perf_counter()
+    data = prepare(inputs, args.ladder)
+    if not data.game_count:
+        print(f"Error: No {args.ladder} games in values.csv", file=sys.stderr)
+        return 1
+    configs = [Config(*values) for values in itertools.product(args.mu, args.sigma, args.beta, args.kappa, args.tau)]
+    windows = window_bounds(data.game_count, args.warmup, args.holdout)
+    print(f"Scoring {len(configs)} configurations on {data.game_count} {args.ladder} games "
+          f"(tune {windows['tune'][1] - windows['tune'][0]}, holdout {windows['holdout'][1] - windows['holdout'][0]})...")
+    results = run_grid(data, configs, args.z, args.warmup, args.holdout, args.workers)
+    elapsed = time.perf_counter() - start
+    baseline = {window: uniform_log_loss(data, *windows[window]) for window in WINDOWS}
+
+    for line in report_lines(results, args.z, baseline, args.top):
+        print(line)
+    print(f"{len(configs)} configurations in {elapsed:.1f}s")
+
+    if args.out:
+        with open(args.out, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                ['rank', *Config._fields]
+                + [f'{window}_{metric}' for window in WINDOWS for metric in ('games', 'log_loss', 'accuracy')]
+                + [f'{window}_ordinal_accuracy_z{z:g}' for window in WINDOWS for z in args.z]
+            )
+            for position, result in enumerate(results, start=1):
+                writer.writerow(
+                    [position, *(result['config'][field] for field in Config._fields)]
+                    + [result[window].get(metric, '') for window in WINDOWS for metric in ('games', 'log_loss', 'accuracy')]
+                    + [(result[window].get('ordinal_accuracy') or {}).get(str(z), '') for window in WINDOWS for z in args.z]
+                )
+        print(f"Wrote {args.out}")
+    if args.json_out:
+        with open(args.json_out, 'w', encoding='utf-8') as f:
+            json.dump({
+                'ladder': args.ladder,
+                'games': data.game_count,
+                'windows': windows,
+                'uniform_log_loss': baseline,
+                'default_config': DEFAULT_CONFIG._asdict(),
+                'results': results,
+            }, f, indent=2)
+        print(f"Wrote {args.json_out}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""Tail values.csv for watch mode (main.py --watch).
+
+ValuesTail remembers how many bytes of values.csv have been applied and a hash of them.
+poll() reports either the complete rows appended since then or that earlier bytes changed
+(an edit, a deleted row, a re-saved file). The caller applies the change and then calls
+advance(), so a batch that fails (e.g. an unknown player) is offered again once the file
+changes. A last line without a newline is taken once it has stayed the same for a poll,
+so half-written rows are not rated.
+"""
+import hashlib
+import os
+from typing import List, NamedTuple, Optional, Sequence
+
+APPEND = 'append'
+REWRITE = 'rewrite'
+
+DEFAULT_WATCH_INTERVAL = 2.0
+
+
+class TailChange(NamedTuple):
+    # APPEND: `data` is the appended rows; REWRITE: `data` is the whole file
+    kind: str
+    data: bytes
+    # file bytes applied once this change is
+    offset: int
+
+
+class ValuesTail:
+    def __init__(self, path: str = 'values.csv'):
+        self.path = path
+        self.offset = 0
+        # hash of the applied bytes (values.csv[:offset])
+        self._hash = hashlib.sha256()
+        self._stat = None
+        self._partial: Optional[bytes] = None
+
+    def poll(self) -> Optional[TailChange]:
+        """The change since the last advance(), or None when there is nothing new to apply."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        key = (stat.st_size, stat.st_mtime_ns)
+        if key == self._stat and self._partial is None:
+            return None
+        self._stat = key
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        if len(data) < self.offset or hashlib.sha256(data[:self.offset]).digest() != self._hash.digest():
+            self._partial = None
+            return TailChange(REWRITE, data, len(data))
+
+        appended = data[self.offset:]
+        end = appended.rfind(b'\n') + 1
+        if end < len(appended):
+            partial = appended[end:]
+            if partial == self._partial:
+                # unchanged for a whole poll: a last row saved without a newline
+                end = len(appended)
+                self._partial = None
+            else:
+                self._partial = partial
+        else:
+            self._partial = None
+        if not appended[:end].strip():
+            return None
+        return TailChange(APPEND, appended[:end], self.offset + end)
+
+    def read_all(self) -> Optional[TailChange]:
+        """The whole file as a REWRITE change, to check it against the rows already applied."""
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        return TailChange(REWRITE, data, len(data))
+
+    def advance(self, change: TailChange) -> None:
+        """Mark `change` as applied."""
+        if change.kind == APPEND:
+            self._hash.update(change.data)
+        else:
+            self._hash = hashlib.sha256(change.data)
+            self._partial = None
+        self.offset = change.offset
+
+
+def appended_lines(data: bytes) -> List[str]:
+    """Non-blank CSV lines of appended bytes."""
+    return [line for line in data.decode('utf-8').splitlines(keepends=True) if line.strip()]
+
+
+def first_changed_row(old_keys: Sequence[str], new_keys: Sequence[str]) -> int:
+    """Index of the first row that differs (len(old_keys) when new_keys only appends rows)."""
+    for index, (old, new) in enumerate(zip(old_keys, new_keys)):
+        if old != new:
+            return index
+    return min(len(old_keys), len(new_keys))